@@ -1,5 +1,6 @@
 from flask import Flask
 from flask_cors import CORS
+from src.controller.admin_controller import admin_bp
 from src.controller.project_controller import project_blueprint
 from src.controller.pull_request_controller import pr_bp
 from src.controller.user_controller import user_blueprint
@@ -9,6 +10,7 @@ def create_app():
     app.register_blueprint(project_blueprint, url_prefix="/api/project")
     app.register_blueprint(pr_bp)
     app.register_blueprint(user_blueprint, url_prefix="/api/user")
+    app.register_blueprint(admin_bp)
     CORS(app, resources={
         r"/api/*": {
             "origins": ["http://localhost:5174"]
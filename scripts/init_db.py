@@ -60,8 +60,12 @@ def create_tables(db_url: str):
     os.environ.setdefault("DATABASE_URL", db_url)
     try:
         from src.repository.user_repository import create_tables as ct
+        from src.repository.analysis_repository import create_tables as create_analysis_tables
+        from src.repository.lease_repository import create_tables as create_lease_tables
 
         ct()
+        create_analysis_tables()
+        create_lease_tables()
         print("Tables created (or already existed).")
         return True
     except Exception as e:
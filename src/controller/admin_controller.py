@@ -0,0 +1,58 @@
+import os
+import hmac
+from flask import Blueprint, Response, request, jsonify
+from src.util import tracing
+from src.util.auth import jwt_required
+from src.util.logger import log
+from src.util.metrics import REGISTRY
+
+admin_bp = Blueprint("admin_controller", __name__)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _metrics_public() -> bool:
+    return os.environ.get("METRICS_PUBLIC", "").lower() in ("1", "true", "yes")
+
+
+if not os.environ.get("METRICS_TOKEN"):
+    if _metrics_public():
+        log.warning("METRICS_TOKEN is not set and METRICS_PUBLIC is on; /metrics is readable without auth")
+    else:
+        log.warning("METRICS_TOKEN is not set; /metrics is disabled")
+
+
+@admin_bp.route("/metrics", methods=["GET"])
+def metrics():
+    # scrapers can't do the JWT login flow, so this is guarded by a static
+    # bearer token; the labels name repos and PRs, so no token means no
+    # access unless it was opened explicitly
+    token = os.environ.get("METRICS_TOKEN")
+    if token:
+        auth = request.headers.get("Authorization", "")
+        if not hmac.compare_digest(auth, f"Bearer {token}"):
+            return jsonify({"error": "unauthorized"}), 401
+    elif not _metrics_public():
+        return jsonify({"error": "metrics disabled, set METRICS_TOKEN"}), 403
+    return Response(REGISTRY.render(), mimetype=None, content_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@admin_bp.route("/api/admin/traces", methods=["GET"])
+@jwt_required
+def list_traces():
+    try:
+        limit = min(int(request.args.get("limit", 50)), 500)
+        min_duration_ms = float(request.args.get("min_duration_ms", 0))
+    except ValueError:
+        return jsonify({"error": "limit and min_duration_ms must be numbers"}), 400
+    traces = [t for t in tracing.recent_traces(limit=None) if t["duration_ms"] >= min_duration_ms]
+    return jsonify({"traces": traces[:limit]}), 200
+
+
+@admin_bp.route("/api/admin/traces/<trace_id>", methods=["GET"])
+@jwt_required
+def get_trace(trace_id):
+    trace = tracing.get_trace(trace_id)
+    if trace is None:
+        return jsonify({"error": "trace not found"}), 404
+    return jsonify(trace), 200
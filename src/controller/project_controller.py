@@ -1,16 +1,74 @@
+import json
 import os
-from flask import Blueprint, request, jsonify, g
+from flask import Blueprint, Response, request, jsonify, g, stream_with_context
 from src.service.project_service import ProjectService
 from src.service.user_service import UserService
 from src.util.logger import log
 from src.util.async_tasks import run_async
 from src.util.auth import jwt_required
+from src.util.pagination import parse_limit
+from src.util.response_cache import GRAPH_CACHE_REQUESTS_TOTAL, GraphResponseCache, brotli
 
 project_blueprint = Blueprint("project_controller", __name__)
 service = ProjectService()
 user_service = UserService()
 
 
+def _wants_stream(params) -> bool:
+    return str(params.get("stream", "")).lower() in ("1", "true", "ndjson") or \
+        "application/x-ndjson" in request.headers.get("Accept", "")
+
+
+# a compressed body differs byte for byte from the plain one, so each
+# encoding is its own representation with its own strong ETag
+ENCODINGS = ("identity", "gzip", "br")
+
+
+def _variant_etag(etag: str, encoding: str) -> str:
+    return f"{etag}-{encoding}"
+
+
+def _not_modified(etag: str | None) -> Response | None:
+    # any encoding of an unchanged graph is still current
+    if etag is None:
+        return None
+    for encoding in ENCODINGS:
+        variant = _variant_etag(etag, encoding)
+        if request.if_none_match.contains(variant):
+            GRAPH_CACHE_REQUESTS_TOTAL.inc(result="not_modified")
+            resp = Response(status=304)
+            resp.headers["Vary"] = "Accept-Encoding"
+            resp.set_etag(variant)
+            return resp
+    return None
+
+
+def _cached_json(entry) -> Response:
+    encoding = "identity"
+    # small payloads are not worth compressing
+    if len(entry.body) >= 1024:
+        if brotli is not None and request.accept_encodings["br"]:
+            encoding = "br"
+        elif request.accept_encodings["gzip"]:
+            encoding = "gzip"
+    resp = Response(entry.encode(encoding), mimetype="application/json")
+    if encoding != "identity":
+        resp.headers["Content-Encoding"] = encoding
+    resp.headers["Vary"] = "Accept-Encoding"
+    if entry.etag:
+        resp.headers["Cache-Control"] = "private, no-cache"
+        resp.set_etag(_variant_etag(entry.etag, encoding))
+    else:
+        resp.headers["Cache-Control"] = "no-store"
+    return resp
+
+
+def _ndjson(records) -> Response:
+    # one JSON document per line, written as the Neo4j cursor yields them
+    lines = (json.dumps(record, default=str) + "\n" for record in records)
+    return Response(stream_with_context(lines), mimetype="application/x-ndjson")
+
+
 @project_blueprint.route("/onboard", methods=["POST"])
 @jwt_required
 def onboard_project():
@@ -40,8 +98,20 @@ def get_graph_for_repos():
         return jsonify({"error": "repo_ids must be a non-empty list"}), 400
 
     try:
-        result = service.get_graph_for_repos(repo_ids)
-        return jsonify(result), 200
+        if _wants_stream({**request.args, **data}) and not data.get("level"):
+            return _ndjson(service.stream_graph(repo_ids))
+        if "limit" in data or "cursor" in data:
+            result = service.get_graph_page(repo_ids, parse_limit(data.get("limit")), data.get("cursor"))
+            return jsonify(result), 200
+
+        # full and level-of-detail graphs are cached per repo graph generation
+        key = service.graph_cache_key(repo_ids, data.get("level"), data.get("expand"))
+        not_modified = _not_modified(GraphResponseCache.etag(key))
+        if not_modified is not None:
+            return not_modified
+        return _cached_json(service.get_graph_response(key, repo_ids, data.get("level"), data.get("expand")))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         log.error(f"Error fetching graph for repos {repo_ids}: {e}")
         return jsonify({"error": str(e)}), 500
@@ -69,6 +139,14 @@ def create_edge():
 @project_blueprint.route("/nodes", methods=["GET"])
 @jwt_required
 def get_nodes():
+    if _wants_stream(request.args):
+        return _ndjson(service.stream_nodes())
+    if "limit" in request.args or "cursor" in request.args:
+        try:
+            return jsonify(service.get_nodes_page(parse_limit(request.args.get("limit")),
+                                                  request.args.get("cursor"))), 200
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
     nodes = service.get_all_nodes()
     return jsonify(nodes), 200
 
@@ -76,10 +154,55 @@ def get_nodes():
 @project_blueprint.route("/edges", methods=["GET"])
 @jwt_required
 def get_edges():
+    if _wants_stream(request.args):
+        return _ndjson(service.stream_edges())
+    if "limit" in request.args or "cursor" in request.args:
+        try:
+            return jsonify(service.get_edges_page(parse_limit(request.args.get("limit")),
+                                                  request.args.get("cursor"))), 200
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
     edges = service.get_all_edges()
     return jsonify(edges), 200
 
 
+@project_blueprint.route("/neighborhood", methods=["GET"])
+@jwt_required
+def get_neighborhood():
+    args = request.args
+    edge_types = [t.strip() for t in args.get("edge_types", "").split(",") if t.strip()]
+    try:
+        depth, limit = int(args.get("depth", 2)), int(args.get("limit", 200))
+    except ValueError:
+        return jsonify({"error": "depth and limit must be integers"}), 400
+    try:
+        result = service.get_neighborhood(args.get("uid"), depth=depth, direction=args.get("direction", "both").lower(),
+                                          edge_types=edge_types, limit=limit)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if result is None:
+        return jsonify({"error": "node not found"}), 404
+    return jsonify(result), 200
+
+
+@project_blueprint.route("/search", methods=["GET"])
+@jwt_required
+def search_entities():
+    args = request.args
+    kinds = [k.strip().lower() for k in args.get("kind", "").split(",") if k.strip()]
+    repo_ids = [r.strip() for r in args.get("repo_ids", "").split(",") if r.strip()]
+    try:
+        limit = int(args.get("limit", 20))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    fuzzy = args.get("fuzzy", "true").lower() not in ("0", "false", "no")
+    try:
+        results = service.search_entities(args.get("q", ""), kinds, repo_ids, limit, fuzzy)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"results": results}), 200
+
+
 @project_blueprint.route("/clear", methods=["DELETE"])
 @jwt_required
 def clear_graph():
@@ -2,17 +2,34 @@ import os
 import json
 import hmac
 import hashlib
+import threading
+import uuid
+from contextlib import contextmanager
 from flask import Blueprint, request, jsonify
+from src.repository.lease_repository import LeaseRepository
 from src.service.pull_request_service import PullRequestService
 from src.service.comment_notification_service import CommentNotificationService
 from src.util.logger import log
 from src.util.async_tasks import run_async
+from src.util.metrics import REGISTRY
+from src.util import tracing
 
 pr_bp = Blueprint("pr_controller", __name__)
 pr_service = PullRequestService()
 notification_service = CommentNotificationService()
+lease_repository = LeaseRepository()
 
-ACTIVE_ANALYSES: set = set()
+LEASE_TTL_SECONDS = int(os.environ.get("ANALYSIS_LEASE_TTL_SECONDS", "900"))
+# renewed long before it runs out, so only a dead worker lets a lease expire
+LEASE_RENEW_SECONDS = float(os.environ.get("ANALYSIS_LEASE_RENEW_SECONDS", str(LEASE_TTL_SECONDS / 3)))
+
+# read from the lease table, so both count runs on every worker
+REGISTRY.gauge("chainreaction_pr_analyses_in_flight", "PR analyses currently holding a lease",
+               fn=lease_repository.count_active)
+REGISTRY.gauge("chainreaction_pr_analyses_queued", "PRs with a coalesced follow-up analysis waiting",
+               fn=lambda: lease_repository.count_active(pending_only=True))
+
+SPECULATIVE_ACTIONS = {"opened", "synchronize", "reopened"}
 
 TRIGGER_PHRASES = [
     "@ChAIn-Reaction-Bot",
@@ -53,6 +70,23 @@ EXTERNAL_TRIGGER_PHRASES = [
     "cross-repo",
 ]
 
+# bypass the cached report of an earlier run on the same head
+FORCE_TRIGGER_PHRASES = [
+    "@chain-reaction-bot : force analysis",
+    "@chain-reaction-bot : force analyze impact",
+    "force analysis",
+    "force impact analysis",
+    "force chain reaction",
+    "force analyze pr",
+]
+
+FORCE_EXTERNAL_TRIGGER_PHRASES = [
+    "@chain-reaction-bot : force cross-repo impact",
+    "@chain-reaction-bot : force external impact",
+    "force cross-repo impact",
+    "force external impact",
+]
+
 
 def _verify_signature(secret: str, body: bytes, signature: str) -> bool:
     if not secret or not signature:
@@ -74,21 +108,100 @@ def _is_external_trigger(comment_body: str) -> bool:
     if not comment_body:
         return False
     cl = comment_body.lower()
-    return cl in EXTERNAL_TRIGGER_PHRASES
+    return cl in EXTERNAL_TRIGGER_PHRASES or cl in FORCE_EXTERNAL_TRIGGER_PHRASES
+
+def _is_force_trigger(comment_body: str) -> bool:
+    if not comment_body:
+        return False
+    cl = comment_body.lower()
+    return cl in FORCE_TRIGGER_PHRASES or cl in FORCE_EXTERNAL_TRIGGER_PHRASES
+
+@contextmanager
+def _lease_heartbeat(key: str, owner: str):
+    # slow runs (LLM retries, waiting for a pre-analysis) outlive the TTL
+    stop = threading.Event()
 
-def _run_and_manage(repo_name, pr_no, clone_url, key, external_only: bool = False):
-    ACTIVE_ANALYSES.add(key)
+    def renew():
+        while not stop.wait(LEASE_RENEW_SECONDS):
+            try:
+                if not lease_repository.renew(key, owner, LEASE_TTL_SECONDS):
+                    log.warning(f"Analysis lease for {key} was taken over")
+                    return
+            except Exception as e:
+                log.warning(f"Could not renew the analysis lease for {key}: {e}")
+
+    thread = threading.Thread(target=renew, name=f"lease-{key}", daemon=True)
+    thread.start()
     try:
-        pr_service.analyze_pr(repo_name, pr_no, clone_url, external_only)
+        yield
     finally:
-        try:
-            ACTIVE_ANALYSES.remove(key)
-        except KeyError:
-            pass
+        stop.set()
+
+
+def _run_and_manage(repo_name, pr_no, clone_url, key, owner, external_only: bool = False, force: bool = False):
+    # the lease is held across follow-ups; triggers that arrived during a run
+    # are served by one more run against the then-current head, also when
+    # the run before it failed
+    with _lease_heartbeat(key, owner):
+        while True:
+            try:
+                pr_service.analyze_pr(repo_name, pr_no, clone_url, external_only, force)
+            except Exception as e:
+                log.error(f"Analysis of {key} failed: {e}", exc_info=True)
+            follow_up = lease_repository.release_or_continue(key, owner, LEASE_TTL_SECONDS)
+            if not follow_up:
+                return
+            external_only, force = follow_up["external_only"], follow_up["force"]
+            log.info(f"Running coalesced follow-up analysis for {key} (external_only={external_only})")
+
+
+def _acquire_or_coalesce(key: str, owner: str, external_only: bool, force: bool) -> bool:
+    # True when this request owns the lease; False when it was folded into
+    # the follow-up of the run in progress
+    for _ in range(3):
+        if lease_repository.acquire(key, owner, LEASE_TTL_SECONDS):
+            return True
+        if lease_repository.request_follow_up(key, external_only, force):
+            return False
+    raise RuntimeError(f"Could not acquire or join the analysis lease for {key}")
+
+
+def _handle_pull_request_event(payload: dict):
+    action = payload.get("action")
+    if not pr_service.speculative_enabled or action not in SPECULATIVE_ACTIONS:
+        log.info(f"Skipping event=pull_request action={action}")
+        return jsonify({"message": "ignored"}), 200
+
+    pr = payload.get("pull_request", {})
+    repo = payload.get("repository", {})
+    repo_full_name = repo.get("full_name")
+    pr_number = pr.get("number")
+    head_sha = (pr.get("head") or {}).get("sha")
+    if not repo_full_name or not pr_number or not head_sha:
+        log.warning("Missing repo, PR number or head sha")
+        return jsonify({"error": "missing_info"}), 400
+
+    tracing.set_attributes(repo=repo_full_name, pr_number=pr_number, action=action)
+    # a bounded pool; a newer push to the same PR supersedes the queued run
+    if not pr_service.queue_speculative(repo_full_name, pr_number, repo.get("clone_url"), head_sha):
+        return jsonify({"message": "already_prefetched"}), 200
+    log.info(f"Queued pre-analysis for {repo_full_name}#{pr_number}@{head_sha[:7]}")
+    return jsonify({"message": "prefetching"}), 202
 
 
 @pr_bp.route("/webhook/pr", methods=["POST"])
 def handle_pr_event():
+    # the delivery GUID doubles as the trace id so a trace can be matched
+    # with GitHub's delivery log
+    delivery = request.headers.get("X-GitHub-Delivery")
+    with tracing.span("webhook.pr", trace_id=delivery, event=request.headers.get("X-GitHub-Event")) as sp:
+        response, status = _handle_pr_event()
+        sp.set(status_code=status)
+    response.headers["X-Trace-Id"] = sp.trace_id
+    return response, status
+
+
+def _handle_pr_event():
     try:
         raw_body = request.get_data()
         
@@ -102,6 +215,8 @@ def handle_pr_event():
         
         event = request.headers.get("X-GitHub-Event")
         action = payload.get("action")
+        if event == "pull_request":
+            return _handle_pull_request_event(payload)
         if event != "issue_comment" or action != "created":
             log.info(f"Skipping event={event} action={action}")
             return jsonify({"message": "ignored"}), 200
@@ -114,7 +229,7 @@ def handle_pr_event():
         comment = payload.get("comment", {})
         comment_body = comment.get("body", "")
 
-        if not (_is_trigger_phrase(comment_body) or _is_external_trigger(comment_body)):
+        if not (_is_trigger_phrase(comment_body) or _is_external_trigger(comment_body) or _is_force_trigger(comment_body)):
             return jsonify({"message": "ignored"}), 200
         
 
@@ -127,17 +242,20 @@ def handle_pr_event():
             log.warning("Missing repo or PR number")
             return jsonify({"error": "missing_info"}), 400
         
+        external_only = _is_external_trigger(comment_body)
+        force = _is_force_trigger(comment_body)
+
+        tracing.set_attributes(repo=repo_full_name, pr_number=pr_number, external_only=external_only, force=force)
         key = f"{repo_full_name}#{pr_number}"
-        if key in ACTIVE_ANALYSES:
-            log.info(f"Analysis already in progress for {key}, skipping")
-            return jsonify({"message": "already_in_progress"}), 200
-        
-        run_async(notification_service.post_acknowledgement, repo_full_name, pr_number)
+        owner = uuid.uuid4().hex
+        if not _acquire_or_coalesce(key, owner, external_only, force):
+            log.info(f"Analysis already in progress for {key}, coalesced into a follow-up run")
+            return jsonify({"message": "coalesced"}), 202
 
-        external_only = _is_external_trigger(comment_body)
+        run_async(notification_service.post_acknowledgement, repo_full_name, pr_number)
 
-        run_async(_run_and_manage, repo_full_name, pr_number, clone_url, key, external_only)
-        log.info(f"Queued analysis for {repo_full_name}#{pr_number} (external_only={external_only})")
+        run_async(_run_and_manage, repo_full_name, pr_number, clone_url, key, owner, external_only, force)
+        log.info(f"Queued analysis for {repo_full_name}#{pr_number} (external_only={external_only}, force={force})")
 
         return jsonify({"message": "queued"}), 202
         
@@ -1,17 +1,42 @@
 import os
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Mapping, Union
+
+Source = Union[bytes, str]
+
 
 class BaseExtractor:
 
     EXTENSIONS = []
 
+    def matches(self, path: str) -> bool:
+        return any(path.endswith(ext) for ext in self.EXTENSIONS)
+
     def detect_files(self, repo_path: str) -> List[str]:
         matches = []
         for root, _, files in os.walk(repo_path):
             for f in files:
-                if any(f.endswith(ext) for ext in self.EXTENSIONS):
+                if self.matches(f):
                     matches.append(os.path.join(root, f))
         return matches
 
+    def detect_sources(self, sources: Mapping[str, Source]) -> List[str]:
+        return sorted(rel for rel in sources if self.matches(rel))
+
     def extract(self, repo_id: str, repo_path: str, repo_name: str) -> Tuple[List[Dict], List[Tuple]]:
-        raise NotImplementedError("extract() must be implemented by subclass")
\ No newline at end of file
+        raise NotImplementedError("extract() must be implemented by subclass")
+
+    def extract_file(self, repo_id: str, repo_name: str, relpath: str, src: str) -> Tuple[List[Dict], List[Tuple]]:
+        raise NotImplementedError("extract_file() must be implemented by subclass")
+
+    def extract_sources(self, repo_id: str, sources: Mapping[str, Source], repo_name: str) -> Tuple[List[Dict], List[Tuple]]:
+        # same output as extract(), but from an in-memory {relpath: content} mapping
+        entities = []
+        edges = []
+        for rel in self.detect_sources(sources):
+            src = sources[rel]
+            if isinstance(src, bytes):
+                src = src.decode("utf-8")
+            file_nodes, file_edges = self.extract_file(repo_id, repo_name, rel, src)
+            entities.extend(file_nodes)
+            edges.extend(file_edges)
+        return entities, edges
@@ -0,0 +1,39 @@
+import hashlib
+import json
+from typing import List, Tuple
+
+
+def body_hash(src: bytes, start: int, end: int, excluded: List[Tuple[int, int]] = (),
+              significant_indent: bool = False) -> str:
+    # nested entities and comments are cut out so that a container only
+    # changes hash when its own code changes, and formatting is ignored
+    parts = []
+    cursor = start
+    for s, e in sorted(excluded):
+        if s < cursor:
+            continue
+        parts.append(src[cursor:s])
+        cursor = e
+    parts.append(src[cursor:end])
+    text = b" ".join(parts).decode("utf-8", errors="replace")
+    if significant_indent:
+        # keep the indentation, only runs of whitespace inside a line collapse
+        normalized = "\n".join(line[:len(line) - len(line.lstrip())] + " ".join(line.split())
+                                for line in text.splitlines() if line.strip())
+    else:
+        normalized = " ".join(text.split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def build_meta(**fields) -> str:
+    return json.dumps(fields, sort_keys=True)
+
+
+def parse_meta(meta) -> dict:
+    if isinstance(meta, dict):
+        return meta
+    try:
+        parsed = json.loads(meta or "{}")
+        return parsed if isinstance(parsed, dict) else {}
+    except (TypeError, ValueError):
+        return {}
@@ -1,8 +1,10 @@
 import os
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Mapping
 
+from src.extractor.base_extractor import Source
 from src.extractor.java.java_extractor import JavaExtractor
 from src.extractor.python.python_extractor import PythonExtractor
+from src.util import tracing
 
 
 class ExtractorRouter:
@@ -13,6 +15,19 @@ class ExtractorRouter:
             PythonExtractor(),
         ]
 
+    @staticmethod
+    def _repo_entity(repo_id: str, repo_name: str) -> Dict:
+        return {
+            "uid": f"{repo_name}::repo",
+            "repo_id": repo_id,
+            "repo_name": repo_name,
+            "kind": "repo",
+            "name": repo_name,
+            "language": "",
+            "path": "",
+            "meta": "{}",
+        }
+
     def extract_repo(self, repo_id: str, repo_path: str, repo_name: str) -> Tuple[List[Dict], List[Tuple]]:
         all_entities = []
         all_edges = []
@@ -23,19 +38,31 @@ class ExtractorRouter:
             if not files:
                 continue
 
-            entities, edges = ext.extract(repo_id, repo_path, repo_name)
+            with tracing.span(f"extract.{ext.__class__.__name__}", file_count=len(files)) as sp:
+                entities, edges = ext.extract(repo_id, repo_path, repo_name)
+                sp.set(node_count=len(entities), edge_count=len(edges))
             all_entities.extend(entities)
             all_edges.extend(edges)
 
-        all_entities.append({
-            "uid": f"{repo_name}::repo",
-            "repo_id": repo_id,
-            "repo_name": repo_name,
-            "kind": "repo",
-            "name": repo_name,
-            "language": "",
-            "path": "",
-            "meta": "{}",
-        })
+        all_entities.append(self._repo_entity(repo_id, repo_name))
+
+        return all_entities, all_edges
+
+    def extract_sources(self, repo_id: str, sources: Mapping[str, Source], repo_name: str) -> Tuple[List[Dict], List[Tuple]]:
+        all_entities = []
+        all_edges = []
+
+        for ext in self.extractors:
+            files = ext.detect_sources(sources)
+            if not files:
+                continue
+
+            with tracing.span(f"extract.{ext.__class__.__name__}", file_count=len(files)) as sp:
+                entities, edges = ext.extract_sources(repo_id, sources, repo_name)
+                sp.set(node_count=len(entities), edge_count=len(edges))
+            all_entities.extend(entities)
+            all_edges.extend(edges)
+
+        all_entities.append(self._repo_entity(repo_id, repo_name))
 
         return all_entities, all_edges
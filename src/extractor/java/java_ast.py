@@ -1,12 +1,16 @@
 from tree_sitter import Node
 from src.util.debug import dbg
+from src.extractor.entity_meta import body_hash, build_meta
 
 class JavaAST:
+    COMMENT_TYPES = {"comment", "line_comment", "block_comment"}
+
     def __init__(self, repo_id:str, repo_name: str, relpath: str, src: str):
         self.repo_id = repo_id
         self.repo_name = repo_name
         self.path = relpath
         self.src = src
+        self.src_bytes = src.encode("utf-8")
 
     def text(self, node):
         try:
@@ -25,7 +29,7 @@ class JavaAST:
 
         # file node
         file_uid = self.uid("file", self.path)
-        entities.append({
+        file_entity = {
             "uid": file_uid,
             "repo_id": self.repo_id,
             "repo_name": self.repo_name,
@@ -34,10 +38,25 @@ class JavaAST:
             "language": "java",
             "path": self.path,
             "meta": "{}",
-        })
+        }
+        entities.append(file_entity)
 
         class_stack = []
         method_stack = []
+        # spans excluded from the body hash of each open entity (file first)
+        span_stack = [[]]
+
+        def enter(node):
+            span_stack[-1].append((node.start_byte, node.end_byte))
+            span_stack.append([])
+
+        def leave(node, entity):
+            excluded = span_stack.pop()
+            entity["meta"] = build_meta(
+                body_hash=body_hash(self.src_bytes, node.start_byte, node.end_byte, excluded),
+                start_line=node.start_point[0] + 1,
+                end_line=node.end_point[0] + 1,
+            )
 
         # DFS
         counter = {"visited": 0}
@@ -49,6 +68,10 @@ class JavaAST:
 
             t = node.type
 
+            if t in self.COMMENT_TYPES:
+                span_stack[-1].append((node.start_byte, node.end_byte))
+                return
+
             # CLASS        
             if t == "class_declaration":
                 dbg("FOUND CLASS DECLARATION")
@@ -59,7 +82,7 @@ class JavaAST:
 
                 class_uid = self.uid("class", cname)
 
-                entities.append({
+                entity = {
                     "uid": class_uid,
                     "repo_id": self.repo_id,
                     "repo_name": self.repo_name,
@@ -68,13 +91,16 @@ class JavaAST:
                     "language": "java",
                     "path": self.path,
                     "meta": "{}",
-                })
+                }
+                entities.append(entity)
                 edges.append((file_uid, class_uid, "CONTAINS"))
                 class_stack.append(class_uid)
+                enter(node)
 
                 for c in node.children:
                     visit(c)
 
+                leave(node, entity)
                 class_stack.pop()
                 return
 
@@ -89,7 +115,7 @@ class JavaAST:
                 parent = class_stack[-1] if class_stack else file_uid
                 method_uid = self.uid("method", mname)
 
-                entities.append({
+                entity = {
                     "uid": method_uid,
                     "repo_id": self.repo_id,
                     "repo_name": self.repo_name,
@@ -98,14 +124,17 @@ class JavaAST:
                     "language": "java",
                     "path": self.path,
                     "meta": "{}",
-                })
+                }
+                entities.append(entity)
 
                 edges.append((parent, method_uid, "CONTAINS"))
                 method_stack.append(method_uid)
+                enter(node)
 
                 for c in node.children:
                     visit(c)
 
+                leave(node, entity)
                 method_stack.pop()
                 return
 
@@ -128,6 +157,11 @@ class JavaAST:
                 visit(c)
 
         visit(root)
+        file_entity["meta"] = build_meta(
+            body_hash=body_hash(self.src_bytes, root.start_byte, root.end_byte, span_stack[0]),
+            start_line=root.start_point[0] + 1,
+            end_line=root.end_point[0] + 1,
+        )
 
         dbg("JavaAST.walk FINISHED. Nodes:", len(entities), "Edges:", len(edges), "Visited nodes:", counter["visited"])
         return entities, edges
\ No newline at end of file
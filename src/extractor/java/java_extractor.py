@@ -11,6 +11,19 @@ class JavaExtractor(BaseExtractor):
         dbg("JavaExtractor: initializing parser for java")
         self.parser = get_parser("java")
 
+    def extract_file(self, repo_id: str, repo_name: str, relpath: str, src: str):
+        dbg(f"Parsing file {relpath}, len={len(src)}")
+
+        tree = self.parser.parse(src.encode("utf-8"))
+        root = tree.root_node
+        dbg("Root node type:", root.type)
+
+        ast = JavaAST(repo_id, repo_name, relpath, src)
+        file_nodes, file_edges = ast.walk(root)
+
+        dbg(f"File {relpath}: extracted {len(file_nodes)} nodes, {len(file_edges)} edges")
+        return file_nodes, file_edges
+
     def extract(self, repo_id: str, repo_path: str, repo_name: str):
         dbg("JavaExtractor.extract repo_path=", repo_path)
 
@@ -26,16 +39,7 @@ class JavaExtractor(BaseExtractor):
             with open(path, "r", encoding="utf-8") as f:
                 src = f.read()
 
-            dbg(f"Parsing file {rel}, len={len(src)}")
-
-            tree = self.parser.parse(src.encode("utf-8"))
-            root = tree.root_node
-            dbg("Root node type:", root.type)
-
-            ast = JavaAST(repo_id, repo_name, rel, src)
-            file_nodes, file_edges = ast.walk(root)
-
-            dbg(f"File {rel}: extracted {len(file_nodes)} nodes, {len(file_edges)} edges")
+            file_nodes, file_edges = self.extract_file(repo_id, repo_name, rel, src)
 
             entities.extend(file_nodes)
             edges.extend(file_edges)
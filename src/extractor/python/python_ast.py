@@ -1,11 +1,15 @@
 from tree_sitter import Node
+from src.extractor.entity_meta import body_hash, build_meta
 
 class PythonAST:
+    COMMENT_TYPES = {"comment"}
+
     def __init__(self, repo_id: str, repo_name: str, relpath: str, src: str):
         self.repo_id = repo_id
         self.repo_name = repo_name
         self.path = relpath
         self.src = src
+        self.src_bytes = src.encode("utf-8")
 
     def text(self, node):
         return self.src[node.start_byte:node.end_byte]
@@ -18,7 +22,7 @@ class PythonAST:
         edges = []
 
         file_uid = self.uid("file", self.path)
-        entities.append({
+        file_entity = {
             "uid": file_uid,
             "repo_id": self.repo_id,
             "repo_name": self.repo_name,
@@ -27,20 +31,39 @@ class PythonAST:
             "language": "python",
             "path": self.path,
             "meta": "{}",
-        })
+        }
+        entities.append(file_entity)
 
         class_stack = []
         method_stack = []
+        # spans excluded from the body hash of each open entity (file first)
+        span_stack = [[]]
+
+        def enter(node):
+            span_stack[-1].append((node.start_byte, node.end_byte))
+            span_stack.append([])
+
+        def leave(node, entity):
+            excluded = span_stack.pop()
+            entity["meta"] = build_meta(
+                body_hash=body_hash(self.src_bytes, node.start_byte, node.end_byte, excluded, significant_indent=True),
+                start_line=node.start_point[0] + 1,
+                end_line=node.end_point[0] + 1,
+            )
 
         def visit(node):
             t = node.type
 
+            if t in self.COMMENT_TYPES:
+                span_stack[-1].append((node.start_byte, node.end_byte))
+                return
+
             if t == "class_definition":
                 id_node = node.child_by_field_name("name")
                 cname = self.text(id_node) if id_node else "<anon_class>"
                 class_uid = self.uid("class", cname)
 
-                entities.append({
+                entity = {
                     "uid": class_uid,
                     "repo_id": self.repo_id,
                     "repo_name": self.repo_name,
@@ -49,14 +72,17 @@ class PythonAST:
                     "language": "python",
                     "path": self.path,
                     "meta": "{}",
-                })
+                }
+                entities.append(entity)
 
                 edges.append((file_uid, class_uid, "CONTAINS"))
                 class_stack.append(class_uid)
+                enter(node)
 
                 for c in node.children:
                     visit(c)
 
+                leave(node, entity)
                 class_stack.pop()
                 return
 
@@ -66,7 +92,7 @@ class PythonAST:
                 parent = class_stack[-1] if class_stack else file_uid
                 method_uid = self.uid("method", fname)
 
-                entities.append({
+                entity = {
                     "uid": method_uid,
                     "repo_id": self.repo_id,
                     "repo_name": self.repo_name,
@@ -75,14 +101,17 @@ class PythonAST:
                     "language": "python",
                     "path": self.path,
                     "meta": "{}",
-                })
+                }
+                entities.append(entity)
 
                 edges.append((parent, method_uid, "CONTAINS"))
                 method_stack.append(method_uid)
+                enter(node)
 
                 for c in node.children:
                     visit(c)
 
+                leave(node, entity)
                 method_stack.pop()
                 return
 
@@ -98,4 +127,9 @@ class PythonAST:
                 visit(c)
 
         visit(root)
-        return entities, edges
\ No newline at end of file
+        file_entity["meta"] = build_meta(
+            body_hash=body_hash(self.src_bytes, root.start_byte, root.end_byte, span_stack[0], significant_indent=True),
+            start_line=root.start_point[0] + 1,
+            end_line=root.end_point[0] + 1,
+        )
+        return entities, edges
@@ -9,6 +9,11 @@ class PythonExtractor(BaseExtractor):
     def __init__(self):
         self.parser = get_parser("python")
 
+    def extract_file(self, repo_id: str, repo_name: str, relpath: str, src: str):
+        tree = self.parser.parse(src.encode("utf-8"))
+        ast = PythonAST(repo_id, repo_name, relpath, src)
+        return ast.walk(tree.root_node)
+
     def extract(self, repo_id: str, repo_path: str, repo_name: str):
         entities = []
         edges = []
@@ -19,11 +24,8 @@ class PythonExtractor(BaseExtractor):
             with open(path, "r", encoding="utf-8") as f:
                 src = f.read()
 
-            tree = self.parser.parse(src.encode("utf-8"))
-            ast = PythonAST(repo_id, repo_name, rel, src)
-
-            file_nodes, file_edges = ast.walk(tree.root_node)
+            file_nodes, file_edges = self.extract_file(repo_id, repo_name, rel, src)
             entities.extend(file_nodes)
             edges.extend(file_edges)
 
-        return entities, edges
\ No newline at end of file
+        return entities, edges
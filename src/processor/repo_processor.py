@@ -2,9 +2,10 @@ import tempfile
 import os
 import shutil
 import git
-from typing import List, Tuple
+from typing import List, Tuple, Mapping
 from src.util.logger import log
 from src.model.graph_model import GraphNode, GraphEdge
+from src.extractor.base_extractor import Source
 from src.extractor.extract_repo import ExtractorRouter
 
 
@@ -34,7 +35,14 @@ class RepoProcessor:
 
     def process(self, repo_id: str, repo_path: str, repo_name: str) -> Tuple[List[GraphNode], List[GraphEdge]]:
         entities_raw, edges_raw = self.router.extract_repo(repo_id, repo_path, repo_name)
+        return self._to_graph(entities_raw, edges_raw)
 
+    def process_sources(self, repo_id: str, sources: Mapping[str, Source], repo_name: str) -> Tuple[List[GraphNode], List[GraphEdge]]:
+        entities_raw, edges_raw = self.router.extract_sources(repo_id, sources, repo_name)
+        return self._to_graph(entities_raw, edges_raw)
+
+    @staticmethod
+    def _to_graph(entities_raw, edges_raw) -> Tuple[List[GraphNode], List[GraphEdge]]:
         node_objs: List[GraphNode] = []
         edge_objs: List[GraphEdge] = []
 
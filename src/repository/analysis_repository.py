@@ -0,0 +1,74 @@
+import datetime
+import hashlib
+import json
+from sqlalchemy import Column, Integer, String, Text, DateTime
+from src.repository.user_repository import Base, SessionLocal, engine
+from src.util.logger import log
+
+
+class AnalysisResult(Base):
+    __tablename__ = "analysis_results"
+    cache_key = Column(String, primary_key=True)
+    repo_full_name = Column(String, nullable=False, index=True)
+    pr_number = Column(Integer, nullable=False)
+    head_sha = Column(String, nullable=False)
+    mode = Column(String, nullable=False)
+    generations = Column(Text, nullable=False)
+    delta = Column(Text)
+    impacted = Column(Text)
+    report = Column(Text)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+
+def create_tables():
+    Base.metadata.create_all(bind=engine, tables=[AnalysisResult.__table__])
+
+
+class AnalysisRepository:
+    def __init__(self):
+        try:
+            create_tables()
+        except Exception:
+            log.warning("Could not create analysis_results table on init; ensure DB is reachable")
+        self._Session = SessionLocal
+
+    @staticmethod
+    def cache_key(repo_full_name: str, head_sha: str, mode: str) -> str:
+        return hashlib.sha256(f"{repo_full_name}|{head_sha}|{mode}".encode("utf-8")).hexdigest()
+
+    def get_result(self, repo_full_name: str, head_sha: str, mode: str):
+        session = self._Session()
+        try:
+            row = session.get(AnalysisResult, self.cache_key(repo_full_name, head_sha, mode))
+            if not row:
+                return None
+            return {
+                "generations": json.loads(row.generations),
+                "delta": json.loads(row.delta) if row.delta else None,
+                "impacted": json.loads(row.impacted) if row.impacted else None,
+                "report": row.report,
+                "created_at": row.created_at,
+            }
+        finally:
+            session.close()
+
+    def save_result(self, repo_full_name: str, pr_number: int, head_sha: str, mode: str,
+                    generations: dict, delta: dict, impacted: list, report: str | None):
+        session = self._Session()
+        try:
+            row = AnalysisResult(
+                cache_key=self.cache_key(repo_full_name, head_sha, mode),
+                repo_full_name=repo_full_name,
+                pr_number=pr_number,
+                head_sha=head_sha,
+                mode=mode,
+                generations=json.dumps(generations, sort_keys=True),
+                delta=json.dumps(delta, default=str),
+                impacted=json.dumps(impacted, default=str),
+                report=report,
+                created_at=datetime.datetime.utcnow(),
+            )
+            session.merge(row)
+            session.commit()
+        finally:
+            session.close()
@@ -0,0 +1,125 @@
+import datetime
+from sqlalchemy import Column, String, Boolean, DateTime, case, func, literal, select, update
+from sqlalchemy.dialects.postgresql import insert
+from src.repository.user_repository import Base, SessionLocal, engine
+from src.util.logger import log
+
+
+class AnalysisLease(Base):
+    __tablename__ = "analysis_leases"
+    key = Column(String, primary_key=True)
+    owner = Column(String, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    pending = Column(Boolean, nullable=False, default=False)
+    pending_external = Column(Boolean, nullable=False, default=False)
+    pending_force = Column(Boolean, nullable=False, default=False)
+
+
+def create_tables():
+    Base.metadata.create_all(bind=engine, tables=[AnalysisLease.__table__])
+
+
+class LeaseRepository:
+    """Postgres-backed analysis leases shared by every worker process.
+
+    A lease expires on its own, so a worker that dies mid-run cannot block a
+    PR forever; a live holder renews it while it runs. Triggers that arrive
+    while a lease is held set the pending flags, and the holder runs one
+    follow-up for all of them.
+    """
+
+    def __init__(self):
+        try:
+            create_tables()
+        except Exception:
+            log.warning("Could not create analysis_leases table on init; ensure DB is reachable")
+        self._Session = SessionLocal
+
+    def acquire(self, key: str, owner: str, ttl_seconds: int) -> bool:
+        expires = func.now() + datetime.timedelta(seconds=ttl_seconds)
+        stmt = insert(AnalysisLease).values(
+            key=key, owner=owner, expires_at=expires,
+            pending=False, pending_external=False, pending_force=False,
+        )
+        # take over only leases whose holder has gone away; the triggers it
+        # had queued stay pending and become the new holder's follow-up
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[AnalysisLease.key],
+            set_={"owner": owner, "expires_at": expires},
+            where=AnalysisLease.expires_at < func.now(),
+        ).returning(AnalysisLease.owner)
+        session = self._Session()
+        try:
+            row = session.execute(stmt).first()
+            session.commit()
+            return bool(row and row[0] == owner)
+        finally:
+            session.close()
+
+    def request_follow_up(self, key: str, external_only: bool, force: bool) -> bool:
+        stmt = (
+            update(AnalysisLease)
+            .where(AnalysisLease.key == key, AnalysisLease.expires_at >= func.now())
+            .values(pending=True,
+                    # a queued full analysis is never narrowed to external-only
+                    pending_external=case(
+                        (AnalysisLease.pending, AnalysisLease.pending_external & literal(external_only)),
+                        else_=literal(external_only)),
+                    pending_force=AnalysisLease.pending_force | force)
+        )
+        session = self._Session()
+        try:
+            result = session.execute(stmt)
+            session.commit()
+            return result.rowcount > 0
+        finally:
+            session.close()
+
+    def renew(self, key: str, owner: str, ttl_seconds: int) -> bool:
+        stmt = (
+            update(AnalysisLease)
+            .where(AnalysisLease.key == key, AnalysisLease.owner == owner)
+            .values(expires_at=func.now() + datetime.timedelta(seconds=ttl_seconds))
+        )
+        session = self._Session()
+        try:
+            result = session.execute(stmt)
+            session.commit()
+            return result.rowcount > 0
+        finally:
+            session.close()
+
+    def release_or_continue(self, key: str, owner: str, ttl_seconds: int) -> dict | None:
+        session = self._Session()
+        try:
+            lease = session.execute(
+                select(AnalysisLease)
+                .where(AnalysisLease.key == key, AnalysisLease.owner == owner)
+                .with_for_update()
+            ).scalar_one_or_none()
+            if lease is None:
+                session.commit()
+                return None
+            if not lease.pending:
+                session.delete(lease)
+                session.commit()
+                return None
+            follow_up = {"external_only": lease.pending_external, "force": lease.pending_force}
+            lease.pending = False
+            lease.pending_external = False
+            lease.pending_force = False
+            lease.expires_at = func.now() + datetime.timedelta(seconds=ttl_seconds)
+            session.commit()
+            return follow_up
+        finally:
+            session.close()
+
+    def count_active(self, pending_only: bool = False) -> int:
+        stmt = select(func.count()).select_from(AnalysisLease).where(AnalysisLease.expires_at >= func.now())
+        if pending_only:
+            stmt = stmt.where(AnalysisLease.pending.is_(True))
+        session = self._Session()
+        try:
+            return session.execute(stmt).scalar_one()
+        finally:
+            session.close()
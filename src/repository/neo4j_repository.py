@@ -1,11 +1,17 @@
 import os
-from typing import List, Dict, Any
+from typing import Any, Dict, Iterator, List
 from neo4j import GraphDatabase
 from neo4j.exceptions import ServiceUnavailable
 from src.model.graph_model import GraphNode, GraphEdge
+from src.util.metrics import REGISTRY
 
 BATCH_SIZE = 200
 
+STORE_GRAPH_SECONDS = REGISTRY.histogram(
+    "chainreaction_store_graph_seconds", "Time spent writing a graph to Neo4j by phase", ["phase"])
+STORED_ITEMS_TOTAL = REGISTRY.counter(
+    "chainreaction_store_graph_items_total", "Nodes and edges written to Neo4j", ["kind"])
+
 class Neo4jRepository:
     def __init__(self):
         uri = os.getenv("NEO4J_URI", "neo4j://127.0.0.1:7687")
@@ -27,6 +33,10 @@ class Neo4jRepository:
         with self.driver.session() as s:
             s.run("CREATE CONSTRAINT IF NOT EXISTS FOR (r:Repo) REQUIRE r.uid IS UNIQUE")
             s.run("CREATE CONSTRAINT IF NOT EXISTS FOR (e:Entity) REQUIRE e.uid IS UNIQUE")
+            s.run("CREATE INDEX entity_repo_path IF NOT EXISTS FOR (e:Entity) ON (e.repo_id, e.path)")
+            s.run("CREATE FULLTEXT INDEX entity_search IF NOT EXISTS FOR (e:Entity) ON EACH [e.name, e.path]")
+            # repos ingested before generations existed would otherwise never be cached
+            s.run("MATCH (r:Repo) WHERE r.graph_generation IS NULL SET r.graph_generation = randomUUID()")
 
     def store_graph(self, nodes: List[GraphNode], edges: List[GraphEdge]):
         if not nodes:
@@ -46,7 +56,7 @@ class Neo4jRepository:
                 "created_at": n.created_at,
             })
 
-        with self.driver.session() as session:
+        with STORE_GRAPH_SECONDS.time(phase="nodes"), self.driver.session() as session:
             for i in range(0, len(node_dicts), BATCH_SIZE):
                 batch = node_dicts[i:i+BATCH_SIZE]
 
@@ -71,7 +81,7 @@ class Neo4jRepository:
                 )
 
 
-        with self.driver.session() as session:
+        with STORE_GRAPH_SECONDS.time(phase="edges"), self.driver.session() as session:
             for e in edges:
                 q = f"""
                 MATCH (a {{uid: $src}})
@@ -80,6 +90,33 @@ class Neo4jRepository:
                 """
                 session.run(q, src=e.src, dst=e.dst)
 
+        with STORE_GRAPH_SECONDS.time(phase="generations"):
+            self.bump_graph_generations({n.repo_id for n in nodes if n.repo_id})
+        STORED_ITEMS_TOTAL.inc(len(nodes), kind="node")
+        STORED_ITEMS_TOTAL.inc(len(edges), kind="edge")
+
+    def bump_graph_generations(self, repo_ids):
+        # a random token rather than a counter, so values stay unique even
+        # after clear_all() wipes the Repo nodes
+        if not repo_ids:
+            return
+        q = """
+        MATCH (r:Repo)
+        WHERE r.repo_id IN $repo_ids
+        SET r.graph_generation = randomUUID()
+        """
+        with self.driver.session() as s:
+            s.run(q, repo_ids=list(repo_ids))
+
+    def get_graph_generations(self, repo_ids: List[str]) -> Dict[str, str]:
+        q = """
+        MATCH (r:Repo)
+        WHERE r.repo_id IN $repo_ids
+        RETURN r.repo_id AS repo_id, r.graph_generation AS generation
+        """
+        with self.driver.session() as s:
+            return {r["repo_id"]: r["generation"] for r in s.run(q, repo_ids=list(repo_ids))}
+
 
     def get_all_nodes(self):
         q = """
@@ -149,6 +186,24 @@ class Neo4jRepository:
         with self.driver.session() as s:
             return [dict(r) for r in s.run(q, name=name)]
     
+    def search_entities(self, query: str, kinds: List[str] = None, repo_ids: List[str] = None,
+                        limit: int = 20) -> List[dict]:
+        where = []
+        if kinds:
+            where.append("node.kind IN $kinds")
+        if repo_ids:
+            where.append("node.repo_id IN $repo_ids")
+        q = f"""
+        CALL db.index.fulltext.queryNodes('entity_search', $query) YIELD node, score
+        {"WHERE " + " AND ".join(where) if where else ""}
+        RETURN node.uid AS uid, node.name AS name, node.kind AS kind, node.path AS path,
+               node.repo_id AS repoId, node.repo_name AS repoName, score
+        ORDER BY score DESC, size(node.name), node.uid
+        LIMIT $limit
+        """
+        with self.driver.session() as s:
+            return [dict(r) for r in s.run(q, query=query, kinds=kinds, repo_ids=repo_ids, limit=limit)]
+
     def get_graph_for_repos(self, repo_ids: List[str]):
         nodes_q = """
         MATCH (n)
@@ -172,6 +227,129 @@ class Neo4jRepository:
             edges = [dict(r) for r in s.run(edges_q, repo_ids=repo_ids)]
         return {"nodes": nodes, "edges": edges}
 
+    NODE_FIELDS = "n.uid AS uid, labels(n) AS labels, n.repo AS repo, n.kind AS kind, n.name AS name"
+    GRAPH_NODE_FIELDS = """n.uid AS id,
+               n.repo_id AS repoId,
+               n.repo_name AS repoName,
+               n.kind AS type,
+               n.name AS name,
+               n.path AS path,
+               n.meta AS meta,
+               labels(n) AS labels"""
+
+    def _iter(self, q: str, **params) -> Iterator[dict]:
+        # records are yielded as the server streams them, so callers can
+        # forward them without holding the whole result in memory
+        with self.driver.session() as s:
+            for record in s.run(q, **params):
+                yield dict(record)
+
+    # every node carries exactly one of these labels (see store_graph)
+    NODE_LABELS = ("Entity", "Repo")
+
+    @classmethod
+    def _per_label(cls, var: str, branch: str) -> str:
+        # one branch per label, so each one is planned against that label's
+        # uid index instead of scanning every node
+        return "\n            UNION ALL".join(
+            branch.replace(f"({var})", f"({var}:{label})", 1) for label in cls.NODE_LABELS)
+
+    def iter_nodes(self, repo_ids: List[str] = None, after: str = None, limit: int = None,
+                   graph_fields: bool = False) -> Iterator[dict]:
+        # keyset pagination: ordered by uid, resuming after the last uid seen
+        fields = self.GRAPH_NODE_FIELDS if graph_fields else self.NODE_FIELDS
+        where = ["n.uid > $after"] if limit else []
+        if repo_ids is not None:
+            where.append("n.repo_id IN $repo_ids")
+        branch = f"""
+            MATCH (n)
+            {"WHERE " + " AND ".join(where) if where else ""}
+            RETURN n"""
+        if limit:
+            # the range predicate on uid makes each branch an ordered index
+            # seek that stops after $limit rows; only the merge of the two
+            # branches is sorted, over at most 2 * $limit rows
+            branch += " ORDER BY n.uid LIMIT $limit"
+        # unpaged streams skip the sort
+        q = f"""
+        CALL {{{self._per_label("n", branch)}
+        }}
+        RETURN {fields}
+        {"ORDER BY n.uid LIMIT $limit" if limit else ""}
+        """
+        return self._iter(q, repo_ids=repo_ids, after=after or "", limit=limit)
+
+    def iter_edges(self, repo_ids: List[str] = None, after: List[str] = None, limit: int = None,
+                   graph_fields: bool = False) -> Iterator[dict]:
+        # edges have no uid; (source uid, type, target uid) is their key
+        src_where = ["a.uid >= $src"] if limit else []
+        edge_where = []
+        if repo_ids is not None:
+            src_where.append("a.repo_id IN $repo_ids")
+            edge_where.append("b.repo_id IN $repo_ids")
+        src, edge_type, dst = after if after is not None else ("", None, None)
+        if after is not None:
+            edge_where.append(
+                "(a.uid > $src OR (a.uid = $src AND (type(r) > $type OR (type(r) = $type AND b.uid > $dst))))")
+        branch = f"""
+            MATCH (a)
+            {"WHERE " + " AND ".join(src_where) if src_where else ""}
+            MATCH (a)-[r]->(b)
+            {"WHERE " + " AND ".join(edge_where) if edge_where else ""}
+            RETURN a.uid AS src, type(r) AS type, b.uid AS dst"""
+        if limit:
+            # sources come off the uid index in order; only the edges of one
+            # source are sorted by (type, target uid), and the merge of the
+            # two label branches sorts at most 2 * $limit rows
+            branch += " ORDER BY src, type, dst LIMIT $limit"
+        fields = "src AS from, type, dst AS to" if graph_fields else "src, type, dst"
+        q = f"""
+        CALL {{{self._per_label("a", branch)}
+        }}
+        RETURN {fields}
+        {"ORDER BY src, type, dst LIMIT $limit" if limit else ""}
+        """
+        return self._iter(q, repo_ids=repo_ids, src=src, type=edge_type, dst=dst, limit=limit)
+
+    def get_entity(self, uid: str) -> Dict[str, Any] | None:
+        q = f"MATCH (n:Entity {{uid: $uid}}) RETURN {self.GRAPH_NODE_FIELDS}"
+        with self.driver.session() as s:
+            rec = s.run(q, uid=uid).single()
+        return dict(rec) if rec else None
+
+    def get_neighbors(self, uids: List[str], direction: str, edge_types: List[str], max_rows: int) -> List[dict]:
+        # one hop from every uid; each start is an index seek on Entity.uid
+        types = "|".join(t for t in edge_types if t in GraphEdge.ALLOWED)
+        pattern = {"out": f"-[r:{types}]->", "in": f"<-[r:{types}]-", "both": f"-[r:{types}]-"}[direction]
+        q = f"""
+        UNWIND $uids AS uid
+        MATCH (a:Entity {{uid: uid}}){pattern}(n)
+        RETURN a.uid AS via, type(r) AS edge_type, startNode(r) = a AS outgoing,
+               {self.GRAPH_NODE_FIELDS}
+        LIMIT $max_rows
+        """
+        with self.driver.session() as s:
+            return [dict(r) for r in s.run(q, uids=uids, max_rows=max_rows)]
+
+    def iter_lod_entities(self, repo_ids: List[str]) -> Iterator[dict]:
+        # the fields graph_lod groups by, with the class that contains each entity
+        q = """
+        MATCH (n:Entity)
+        WHERE n.repo_id IN $repo_ids
+        WITH n, head([(n)<-[:CONTAINS]-(c:Entity) WHERE c.kind = 'class' | c]) AS owner
+        RETURN n.uid AS uid, n.repo_id AS repo_id, n.repo_name AS repo_name, n.kind AS kind,
+               n.name AS name, n.path AS path, owner.uid AS owner_uid, owner.name AS owner_name
+        """
+        return self._iter(q, repo_ids=repo_ids)
+
+    def iter_lod_edges(self, repo_ids: List[str]) -> Iterator[dict]:
+        q = """
+        MATCH (a:Entity)-[r]->(b:Entity)
+        WHERE a.repo_id IN $repo_ids AND b.repo_id IN $repo_ids
+        RETURN a.uid AS src, type(r) AS type, b.uid AS dst
+        """
+        return self._iter(q, repo_ids=repo_ids)
+
     def create_edge(self, src_uid: str, dst_uid: str, edge_type: str) -> Dict[str, Any]:
         edge_type = (edge_type or "").upper()
         if edge_type not in GraphEdge.ALLOWED:
@@ -188,9 +366,13 @@ class Neo4jRepository:
         MATCH (a {{uid: $src}})
         MATCH (b {{uid: $dst}})
         MERGE (a)-[:{edge_type}]->(b)
+        RETURN a.repo_id AS src_repo, b.repo_id AS dst_repo
         """
 
         with self.driver.session() as s:
-            s.run(q, src=src_uid, dst=dst_uid)
+            rec = s.run(q, src=src_uid, dst=dst_uid).single()
+
+        if rec:
+            self.bump_graph_generations({rec["src_repo"], rec["dst_repo"]} - {None})
 
         return {"ok": True, "src": src_uid, "dst": dst_uid, "type": edge_type}
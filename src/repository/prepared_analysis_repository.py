@@ -0,0 +1,130 @@
+import datetime
+import json
+import time
+from sqlalchemy import Column, Integer, String, Text, DateTime, delete, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from src.repository.user_repository import Base, SessionLocal, engine
+from src.util.logger import log
+
+
+class PreparedAnalysis(Base):
+    __tablename__ = "prepared_analyses"
+    repo_full_name = Column(String, primary_key=True)
+    pr_number = Column(Integer, primary_key=True)
+    head_sha = Column(String, nullable=False)
+    status = Column(String, nullable=False)
+    payload = Column(Text)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+
+def create_tables():
+    Base.metadata.create_all(bind=engine, tables=[PreparedAnalysis.__table__])
+
+
+class PreparedAnalysisRepository:
+    """Postgres-backed results of speculative PR pre-analysis, shared by every worker.
+
+    There is one row per PR, for its latest head: beginning a newer head
+    replaces the row, which tells a run of an older head on any worker that
+    it has been superseded. A run registers with begin() before it is
+    queued, so a trigger that arrives meanwhile waits for it instead of
+    starting a second one.
+    """
+
+    RUNNING, DONE, FAILED = "running", "done", "failed"
+    POLL_SECONDS = 1.0
+
+    def __init__(self):
+        try:
+            create_tables()
+        except Exception:
+            log.warning("Could not create prepared_analyses table on init; ensure DB is reachable")
+        self._Session = SessionLocal
+
+    @staticmethod
+    def _pk(repo_full_name: str, pr_number: int, head_sha: str = None):
+        where = [PreparedAnalysis.repo_full_name == repo_full_name, PreparedAnalysis.pr_number == pr_number]
+        if head_sha is not None:
+            where.append(PreparedAnalysis.head_sha == head_sha)
+        return where
+
+    def begin(self, repo_full_name: str, pr_number: int, head_sha: str, ttl_seconds: float) -> bool:
+        # ttl_seconds bounds the run, so a worker that dies mid-run does not
+        # keep triggers waiting for it
+        expires = func.now() + datetime.timedelta(seconds=ttl_seconds)
+        stmt = insert(PreparedAnalysis).values(
+            repo_full_name=repo_full_name, pr_number=pr_number, head_sha=head_sha,
+            status=self.RUNNING, payload=None, expires_at=expires,
+        )
+        # a running or finished pre-analysis of the same head is kept
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[PreparedAnalysis.repo_full_name, PreparedAnalysis.pr_number],
+            set_={"head_sha": head_sha, "status": self.RUNNING, "payload": None, "expires_at": expires},
+            where=or_(PreparedAnalysis.head_sha != head_sha, PreparedAnalysis.status == self.FAILED,
+                      PreparedAnalysis.expires_at < func.now()),
+        ).returning(PreparedAnalysis.head_sha)
+        session = self._Session()
+        try:
+            # rows of closed PRs are only ever dropped here
+            session.execute(delete(PreparedAnalysis).where(PreparedAnalysis.expires_at < func.now()))
+            row = session.execute(stmt).first()
+            session.commit()
+            return row is not None
+        finally:
+            session.close()
+
+    def is_current(self, repo_full_name: str, pr_number: int, head_sha: str) -> bool:
+        session = self._Session()
+        try:
+            stmt = select(PreparedAnalysis.head_sha).where(*self._pk(repo_full_name, pr_number, head_sha))
+            return session.execute(stmt).first() is not None
+        finally:
+            session.close()
+
+    def complete(self, repo_full_name: str, pr_number: int, head_sha: str, result: dict | None,
+                 ttl_seconds: float):
+        # a no-op once a newer head has replaced the row
+        values = {"status": self.FAILED, "payload": None}
+        if result is not None:
+            values = {"status": self.DONE, "payload": json.dumps(result, default=str)}
+        stmt = (
+            update(PreparedAnalysis)
+            .where(*self._pk(repo_full_name, pr_number, head_sha))
+            .values(expires_at=func.now() + datetime.timedelta(seconds=ttl_seconds), **values)
+        )
+        session = self._Session()
+        try:
+            session.execute(stmt)
+            session.commit()
+        finally:
+            session.close()
+
+    def discard(self, repo_full_name: str, pr_number: int, head_sha: str):
+        session = self._Session()
+        try:
+            session.execute(delete(PreparedAnalysis).where(*self._pk(repo_full_name, pr_number, head_sha)))
+            session.commit()
+        finally:
+            session.close()
+
+    def get(self, repo_full_name: str, pr_number: int, head_sha: str, timeout: float = 0) -> dict | None:
+        # polls while another worker's run of the same head is in progress
+        deadline = time.monotonic() + (timeout or 0)
+        stmt = (
+            select(PreparedAnalysis.status, PreparedAnalysis.payload)
+            .where(*self._pk(repo_full_name, pr_number, head_sha), PreparedAnalysis.expires_at >= func.now())
+        )
+        while True:
+            session = self._Session()
+            try:
+                row = session.execute(stmt).first()
+            finally:
+                session.close()
+            if row is None or row.status == self.FAILED:
+                return None
+            if row.status == self.DONE:
+                return json.loads(row.payload)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            time.sleep(min(self.POLL_SECONDS, remaining))
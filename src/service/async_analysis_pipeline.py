@@ -0,0 +1,166 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from src.service.diff_analyzer_service import DiffAnalyzerService
+from src.util import tracing
+from src.util.logger import log
+
+_DONE = object()
+
+
+class AsyncAnalysisPipeline:
+    """PR analysis on a shared event loop, one task per changed file.
+
+    Each file is downloaded, extracted, diffed against the graph and traced
+    for impact as soon as its listing page arrives, so the stages of
+    different files overlap. The blocking clients run in a thread pool, and
+    every external dependency has its own semaphore shared by all PRs.
+    """
+
+    def __init__(self, pr_service):
+        self.pr = pr_service
+        self.limits = {
+            "github": int(os.environ.get("PIPELINE_GITHUB_CONCURRENCY",
+                                         os.environ.get("GITHUB_DOWNLOAD_WORKERS", "8"))),
+            "extract": int(os.environ.get("PIPELINE_EXTRACT_CONCURRENCY", str(os.cpu_count() or 2))),
+            "neo4j": int(os.environ.get("PIPELINE_NEO4J_CONCURRENCY", "4")),
+            "postgres": int(os.environ.get("PIPELINE_POSTGRES_CONCURRENCY", "4")),
+            "llm": int(os.environ.get("PIPELINE_LLM_CONCURRENCY", "2")),
+        }
+        self._executor = ThreadPoolExecutor(max_workers=sum(self.limits.values()), thread_name_prefix="pr-pipeline")
+        self._semaphores = {}
+        self._loop = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="pr-pipeline-loop", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def run(self, repo_full_name: str, pr_number: int, clone_url: str, external_only: bool, force: bool) -> str:
+        # blocks the calling worker thread until the analysis is done
+        coro = self._run(tracing.current_span(), repo_full_name, pr_number, clone_url, external_only, force)
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop()).result()
+
+    async def _call(self, dependency: str | None, fn, *args):
+        # dependency=None is for waits that hold no external resource
+        loop = asyncio.get_running_loop()
+        fn = tracing.bind_context(fn)
+        if dependency is None:
+            return await loop.run_in_executor(None, fn, *args)
+        sem = self._semaphores.get(dependency)
+        if sem is None:
+            sem = self._semaphores[dependency] = asyncio.Semaphore(self.limits[dependency])
+        async with sem:
+            return await loop.run_in_executor(self._executor, fn, *args)
+
+    def _extract(self, pr_number: int, files_content: dict, repo: dict) -> dict:
+        # tree-sitter parsers are not thread-safe, so every worker gets its own
+        analyzer = getattr(self._local, "analyzer", None)
+        if analyzer is None:
+            analyzer = self._local.analyzer = DiffAnalyzerService()
+        return analyzer.analyze_files(pr_number, files_content, repo)
+
+    async def _iter_files(self, files):
+        it = iter(files)
+        while True:
+            f = await self._call("github", next, it, _DONE)
+            if f is _DONE:
+                return
+            yield f
+
+    async def _changed_file(self, repo_full_name: str, pr_number: int, repo: dict, f: dict, external_only: bool):
+        path = f["filename"]
+        with tracing.span("pr.file", filename=path) as sp:
+            content = await self._call("github", self.pr.github.download_blob, repo_full_name, f["sha"])
+            if content is None:
+                sp.set(skipped="download_failed")
+                return None
+            result = await self._call("extract", self._extract, pr_number, {path: content}, repo)
+            delta = await self._call("neo4j", self.pr._compute_delta, result, [f], [path])
+            impacted = await self._call("neo4j", self.pr.impact_service.get_impact, delta, external_only)
+            sp.set(node_count=len(result.get("nodes", [])), impacted_count=len(impacted))
+            return delta, impacted
+
+    async def _removed_file(self, repo: dict, path: str, external_only: bool):
+        with tracing.span("pr.removed_file", filename=path):
+            delta = await self._call("neo4j", self.pr.delta_service.compute_delta, [], [], [path], None, repo["id"])
+            impacted = await self._call("neo4j", self.pr.impact_service.get_impact, delta, external_only)
+            return delta, impacted
+
+    @staticmethod
+    def _merge_impacted(impacted_lists) -> list:
+        merged = {}
+        for impacted in impacted_lists:
+            for node in impacted:
+                seen = merged.get(node["uid"])
+                if seen is None or node.get("depth", 0) < seen.get("depth", 0):
+                    merged[node["uid"]] = node
+        return sorted(merged.values(), key=lambda n: (n.get("repo_id") or "", n.get("depth", 0),
+                                                      n.get("kind") or "", n.get("name") or ""))
+
+    async def _prepare(self, repo_full_name: str, pr_number: int, repo: dict, external_only: bool) -> dict:
+        # taken before extraction so a graph update mid-run invalidates the result
+        generations = asyncio.ensure_future(
+            self._call("neo4j", self.pr.neo_repo.get_graph_generations, [repo["id"]]))
+        tasks = []
+        try:
+            async for f in self._iter_files(self.pr._fetch_pr_files(repo_full_name, pr_number)):
+                parse, removed_path = self.pr._classify_file(f)
+                if removed_path:
+                    tasks.append(asyncio.ensure_future(self._removed_file(repo, removed_path, external_only)))
+                if parse:
+                    tasks.append(asyncio.ensure_future(
+                        self._changed_file(repo_full_name, pr_number, repo, f, external_only)))
+        except Exception:
+            # the listing failed; files already queued are not worth finishing
+            for task in tasks + [generations]:
+                task.cancel()
+            await asyncio.gather(*tasks, generations, return_exceptions=True)
+            raise
+        outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+        errors = [r for r in outcomes if isinstance(r, BaseException)]
+        if errors:
+            raise errors[0]
+        results = [r for r in outcomes if r is not None]
+
+        delta = self.pr.delta_service.merge_deltas([d for d, _ in results])
+        impacted = [] if delta.get("error") else self._merge_impacted(i for _, i in results)
+        log.info(f"Async pipeline analyzed {len(results)} files of {repo_full_name}#{pr_number}")
+        return {"repo": repo, "delta": delta, "impacted": {external_only: impacted},
+                "generations": await generations}
+
+    async def _run(self, parent, repo_full_name: str, pr_number: int, clone_url: str, external_only: bool,
+                   force: bool) -> str:
+        with tracing.activate(parent):
+            pr = self.pr
+            head_sha, repo = await asyncio.gather(
+                self._call("github", pr.github.get_pr_head_sha, repo_full_name, pr_number),
+                self._call("postgres", pr.user_repository.get_repo_by_url, clone_url),
+            )
+            tracing.set_attributes(head_sha=head_sha)
+
+            if head_sha and not force:
+                cached = await self._call("postgres", pr._get_cached_result, repo_full_name, head_sha, external_only)
+                if cached:
+                    return await self._call("github", pr._post_cached, repo_full_name, pr_number, head_sha, cached)
+
+            prepared = None
+            if head_sha and not force:
+                prepared = await self._call(None, pr._get_speculative, repo_full_name, pr_number, head_sha)
+            if prepared is not None:
+                impacted = await self._call("neo4j", pr._get_impact, prepared, external_only)
+            else:
+                if not repo:
+                    raise Exception("Repository not found in the system. Please onboard the repo first.")
+                prepared = await self._prepare(repo_full_name, pr_number, repo, external_only)
+                impacted = prepared["impacted"][external_only]
+
+            return await self._call("llm", pr._report, repo_full_name, pr_number, head_sha, external_only,
+                                    prepared, impacted, force)
@@ -1,13 +1,14 @@
 import os
-import requests
+from src.util.github_client import GitHubClient, get_github_client
 from src.util.logger import log
+from src.util import tracing
 
 
 class CommentNotificationService:
 
-    def __init__(self):
-        self.github_token = os.environ.get("GITHUB_TOKEN")
-        self.github_api_base = "https://api.github.com"
+    def __init__(self, client: GitHubClient = None):
+        self.client = client or get_github_client()
+        self.github_api_base = os.environ.get("GITHUB_API_BASE", "https://api.github.com")
 
     def post_acknowledgement(self, repo_full_name: str, pr_number: int) -> bool:
         msg = (
@@ -45,22 +46,46 @@ class CommentNotificationService:
         return self.post_impact_comment(repo_full_name, pr_number, msg)
 
     def post_impact_comment(self, repo_full_name: str, pr_number: int, comment_text: str) -> bool:
-        if not self.github_token:
+        return self.create_comment(repo_full_name, pr_number, comment_text) is not None
+
+    def create_comment(self, repo_full_name: str, pr_number: int, comment_text: str) -> int | None:
+        if not self.client.token:
             log.error("GITHUB_TOKEN not configured; cannot post comments")
-            return False
+            return None
 
         try:
             url = f"{self.github_api_base}/repos/{repo_full_name}/issues/{pr_number}/comments"
-            headers = {
-                "Authorization": f"Bearer {self.github_token}",
-                "Accept": "application/vnd.github.v3+json",
-            }
             payload = {"body": comment_text}
 
-            response = requests.post(url, json=payload, headers=headers, timeout=30)
-            response.raise_for_status()
+            with tracing.span("github.post_comment", repo=repo_full_name, pr_number=pr_number,
+                              chars=len(comment_text)) as sp:
+                # comments may use the reserved part of the rate limit
+                response = self.client.post(url, json=payload, accept="application/vnd.github.v3+json",
+                                            priority=True)
+                sp.set(status_code=response.status_code)
             log.info(f"Posted comment on {repo_full_name}#{pr_number}")
-            return True
+            try:
+                return response.json().get("id") or 0
+            except ValueError:
+                return 0
         except Exception as e:
             log.error(f"Error posting comment: {e}")
+            return None
+
+    def update_comment(self, repo_full_name: str, comment_id: int, comment_text: str) -> bool:
+        if not self.client.token:
+            log.error("GITHUB_TOKEN not configured; cannot update comments")
+            return False
+
+        try:
+            url = f"{self.github_api_base}/repos/{repo_full_name}/issues/comments/{comment_id}"
+            with tracing.span("github.update_comment", repo=repo_full_name, comment_id=comment_id,
+                              chars=len(comment_text)) as sp:
+                response = self.client.patch(url, json={"body": comment_text},
+                                             accept="application/vnd.github.v3+json", priority=True)
+                sp.set(status_code=response.status_code)
+            log.info(f"Updated comment {comment_id} on {repo_full_name}")
+            return True
+        except Exception as e:
+            log.error(f"Error updating comment: {e}")
             return False
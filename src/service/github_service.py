@@ -1,52 +1,140 @@
 import os
-import requests
+import heapq
+import time
 import base64
+from concurrent.futures import ThreadPoolExecutor
+from src.util.blob_store import BlobStore
+from src.util.github_client import GitHubClient, get_github_client
 from src.util.logger import log
+from src.util.metrics import REGISTRY
+from src.util import tracing
+
+BLOB_DOWNLOAD_SECONDS = REGISTRY.histogram(
+    "chainreaction_github_blob_download_seconds", "Time to fetch one PR file blob, cache hits included")
+BLOB_REQUESTS_TOTAL = REGISTRY.counter(
+    "chainreaction_github_blob_requests_total", "PR file blob lookups by result", ["result"])
 
 
 class GitHubService:
-    def __init__(self):
-        self.github_token = os.environ.get("GITHUB_TOKEN")
-        self.api_base = "https://api.github.com"
+    FILES_PER_PAGE = 100
+    SAMPLING_POLICIES = ("first", "most_changed")
+    def __init__(self, client: GitHubClient = None):
+        self.api_base = os.environ.get("GITHUB_API_BASE", "https://api.github.com")
+        self.max_workers = max(1, int(os.environ.get("GITHUB_DOWNLOAD_WORKERS", "8")))
+        self.max_pr_files = max(1, int(os.environ.get("PR_MAX_FILES", "300")))
+        self.sampling_policy = os.environ.get("PR_FILE_SAMPLING", "first")
+        if self.sampling_policy not in self.SAMPLING_POLICIES:
+            raise ValueError(f"PR_FILE_SAMPLING must be one of {self.SAMPLING_POLICIES}")
+
+        self.client = client or get_github_client()
+        self.blob_store = BlobStore()
+
+    def get_pr_head_sha(self, repo_full_name: str, pr_number: int) -> str | None:
+        try:
+            url = f"{self.api_base}/repos/{repo_full_name}/pulls/{pr_number}"
+            resp = self.client.get(url, accept="application/vnd.github.v3+json", etag=True)
+            return (resp.json().get("head") or {}).get("sha")
+        except Exception as e:
+            log.error(f"GitHubService.get_pr_head_sha error: {e}")
+            return None
+
+    def iter_pr_files(self, repo_full_name: str, pr_number: int):
+        url = f"{self.api_base}/repos/{repo_full_name}/pulls/{pr_number}/files?per_page={self.FILES_PER_PAGE}"
+        while url:
+            resp = self.client.get(url, accept="application/vnd.github.v3+json", etag=True)
+            yield from resp.json()
+            url = resp.links.get("next", {}).get("url")
+
+    def iter_pr_files_limited(self, repo_full_name: str, pr_number: int):
+        files = self.iter_pr_files(repo_full_name, pr_number)
+        if self.sampling_policy == "most_changed":
+            # needs the full listing, but only ever holds max_pr_files entries
+            heap = []
+            for i, f in enumerate(files):
+                item = (f.get("changes") or 0, -i, f)
+                if len(heap) < self.max_pr_files:
+                    heapq.heappush(heap, item)
+                else:
+                    heapq.heappushpop(heap, item)
+            if len(heap) == self.max_pr_files:
+                log.warning(f"{repo_full_name}#{pr_number}: analyzing the {self.max_pr_files} most changed files")
+            yield from (f for _, _, f in sorted(heap, key=lambda item: -item[1]))
+            return
+
+        for i, f in enumerate(files):
+            if i >= self.max_pr_files:
+                log.warning(f"{repo_full_name}#{pr_number}: more than {self.max_pr_files} files, analyzing the first {self.max_pr_files}")
+                return
+            yield f
 
     def get_pr_files(self, repo_full_name: str, pr_number: int):
         try:
-            url = f"{self.api_base}/repos/{repo_full_name}/pulls/{pr_number}/files"
-            headers = {"Accept": "application/vnd.github.v3+json"}
-            if self.github_token:
-                headers["Authorization"] = f"token {self.github_token}"
-
-            resp = requests.get(url, headers=headers, timeout=30)
-            resp.raise_for_status()
-            return resp.json()
+            return list(self.iter_pr_files_limited(repo_full_name, pr_number))
         except Exception as e:
             log.error(f"GitHubService.get_pr_files error: {e}")
             return None
 
     def download_blob(self, repo_full_name: str, sha: str) -> str | None:
         try:
-            url = f"{self.api_base}/repos/{repo_full_name}/git/blobs/{sha}"
-            headers = {}
-            if self.github_token:
-                headers["Authorization"] = f"token {self.github_token}"
-
-            resp = requests.get(url, headers=headers, timeout=30)
-            resp.raise_for_status()
-            blob = resp.json()
-            return base64.b64decode(blob.get("content", "")).decode("utf-8")
+            # blobs are content-addressed, so a cached SHA is valid for every repo and PR
+            data = self.blob_store.get(sha)
+            if data is None:
+                url = f"{self.api_base}/repos/{repo_full_name}/git/blobs/{sha}"
+                resp = self.client.get(url)
+                blob = resp.json()
+                data = base64.b64decode(blob.get("content", ""))
+                self.blob_store.put(sha, data)
+                BLOB_REQUESTS_TOTAL.inc(result="downloaded")
+            else:
+                BLOB_REQUESTS_TOTAL.inc(result="cache_hit")
+            return data.decode("utf-8")
         except Exception as e:
+            BLOB_REQUESTS_TOTAL.inc(result="error")
             log.error(f"GitHubService.download_blob error: {e}")
             return None
 
-    def build_files_content(self, repo_full_name: str, files: list) -> dict:
-        files_content = {}
-        for f in files:
-            sha = f.get("sha")
-            filename = f.get("filename")
-            if not sha or not filename:
-                continue
+    def _timed_download(self, repo_full_name: str, filename: str, sha: str) -> tuple:
+        started = time.perf_counter()
+        with tracing.span("github.download_blob", filename=filename, sha=sha) as sp:
             content = self.download_blob(repo_full_name, sha)
-            if content is None:
-                continue
-            files_content[filename] = content
+            sp.set(ok=content is not None, chars=len(content) if content is not None else 0)
+        elapsed = time.perf_counter() - started
+        BLOB_DOWNLOAD_SECONDS.observe(elapsed)
+        timing = {
+            "filename": filename,
+            "sha": sha,
+            "seconds": round(elapsed, 4),
+            "ok": content is not None,
+        }
+        return filename, content, timing
+
+    def download_blobs(self, repo_full_name: str, files) -> tuple[dict, list]:
+        # files may be a lazy iterator; downloads start as entries arrive
+        files_content = {}
+        timings = []
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [
+                pool.submit(tracing.bind_context(self._timed_download), repo_full_name, f.get("filename"), f.get("sha"))
+                for f in files
+                if f.get("sha") and f.get("filename")
+            ]
+            for fut in futures:
+                filename, content, timing = fut.result()
+                timings.append(timing)
+                if content is not None:
+                    files_content[filename] = content
+        return files_content, timings
+
+    def build_files_content(self, repo_full_name: str, files) -> dict:
+        started = time.perf_counter()
+        with tracing.span("github.download_blobs", repo=repo_full_name) as sp:
+            files_content, timings = self.download_blobs(repo_full_name, files)
+            sp.set(file_count=len(timings), downloaded=len(files_content))
+        if timings:
+            slowest = max(timings, key=lambda t: t["seconds"])
+            log.info(
+                f"Downloaded {len(files_content)}/{len(timings)} blobs for {repo_full_name} "
+                f"in {time.perf_counter() - started:.2f}s (slowest {slowest['filename']} {slowest['seconds']}s)"
+            )
         return files_content
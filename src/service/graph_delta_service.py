@@ -1,11 +1,15 @@
 from neo4j import GraphDatabase
 import os
+from src.extractor.entity_meta import parse_meta
 from src.util.logger import log
-from typing import List
+from src.util import tracing
+from typing import Dict, List, Set
 
 
 class GraphDeltaService:
 
+    DEPENDENCY_TYPES = ["DEPENDS_ON", "READS_FROM", "WRITES_TO"]
+
     def __init__(self):
         uri = os.getenv("NEO4J_URI", "neo4j://127.0.0.1:7687")
         user = os.getenv("NEO4J_USER", "neo4j")
@@ -13,46 +17,159 @@ class GraphDeltaService:
         self.driver = GraphDatabase.driver(uri, auth=(user, pwd))
     
 
-    def get_repo_nodes(self, repo_id: str) -> List[str]:
+    def get_existing_nodes(self, uids: List[str]) -> List[dict]:
+        if not uids:
+            return []
+        q = """
+        UNWIND $uids AS uid
+        OPTIONAL MATCH (e:Entity {uid: uid})
+        OPTIONAL MATCH (r:Repo {uid: uid})
+        WITH coalesce(e, r) AS n
+        WHERE n IS NOT NULL
+        RETURN n.uid AS uid, n.meta AS meta
+        """
+        with tracing.span("neo4j.delta.existing_nodes", uid_count=len(uids)) as sp, self.driver.session() as s:
+            rows = [dict(r) for r in s.run(q, uids=list(uids))]
+            sp.set(rows=len(rows))
+            return rows
+
+    def get_removed_nodes(self, repo_id: str, paths: List[str], keep_uids: List[str]) -> List[dict]:
+        if not paths:
+            return []
+        q = """
+        UNWIND $paths AS p
+        MATCH (n:Entity {repo_id: $repo_id, path: p})
+        WHERE NOT n.uid IN $keep_uids
+        RETURN n.uid AS uid,
+               n.repo_id AS repo_id,
+               n.repo_name AS repo_name,
+               n.kind AS kind,
+               n.name AS name,
+               n.language AS language,
+               n.path AS path,
+               n.meta AS meta
+        """
+        with tracing.span("neo4j.delta.removed_nodes", path_count=len(paths)) as sp, self.driver.session() as s:
+            rows = [dict(r) for r in s.run(q, repo_id=repo_id, paths=list(paths), keep_uids=list(keep_uids))]
+            sp.set(rows=len(rows))
+            return rows
+
+    def get_dependency_edges(self, repo_id: str, paths: List[str]) -> List[dict]:
+        # extracted dependency edges never leave their file, so only edges
+        # between the touched files are comparable with the PR extraction
+        if not paths:
+            return []
         q = """
-        MATCH (n {repo_id:$repo_id})
-        RETURN n.uid AS uid
+        UNWIND $paths AS p
+        MATCH (a:Entity {repo_id: $repo_id, path: p})-[r:DEPENDS_ON|READS_FROM|WRITES_TO]->(b:Entity)
+        WHERE b.repo_id = $repo_id AND b.path IN $paths
+        RETURN a.uid AS src, type(r) AS type, b.uid AS dst
         """
-        with self.driver.session() as s:
-            return [r['uid'] for r in s.run(q, repo_id=repo_id)]
+        with tracing.span("neo4j.delta.dependency_edges", path_count=len(paths)) as sp, self.driver.session() as s:
+            rows = [dict(r) for r in s.run(q, repo_id=repo_id, paths=list(paths))]
+            sp.set(rows=len(rows))
+            return rows
 
-    def compute_delta(self, pr_nodes: List[dict], pr_edges: List[dict]) -> dict:
+    def compute_edge_delta(self, repo_id: str, pr_edges: List[dict], touched_paths: List[str],
+                           known_uids: Set[str]) -> dict:
+        # edges to targets that exist neither in the graph nor in the PR are
+        # unresolved calls which store_graph would never persist either
+        pr_keys = {
+            (e.get("src"), e.get("type"), e.get("dst"))
+            for e in pr_edges
+            if e.get("type") in self.DEPENDENCY_TYPES and e.get("dst") in known_uids
+        }
+        base_keys = {
+            (e["src"], e["type"], e["dst"])
+            for e in self.get_dependency_edges(repo_id, touched_paths)
+        }
+        return {
+            "added_edges": [{"src": s, "type": t, "dst": d} for s, t, d in sorted(pr_keys - base_keys)],
+            "removed_edges": [{"src": s, "type": t, "dst": d} for s, t, d in sorted(base_keys - pr_keys)],
+        }
 
-        if not pr_nodes:
+    @staticmethod
+    def _empty_delta(**extra) -> dict:
+        return {"added": [], "modified": [], "removed": [], "unchanged": [],
+                "added_edges": [], "removed_edges": [], **extra}
+
+    @staticmethod
+    def _is_changed(pr_node: dict, base_meta, hunk_uids: Dict[str, Set[str]] = None) -> bool:
+        pr_hash = parse_meta(pr_node.get("meta")).get("body_hash")
+        base_hash = parse_meta(base_meta).get("body_hash")
+        if pr_hash and base_hash:
+            return pr_hash != base_hash
+        # graphs ingested before hashing have no body_hash; fall back to the
+        # patch hunks when available, otherwise stay conservative
+        path = pr_node.get("path")
+        if hunk_uids is not None and path in hunk_uids:
+            return pr_node.get("uid") in hunk_uids[path]
+        return True
+
+    @classmethod
+    def merge_deltas(cls, deltas: List[dict]) -> dict:
+        # per-file deltas never overlap: nodes and dependency edges are keyed by their file
+        merged = cls._empty_delta()
+        for delta in deltas:
+            if delta.get("error"):
+                return cls._empty_delta(error=delta["error"])
+            for key in merged:
+                merged[key].extend(delta.get(key, []))
+        return merged
+
+    def compute_delta(self, pr_nodes: List[dict], pr_edges: List[dict], touched_paths: List[str] = None,
+                      hunk_uids: Dict[str, Set[str]] = None, repo_id: str = None) -> dict:
+
+        # a repo_id without nodes still finds the entities of removed files
+        if not pr_nodes and not repo_id:
             log.info("No PR nodes provided")
-            return {"added": [], "modified": []}
+            return self._empty_delta()
 
         try:
-            repo_id = pr_nodes[0].get("repo_id")
+            repo_id = repo_id or pr_nodes[0].get("repo_id")
             
             if not repo_id:
                 log.warning("No repo_id in first PR node")
-                return {"error": "Missing repo_id", "added": [], "modified": []}
+                return self._empty_delta(error="Missing repo_id")
 
-            pr_node_map = {n.get("uid"): n for n in pr_nodes if n.get("uid")}
+            # the synthetic repo node is re-emitted on every extraction
+            pr_node_map = {n.get("uid"): n for n in pr_nodes if n.get("uid") and n.get("kind") != "repo"}
             pr_uids = set(pr_node_map.keys())
 
-            base_uids = set(self.get_repo_nodes(repo_id))
+            pr_edges = pr_edges or []
+            lookup_uids = pr_uids | {e.get("dst") for e in pr_edges if e.get("dst")}
+            base_meta = {r["uid"]: r.get("meta") for r in self.get_existing_nodes(list(lookup_uids))}
+
+            added, modified, unchanged = [], [], []
+            for uid, node in pr_node_map.items():
+                if uid not in base_meta:
+                    added.append(node)
+                elif self._is_changed(node, base_meta[uid], hunk_uids):
+                    modified.append(node)
+                else:
+                    unchanged.append(node)
+
+            if touched_paths is None:
+                touched_paths = sorted({n.get("path") for n in pr_node_map.values() if n.get("path")})
+            removed = self.get_removed_nodes(repo_id, touched_paths, list(pr_uids))
 
-            # nodes in PR but not in base
-            added_uids = pr_uids - base_uids
-            added = [pr_node_map[uid] for uid in added_uids]
+            known_uids = (set(base_meta) | pr_uids) - {n["uid"] for n in removed}
+            edge_delta = self.compute_edge_delta(repo_id, pr_edges, touched_paths, known_uids)
 
-            # nodes in both PR and base
-            modified_uids = pr_uids & base_uids
-            modified = [ pr_node_map[uid] for uid in modified_uids ]  
-            log.info(f"Delta summary: +{len(added)} added, ~{len(modified)} modified")
+            log.info(
+                f"Delta summary: +{len(added)} added, ~{len(modified)} modified, "
+                f"-{len(removed)} removed, ={len(unchanged)} unchanged, "
+                f"+{len(edge_delta['added_edges'])}/-{len(edge_delta['removed_edges'])} dependency edges"
+            )
 
             return {
                 "added": added,
-                "modified": modified
+                "modified": modified,
+                "removed": removed,
+                "unchanged": unchanged,
+                **edge_delta,
             }
 
         except Exception as e:
             log.error(f"Error computing delta: {e}")
-            return {"error": str(e), "added": [], "modified": []}
+            return self._empty_delta(error=str(e))
@@ -0,0 +1,79 @@
+import re
+from typing import Dict, List, Set, Tuple
+from src.extractor.entity_meta import parse_meta
+from src.util.interval_tree import IntervalTree
+from src.util.logger import log
+
+
+class HunkMappingService:
+
+    HUNK_HEADER = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,\d+)? @@")
+
+    @staticmethod
+    def changed_line_ranges(patch: str) -> List[Tuple[int, int]]:
+        # only '+' lines and deletion points count, not the context lines
+        changed = []
+        new_line = None
+        for line in (patch or "").splitlines():
+            m = HunkMappingService.HUNK_HEADER.match(line)
+            if m:
+                new_line = int(m.group(1))
+                continue
+            if new_line is None or line.startswith("\\"):
+                continue
+            if line.startswith("+"):
+                changed.append(new_line)
+                new_line += 1
+            elif line.startswith("-"):
+                changed.append(max(new_line, 1))
+            else:
+                new_line += 1
+
+        ranges = []
+        for ln in sorted(set(changed)):
+            if ranges and ln <= ranges[-1][1] + 1:
+                ranges[-1] = (ranges[-1][0], ln)
+            else:
+                ranges.append((ln, ln))
+        return ranges
+
+    @staticmethod
+    def build_index(nodes: List[dict]) -> Dict[str, IntervalTree]:
+        by_path = {}
+        for n in nodes:
+            meta = parse_meta(n.get("meta"))
+            start, end = meta.get("start_line"), meta.get("end_line")
+            if not n.get("path") or start is None or end is None:
+                continue
+            by_path.setdefault(n["path"], []).append((start, end, n["uid"]))
+        return {path: IntervalTree(items) for path, items in by_path.items()}
+
+    @staticmethod
+    def enclosing_entities(tree: IntervalTree, start: int, end: int) -> Set[str]:
+        hits = tree.overlap(start, end)
+        keep = set()
+        for h in hits:
+            # drop a container when the change sits entirely inside a nested entity
+            covered = any(
+                c is not h and h[0] <= c[0] and c[1] <= h[1] and (c[0], c[1]) != (h[0], h[1])
+                and c[0] <= start and end <= c[1]
+                for c in hits
+            )
+            if not covered:
+                keep.add(h[2])
+        return keep
+
+    def map_changed_entities(self, files: list, nodes: List[dict]) -> Dict[str, Set[str]]:
+        index = self.build_index(nodes)
+        changed = {}
+        for f in files or []:
+            path = f.get("filename")
+            patch = f.get("patch")
+            if not path or not patch or path not in index:
+                continue
+            uids = set()
+            for start, end in self.changed_line_ranges(patch):
+                uids |= self.enclosing_entities(index[path], start, end)
+            changed[path] = uids
+        log.info(f"Hunk mapping: {sum(len(u) for u in changed.values())} entities under changed hunks in {len(changed)} files")
+        return changed
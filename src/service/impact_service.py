@@ -1,6 +1,17 @@
 import os
 from neo4j import GraphDatabase
 from src.util.logger import log
+from src.util.metrics import REGISTRY
+from src.util import tracing
+
+IMPACT_QUERY_SECONDS = REGISTRY.histogram(
+    "chainreaction_impact_query_seconds", "Time per impact traversal from one seed node", ["mode"])
+IMPACT_SEEDS = REGISTRY.histogram(
+    "chainreaction_impact_seeds", "Seed nodes per impact computation", ["mode"],
+    buckets=(0, 1, 5, 10, 25, 50, 100, 250, 500, 1000))
+IMPACTED_NODES = REGISTRY.histogram(
+    "chainreaction_impacted_nodes", "Impacted nodes returned per impact computation", ["mode"],
+    buckets=(0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000))
 
 class ImpactService:
     def __init__(self):
@@ -16,8 +27,17 @@ class ImpactService:
         if self.driver:
             self.driver.close()
 
+    @staticmethod
+    def _seed_uids(delta: dict) -> list[str]:
+        seeds = [n["uid"] for n in delta.get("modified", [])]
+        seeds += [n["uid"] for n in delta.get("removed", [])]
+        # a new or dropped dependency changes the behaviour of its source
+        seeds += [e["src"] for e in delta.get("added_edges", [])]
+        seeds += [e["src"] for e in delta.get("removed_edges", [])]
+        return list(dict.fromkeys(seeds))
+
     def get_impacted_graph(self, delta: dict) -> list[dict]:
-        modified_uids = [n["uid"] for n in delta.get("modified", [])]
+        modified_uids = self._seed_uids(delta)
 
         if not modified_uids:
             log.info("No modified nodes, no impact")
@@ -30,13 +50,20 @@ class ImpactService:
         return list(impacted_map.values())
     
     def get_impact(self, delta:dict, external_only:bool=False) -> list[dict]:
-        if external_only:
-            return self.get_impacted_external_graph(delta)
-        else:
-            return self.get_impacted_graph(delta)
+        mode = "external" if external_only else "full"
+        seeds = len(self._seed_uids(delta))
+        IMPACT_SEEDS.observe(seeds, mode=mode)
+        with tracing.span("impact.get_impact", mode=mode, seed_count=seeds) as sp:
+            if external_only:
+                impacted = self.get_impacted_external_graph(delta)
+            else:
+                impacted = self.get_impacted_graph(delta)
+            sp.set(node_count=len(impacted))
+        IMPACTED_NODES.observe(len(impacted), mode=mode)
+        return impacted
     
     def get_impacted_external_graph(self, delta: dict) -> list[dict]:
-        modified_uids = [n["uid"] for n in delta.get("modified", [])]
+        modified_uids = self._seed_uids(delta)
 
         if not modified_uids:
             log.info("No modified nodes, no external impact")
@@ -51,21 +78,25 @@ class ImpactService:
     
 
     def get_impacted_nodes(self, start_uid: str):
-        with self.driver.session() as session:
+        with IMPACT_QUERY_SECONDS.time(mode="full"), tracing.span("neo4j.impact", uid=start_uid) as sp, \
+                self.driver.session() as session:
             result = session.execute_read(
                 self._query_impact,
                 start_uid,
                 self.allowed_rels
             )
+            sp.set(rows=len(result))
             return result
 
     def get_impacted_external_nodes(self, start_uid: str):
-        with self.driver.session() as session:
+        with IMPACT_QUERY_SECONDS.time(mode="external"), tracing.span("neo4j.impact_external", uid=start_uid) as sp, \
+                self.driver.session() as session:
             result = session.execute_read(
                 self._query_external_impact,
                 start_uid,
                 self.allowed_rels
             )
+            sp.set(rows=len(result))
             return result
 
     @staticmethod
@@ -0,0 +1,337 @@
+import hashlib
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+
+from src.util import tracing
+from src.util.logger import log
+from src.util.metrics import REGISTRY
+import httpx
+from openai import APIConnectionError, OpenAI
+from google import genai
+
+LLM_REQUESTS_TOTAL = REGISTRY.counter(
+    "chainreaction_llm_requests_total", "LLM provider requests by outcome", ["provider", "outcome"])
+LLM_REQUEST_SECONDS = REGISTRY.histogram(
+    "chainreaction_llm_request_seconds", "LLM provider request latency", ["provider"])
+LLM_QUEUE_WAIT_SECONDS = REGISTRY.histogram(
+    "chainreaction_llm_queue_wait_seconds", "Time LLM requests waited for a concurrency slot")
+LLM_FAILOVERS_TOTAL = REGISTRY.counter(
+    "chainreaction_llm_failovers_total", "LLM requests answered by a fallback provider", ["provider"])
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+
+
+class LLMRateLimitError(Exception):
+    def __init__(self, message: str, retry_after: float = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class LLMUnavailableError(Exception):
+    pass
+
+
+# no answer at all; says nothing about the request itself
+TRANSPORT_ERRORS = (ConnectionError, TimeoutError, httpx.TransportError, APIConnectionError)
+
+
+def _status(e: Exception) -> int | None:
+    status = getattr(e, "status_code", None) or getattr(e, "code", None)
+    return status if isinstance(status, int) else None
+
+
+def _is_rate_limited(e: Exception) -> bool:
+    if isinstance(e, LLMRateLimitError):
+        return True
+    return _status(e) == 429 or "RESOURCE_EXHAUSTED" in str(e)
+
+
+def _is_provider_failure(e: Exception) -> bool:
+    # 429, 5xx and transport errors are the provider's problem: cool it down
+    # and fail over. Anything else (400 for context length, content policy,
+    # auth) would fail the same way on every provider.
+    if _is_rate_limited(e) or isinstance(e, TRANSPORT_ERRORS):
+        return True
+    status = _status(e)
+    return status is not None and status >= 500
+
+
+def _retry_after(e: Exception) -> float | None:
+    if isinstance(e, LLMRateLimitError):
+        return e.retry_after
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class OpenAIProvider:
+    name = "openai"
+    default_model = "gpt-4.1"
+
+    def __init__(self):
+        self.api_key = os.getenv("OPENAI_API_KEY", "")
+        self.client = None
+        if self.api_key:
+            self.client = OpenAI(api_key=self.api_key, max_retries=0)
+
+    @property
+    def available(self) -> bool:
+        return self.client is not None
+
+    def complete(self, prompt: str, model: str) -> tuple[str, int | None, int | None]:
+        response = self.client.chat.completions.create(model=model, messages=[{"role": "user", "content": prompt}])
+        usage = getattr(response, "usage", None)
+        return (response.choices[0].message.content,
+                getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None))
+
+
+class GeminiProvider:
+    name = "gemini"
+    default_model = "gemini-2.5-flash"
+
+    def __init__(self):
+        self.api_key = os.getenv("GEMINI_API_KEY", "") or os.getenv("GOOGLE_API_KEY", "")
+        self.client = None
+        if self.api_key:
+            self.client = genai.Client()
+
+    @property
+    def available(self) -> bool:
+        return self.client is not None
+
+    def complete(self, prompt: str, model: str) -> tuple[str, int | None, int | None]:
+        response = self.client.models.generate_content(model=model, contents=prompt)
+        usage = getattr(response, "usage_metadata", None)
+        return (response.text,
+                getattr(usage, "prompt_token_count", None), getattr(usage, "candidates_token_count", None))
+
+
+class FakeProvider:
+    """Deterministic local provider for tests and load experiments.
+
+    Answers with a small table derived from the prompt hash after `latency`
+    seconds, and rejects `rate_limit_ratio` of the requests with a 429 so
+    the adaptive concurrency can be exercised without a real account.
+    """
+
+    name = "fake"
+    default_model = "fake"
+    available = True
+
+    def __init__(self, latency: float = None, rate_limit_ratio: float = None):
+        self.latency = latency if latency is not None else float(os.getenv("FAKE_LLM_LATENCY", "0"))
+        self.rate_limit_ratio = rate_limit_ratio if rate_limit_ratio is not None else float(
+            os.getenv("FAKE_LLM_RATE_LIMIT_RATIO", "0"))
+
+    def complete(self, prompt: str, model: str) -> tuple[str, int | None, int | None]:
+        if self.latency:
+            time.sleep(self.latency)
+        if self.rate_limit_ratio and random.random() < self.rate_limit_ratio:
+            raise LLMRateLimitError("fake provider rate limit", retry_after=0.1)
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+        return f"| Area | Why Impacted |\n|---|---|\n| fake-{digest} | {len(prompt)} chars |", None, None
+
+
+PROVIDERS = {
+    "openai": OpenAIProvider,
+    "gemini": GeminiProvider,
+    "fake": FakeProvider,
+}
+
+
+def register_provider(name: str, factory) -> None:
+    PROVIDERS[name] = factory
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit for calls to the LLM providers.
+
+    Every fast success adds 1/limit, so the limit grows by about one per
+    round of calls. A 429 halves it and a call slower than target_latency
+    shrinks it by a tenth, at most once per cooldown. Waiting callers are
+    admitted lowest priority value first, then in arrival order.
+    """
+
+    def __init__(self, initial: int = 4, min_limit: int = 1, max_limit: int = 32, target_latency: float = 30.0,
+                 cooldown: float = 1.0):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._waiters = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def _capacity(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    def acquire(self, priority: int = PRIORITY_INTERACTIVE) -> float:
+        started = time.time()
+        with self._cond:
+            entry = (priority, next(self._seq))
+            heapq.heappush(self._waiters, entry)
+            while self._waiters[0] != entry or self.in_flight >= self._capacity():
+                self._cond.wait()
+            heapq.heappop(self._waiters)
+            self.in_flight += 1
+            # the next waiter may fit too
+            self._cond.notify_all()
+        return time.time() - started
+
+    def release(self, latency: float = None, overloaded: bool = False):
+        with self._cond:
+            self.in_flight = max(0, self.in_flight - 1)
+            now = time.time()
+            slow = latency is not None and latency > self.target_latency
+            if (overloaded or slow) and now - self._last_decrease >= self.cooldown:
+                self.limit = max(float(self.min_limit), self.limit * (0.5 if overloaded else 0.9))
+                self._last_decrease = now
+            elif latency is not None and not overloaded and not slow:
+                self.limit = min(float(self.max_limit), self.limit + 1.0 / max(self.limit, 1.0))
+            self._cond.notify_all()
+
+
+class LLMGateway:
+    """Process-wide entry point for LLM calls.
+
+    Owns one client per provider, an adaptive concurrency limit shared by
+    every caller, and failover: a provider that is rate limited or failing
+    is cooled down and the request moves on to the next one in the chain.
+    Errors caused by the request itself are raised to the caller as is.
+    """
+
+    def __init__(self, providers: dict = None, failover: list[str] = None, limiter: AdaptiveLimiter = None,
+                 max_wait: float = None, backoff_seconds: float = None):
+        self._providers = dict(providers or {})
+        self._lock = threading.Lock()
+        self.failover = failover if failover is not None else [
+            p.strip().lower() for p in os.getenv("LLM_FAILOVER", "gemini,openai").split(",") if p.strip()]
+        self.limiter = limiter or AdaptiveLimiter(
+            initial=int(os.getenv("LLM_INITIAL_CONCURRENCY", "4")),
+            min_limit=int(os.getenv("LLM_MIN_CONCURRENCY", "1")),
+            max_limit=int(os.getenv("LLM_MAX_CONCURRENCY", "16")),
+            target_latency=float(os.getenv("LLM_TARGET_LATENCY_SECONDS", "30")),
+        )
+        self.max_wait = max_wait if max_wait is not None else float(os.getenv("LLM_MAX_WAIT_SECONDS", "60"))
+        self.backoff_seconds = backoff_seconds if backoff_seconds is not None else float(
+            os.getenv("LLM_BACKOFF_SECONDS", "2"))
+        self._cooldown_until = {}
+        self._failures = {}
+
+    def provider(self, name: str):
+        with self._lock:
+            provider = self._providers.get(name)
+            if provider is None:
+                factory = PROVIDERS.get(name)
+                if factory is None:
+                    raise ValueError(f"Unknown LLM provider '{name}'")
+                provider = self._providers[name] = factory()
+            return provider
+
+    def _chain(self, primary: str) -> list:
+        # the fake provider never fails over to a paid one
+        names = [primary] + ([] if primary == "fake" else [n for n in self.failover if n != primary])
+        chain = [p for p in (self.provider(n) for n in names if n in PROVIDERS or n in self._providers)
+                 if p.available]
+        if not chain:
+            raise LLMUnavailableError(f"No LLM provider configured (tried {', '.join(names)})")
+        return chain
+
+    def _cool_down(self, name: str, seconds: float):
+        with self._lock:
+            self._cooldown_until[name] = max(self._cooldown_until.get(name, 0.0), time.time() + seconds)
+
+    def _attempt(self, provider, model: str, prompt: str, priority: int):
+        waited = self.limiter.acquire(priority)
+        LLM_QUEUE_WAIT_SECONDS.observe(waited)
+        started = time.perf_counter()
+        overloaded = False
+        # a rejected request tells nothing about the provider's capacity
+        measured = True
+        try:
+            result = provider.complete(prompt, model)
+            LLM_REQUESTS_TOTAL.inc(provider=provider.name, outcome="ok")
+            with self._lock:
+                self._failures[provider.name] = 0
+            return result
+        except Exception as e:
+            if not _is_provider_failure(e):
+                measured = False
+                LLM_REQUESTS_TOTAL.inc(provider=provider.name, outcome="client_error")
+                raise
+            overloaded = _is_rate_limited(e)
+            LLM_REQUESTS_TOTAL.inc(provider=provider.name, outcome="rate_limited" if overloaded else "error")
+            with self._lock:
+                failures = self._failures[provider.name] = self._failures.get(provider.name, 0) + 1
+            backoff = self.backoff_seconds * (2 ** (failures - 1)) + random.uniform(0, 0.5)
+            self._cool_down(provider.name, _retry_after(e) or backoff)
+            raise
+        finally:
+            latency = time.perf_counter() - started
+            LLM_REQUEST_SECONDS.observe(latency, provider=provider.name)
+            self.limiter.release(latency if measured else None, overloaded)
+
+    def complete(self, prompt: str, provider: str, model: str = None, priority: int = PRIORITY_INTERACTIVE,
+                 attempts: int = 1) -> tuple[str, int | None, int | None, str, str]:
+        # returns the text, the token counts and which provider/model answered
+        chain = self._chain(provider)
+        deadline = time.time() + self.max_wait
+        last_error = None
+        with tracing.span("llm.gateway", provider=provider, priority=priority) as sp:
+            for attempt in range(1, max(1, attempts) + 1):
+                now = time.time()
+                ready = [p for p in chain if self._cooldown_until.get(p.name, 0.0) <= now]
+                if not ready and attempt == attempts:
+                    ready = chain
+                for p in ready:
+                    p_model = model if p.name == provider and model else p.default_model
+                    try:
+                        text, prompt_tokens, completion_tokens = self._attempt(p, p_model, prompt, priority)
+                    except Exception as e:
+                        log.error(f"LLM provider {p.name} failed (attempt {attempt}): {e}")
+                        if not _is_provider_failure(e):
+                            raise
+                        last_error = e
+                        continue
+                    if p.name != provider:
+                        LLM_FAILOVERS_TOTAL.inc(provider=p.name)
+                    sp.set(answered_by=p.name, attempts=attempt)
+                    return text, prompt_tokens, completion_tokens, p.name, p_model
+
+                if attempt == attempts:
+                    break
+                # every provider is cooling down: wait for the first one to come back
+                wake = min(self._cooldown_until.get(p.name, 0.0) for p in chain)
+                if wake > deadline:
+                    break
+                time.sleep(max(0.0, wake - time.time()))
+
+        raise LLMUnavailableError(f"No LLM provider could answer: {last_error}") from last_error
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_llm_gateway() -> LLMGateway:
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway()
+        return _gateway
+
+
+REGISTRY.gauge("chainreaction_llm_concurrency_limit", "Current adaptive LLM concurrency limit",
+               fn=lambda: _gateway.limiter.limit if _gateway else None)
+REGISTRY.gauge("chainreaction_llm_in_flight", "LLM provider requests in flight",
+               fn=lambda: _gateway.limiter.in_flight if _gateway else None)
@@ -1,60 +1,79 @@
 import os
-import time
-import random
 from src.util.logger import log
-from openai import OpenAI
-from google import genai
+from src.util import tracing
+from src.util.llm_cache import LLM_CACHE_REQUESTS_TOTAL, LLMResponseCache
+from src.util.metrics import REGISTRY
+from src.service.llm_gateway import PRIORITY_INTERACTIVE, PROVIDERS, LLMGateway, get_llm_gateway
+
+LLM_TOKENS_TOTAL = REGISTRY.counter(
+    "chainreaction_llm_tokens_total", "LLM tokens by provider and direction", ["provider", "direction"])
+LLM_COST_TOTAL = REGISTRY.counter(
+    "chainreaction_llm_cost_usd_total", "Estimated LLM spend in USD", ["provider"])
 
 
 class LLMService:
     def __init__(
         self,
-        provider: str = "openai",         
-        model: str = None,               
+        provider: str = "openai",
+        model: str = None,
         retries: int = 1,
-        backoff_factor: float = 2.0
+        cache: LLMResponseCache = None,
+        gateway: LLMGateway = None
     ):
         self.provider = provider.lower()
+        if self.provider not in PROVIDERS:
+            raise ValueError(f"provider must be one of {', '.join(sorted(PROVIDERS))}")
         self.retries = max(1, int(retries))
-        self.backoff_factor = max(0.0, float(backoff_factor))
-
-        if self.provider == "openai":
-            self.api_key = os.getenv("OPENAI_API_KEY", "")
-            self.client = OpenAI(api_key=self.api_key) if self.api_key else None
-            self.model = model or "gpt-4.1"
-
-        elif self.provider == "gemini":
-            self.api_key = os.getenv("GEMINI_API_KEY", "")
-            self.client = genai.Client()
-            self.model = model or "gemini-2.5-flash"
-
-        else:
-            raise ValueError("provider must be 'openai' or 'gemini'")
-
-    def call(self, prompt: str) -> str:
-        for attempt in range(1, self.retries + 1):
-            try:
-                if self.provider == "openai":
-                    response = self.client.chat.completions.create(
-                        model=self.model,
-                        messages=[{"role": "user", "content": prompt}],
-                    )
-                    return response.choices[0].message["content"]
-
-                elif self.provider == "gemini":
-                    response = self.client.models.generate_content(
-                            model=self.model, contents=prompt
-                        )
-        
-                    return response.text
-
-            except Exception as e:
-                log.error(f"LLMService.call attempt {attempt} error: {e}")
-
-                if attempt == self.retries:
-                    log.error("LLMService.call exhausted retries")
-                    raise
-
-                sleep_for = self.backoff_factor * (2 ** (attempt - 1))
-                sleep_for += random.uniform(0, 0.5)
-                time.sleep(sleep_for)
+        # clients, concurrency limits and failover are shared by the whole process
+        self.gateway = gateway or get_llm_gateway()
+        self.model = model or PROVIDERS[self.provider].default_model
+
+        self.price_input_per_1k = float(os.getenv("LLM_PRICE_INPUT_PER_1K", "0"))
+        self.price_output_per_1k = float(os.getenv("LLM_PRICE_OUTPUT_PER_1K", "0"))
+
+        self.cache_enabled = os.getenv("LLM_CACHE", "on").lower() not in ("0", "off", "false", "no")
+        self.cache = cache or LLMResponseCache()
+
+    def call(self, prompt: str, use_cache: bool = True, priority: int = PRIORITY_INTERACTIVE) -> str:
+        return self.call_with_usage(prompt, use_cache, priority)[0]
+
+    def _usage(self, prompt: str, text: str, prompt_tokens: int = None, completion_tokens: int = None,
+               cached: bool = False, provider: str = None) -> dict:
+        if cached:
+            prompt_tokens = completion_tokens = 0
+        # providers that report no usage are estimated at ~4 characters per token
+        prompt_tokens = prompt_tokens if prompt_tokens is not None else len(prompt) // 4
+        completion_tokens = completion_tokens if completion_tokens is not None else len(text or "") // 4
+        cost = (prompt_tokens * self.price_input_per_1k + completion_tokens * self.price_output_per_1k) / 1000
+        if not cached:
+            provider = provider or self.provider
+            LLM_TOKENS_TOTAL.inc(prompt_tokens, provider=provider, direction="prompt")
+            LLM_TOKENS_TOTAL.inc(completion_tokens, provider=provider, direction="completion")
+            LLM_COST_TOTAL.inc(cost, provider=provider)
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "cost_usd": cost, "cached": cached}
+
+    def call_with_usage(self, prompt: str, use_cache: bool = True,
+                        priority: int = PRIORITY_INTERACTIVE) -> tuple[str, dict]:
+        with tracing.span("llm.call", provider=self.provider, model=self.model, prompt_chars=len(prompt)) as sp:
+            key = None
+            if use_cache and self.cache_enabled and self.cache.enabled:
+                key = LLMResponseCache.key(self.provider, self.model, prompt)
+                cached = self.cache.get(key)
+                LLM_CACHE_REQUESTS_TOTAL.inc(result="hit" if cached is not None else "miss")
+                sp.set(cache_hit=cached is not None)
+                if cached is not None:
+                    log.info("Using cached LLM response")
+                    return cached, self._usage(prompt, cached, cached=True)
+            else:
+                LLM_CACHE_REQUESTS_TOTAL.inc(result="bypass")
+
+            response, prompt_tokens, completion_tokens, provider, model = self.gateway.complete(
+                prompt, self.provider, self.model, priority=priority, attempts=self.retries)
+            if provider != self.provider:
+                log.warning(f"LLM answer came from fallback provider {provider} ({model})")
+            if key and response:
+                self.cache.put(key, response)
+            usage = self._usage(prompt, response, prompt_tokens, completion_tokens, provider=provider)
+            sp.set(response_chars=len(response or ""), answered_by=provider, **usage)
+            return response, usage
@@ -0,0 +1,148 @@
+import math
+import os
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+
+from src.service.llm_gateway import PRIORITY_BATCH
+from src.service.prompt_service import PromptBuilder
+from src.util import tracing
+from src.util.logger import log
+from src.util.metrics import REGISTRY
+
+LLM_MAP_REDUCE_TOTAL = REGISTRY.counter(
+    "chainreaction_llm_map_reduce_total", "Impact summaries split into shards", ["outcome"])
+LLM_MAP_SHARDS = REGISTRY.histogram(
+    "chainreaction_llm_map_shards", "Shards per map-reduce impact summary",
+    buckets=(2, 3, 4, 6, 8, 12, 16))
+
+
+class MapReduceSummaryService:
+    """Summarizes impact sets that do not fit in one prompt.
+
+    The impacted nodes are split by repo, and oversized repos by package,
+    into balanced shards that each fit the prompt budget. The shards are
+    summarized in parallel and a final call merges the partial reports.
+    A report with failed shards is flagged as partial in the returned cost.
+    """
+
+    def __init__(self, llm, max_parallel: int = None, shard_token_budget: int = None, max_shards: int = None):
+        self.llm = llm
+        self.enabled = os.environ.get("LLM_MAP_REDUCE", "on").lower() not in ("0", "off", "false", "no")
+        self.max_parallel = max_parallel or int(os.environ.get("LLM_MAP_CONCURRENCY", "4"))
+        self.shard_token_budget = shard_token_budget or int(
+            os.environ.get("LLM_SHARD_TOKEN_BUDGET", str(PromptBuilder.TOKEN_BUDGET)))
+        self.max_shards = max_shards or int(os.environ.get("LLM_MAP_MAX_SHARDS", "8"))
+
+    @staticmethod
+    def _tokens(nodes: list[dict]) -> int:
+        return PromptBuilder.estimate_tokens("\n".join(PromptBuilder._node_line(n) for n in nodes))
+
+    def _listing_budget(self) -> int:
+        # the rest of the prompt (header, rules, delta summary) needs room too
+        return max(self.shard_token_budget - 2500, PromptBuilder.MIN_IMPACT_TOKENS)
+
+    def _units(self, impacted_nodes: list[dict]) -> list[tuple[str, list[dict]]]:
+        by_repo = {}
+        for n in impacted_nodes:
+            by_repo.setdefault(n.get("repo_name") or n.get("repo_id") or "unknown", []).append(n)
+
+        units = []
+        budget = self._listing_budget()
+        for repo_name, nodes in by_repo.items():
+            if self._tokens(nodes) <= budget:
+                units.append((repo_name, nodes))
+                continue
+            by_package = {}
+            for n in nodes:
+                by_package.setdefault(posixpath.dirname(n.get("path") or "") or ".", []).append(n)
+            units += [(f"{repo_name}:{package}", pkg_nodes) for package, pkg_nodes in by_package.items()]
+        return units
+
+    def shard(self, impacted_nodes: list[dict]) -> list[dict]:
+        units = self._units(impacted_nodes)
+        sizes = [(self._tokens(nodes), name, nodes) for name, nodes in units]
+        total = sum(size for size, _, _ in sizes)
+        count = max(1, min(self.max_shards, len(units), math.ceil(total / self._listing_budget())))
+
+        # largest unit first onto the lightest shard keeps the shards even
+        shards = [{"names": [], "nodes": [], "tokens": 0} for _ in range(count)]
+        for size, name, nodes in sorted(sizes, key=lambda s: (-s[0], s[1])):
+            target = min(shards, key=lambda s: s["tokens"])
+            target["names"].append(name)
+            target["nodes"] += nodes
+            target["tokens"] += size
+        return [s for s in shards if s["nodes"]]
+
+    def needs_map_reduce(self, impacted_nodes: list[dict]) -> bool:
+        if not self.enabled or self._tokens(impacted_nodes) <= self._listing_budget():
+            return False
+        return len(self._units(impacted_nodes)) > 1
+
+    def _map(self, repo_full_name: str, pr_number: int, delta: dict, external_only: bool, pr_repo_id: str,
+             use_cache: bool, index: int, count: int, shard: dict):
+        names = shard["names"]
+        shard_name = ", ".join(names[:5]) + (f" and {len(names) - 5} more" if len(names) > 5 else "")
+        prompt = PromptBuilder.build_shard_prompt(
+            repo_full_name, pr_number, delta, shard["nodes"], external_only, pr_repo_id,
+            index, count, shard_name, self.shard_token_budget)
+        # shards queue behind single-prompt reports; the gateway caps the total
+        with tracing.span("llm.map", shard=index, shard_count=count, node_count=len(shard["nodes"])):
+            text, usage = self.llm.call_with_usage(prompt, use_cache=use_cache, priority=PRIORITY_BATCH)
+        return shard_name, text, usage
+
+    def summarize(self, repo_full_name: str, pr_number: int, delta: dict, impacted_nodes: list[dict],
+                  external_only: bool, pr_repo_id: str = None, use_cache: bool = True) -> tuple[str, dict]:
+        shards = self.shard(impacted_nodes)
+        LLM_MAP_SHARDS.observe(len(shards))
+        cost = {"calls": 0, "cached_calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0,
+                "shards": len(shards), "failed_shards": 0, "partial": False}
+
+        def add(usage):
+            cost["calls"] += 1
+            cost["cached_calls"] += int(usage["cached"])
+            cost["prompt_tokens"] += usage["prompt_tokens"]
+            cost["completion_tokens"] += usage["completion_tokens"]
+            cost["cost_usd"] += usage["cost_usd"]
+
+        with tracing.span("llm.map_reduce", shard_count=len(shards), node_count=len(impacted_nodes)) as sp:
+            with ThreadPoolExecutor(max_workers=min(self.max_parallel, len(shards)),
+                                    thread_name_prefix="llm-map") as pool:
+                futures = [
+                    pool.submit(tracing.bind_context(self._map), repo_full_name, pr_number, delta, external_only, pr_repo_id,
+                                use_cache, i, len(shards), shard)
+                    for i, shard in enumerate(shards, 1)
+                ]
+            partials, failed = [], 0
+            for future in futures:
+                try:
+                    name, text, usage = future.result()
+                except Exception as e:
+                    log.error(f"Map step failed for {repo_full_name}#{pr_number}: {e}")
+                    failed += 1
+                    continue
+                add(usage)
+                if text:
+                    partials.append((name, text))
+            if failed == len(shards):
+                LLM_MAP_REDUCE_TOTAL.inc(outcome="error")
+                raise Exception("All partial impact summaries failed")
+            if failed:
+                cost.update(failed_shards=failed, partial=True)
+                partials.append(("missing parts", f"{failed} of {len(shards)} parts "
+                                                  "could not be summarized; say the report is incomplete."))
+
+            prompt = PromptBuilder.build_reduce_prompt(repo_full_name, pr_number, partials, external_only,
+                                                       self.shard_token_budget)
+            # an incomplete report must not be served from the cache once the shards recover
+            with tracing.span("llm.reduce", part_count=len(partials)):
+                report, usage = self.llm.call_with_usage(prompt, use_cache=use_cache and not failed)
+            add(usage)
+            LLM_MAP_REDUCE_TOTAL.inc(outcome="partial" if failed else "ok")
+            sp.set(**cost)
+
+        log.info(
+            f"Map-reduce summary for {repo_full_name}#{pr_number}: {cost['shards']} shards, {cost['calls']} calls "
+            f"({cost['cached_calls']} cached), {cost['prompt_tokens']}+{cost['completion_tokens']} tokens, "
+            f"${cost['cost_usd']:.4f}"
+        )
+        return report, cost
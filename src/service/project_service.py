@@ -1,25 +1,52 @@
 import os
 from git import rmtree
 from src.processor.repo_processor import RepoProcessor
+from src.model.graph_model import GraphEdge
 from src.repository.neo4j_repository import Neo4jRepository
 from src.util.logger import log
+from src.util import tracing
+from src.util.graph_lod import LOD_LEVELS, aggregate
+from src.util.metrics import REGISTRY
+from src.util.pagination import decode_cursor, encode_cursor, paginate
+from src.util.search_query import build_entity_query, search_terms
+from src.util.response_cache import CachedResponse, GraphResponseCache, get_graph_response_cache
+
+INGEST_STAGE_SECONDS = REGISTRY.histogram(
+    "chainreaction_ingest_stage_seconds", "Time spent in each stage of repository onboarding", ["stage"])
+INGESTS_TOTAL = REGISTRY.counter(
+    "chainreaction_ingests_total", "Repository onboarding runs by outcome", ["outcome"])
 
 class ProjectService:
+    MAX_NEIGHBORHOOD_DEPTH = 5
+    MAX_NEIGHBORHOOD_NODES = 500
+    MAX_SEARCH_RESULTS = 100
+
     def __init__(self):
         self.repo_processor = RepoProcessor()
         self.neo_repo = Neo4jRepository()
+        self.graph_cache = get_graph_response_cache()
 
     def process_repository(self, repo_id: str, repo_name: str, repo_url: str):
+        with tracing.span("ingest.process_repository", repo_id=repo_id, repo_name=repo_name):
+            return self._process_repository(repo_id, repo_name, repo_url)
+
+    def _process_repository(self, repo_id: str, repo_name: str, repo_url: str):
 
         repo_path = None
         log.info(f"Started processing for repository: {repo_url}")
         try:
-            repo_path = self.repo_processor.clone_repo(repo_name, repo_url)
+            with INGEST_STAGE_SECONDS.time(stage="clone"), tracing.span("ingest.clone"):
+                repo_path = self.repo_processor.clone_repo(repo_name, repo_url)
 
-            nodes, edges = self.repo_processor.process(repo_id, repo_path, repo_name)
+            with INGEST_STAGE_SECONDS.time(stage="extract"), tracing.span("ingest.extract") as sp:
+                nodes, edges = self.repo_processor.process(repo_id, repo_path, repo_name)
+                sp.set(node_count=len(nodes), edge_count=len(edges))
             log.info(f"Extracted {len(nodes)} nodes & {len(edges)} edges. Ingesting...")
 
-            self.neo_repo.store_graph(nodes, edges)
+            with INGEST_STAGE_SECONDS.time(stage="store"), tracing.span("ingest.store"):
+                self.neo_repo.store_graph(nodes, edges)
+            self.graph_cache.invalidate([repo_id])
+            INGESTS_TOTAL.inc(outcome="success")
 
             return {
                 "message": "Repository processed and graph created",
@@ -29,6 +56,7 @@ class ProjectService:
 
         except Exception as e:
             log.error(f"Error processing repository {repo_url}: {e}")
+            INGESTS_TOTAL.inc(outcome="error")
             raise
 
         finally:
@@ -46,7 +74,9 @@ class ProjectService:
         return self.neo_repo.get_all_edges()
 
     def clear_graph(self):
-        return self.neo_repo.clear_all()
+        result = self.neo_repo.clear_all()
+        self.graph_cache.invalidate()
+        return result
 
     def get_edges_between_repos(self, repo_a: str, repo_b: str):
         return self.neo_repo.get_edges_between_repos(repo_a, repo_b)
@@ -54,5 +84,153 @@ class ProjectService:
     def get_graph_for_repos(self, repo_ids: list):
         return self.neo_repo.get_graph_for_repos(repo_ids)
 
+    def graph_cache_key(self, repo_ids: list, level: str = None, expand: list = None) -> tuple | None:
+        if level:
+            self._check_lod_params(level, expand)
+        generations = self.neo_repo.get_graph_generations(repo_ids)
+        return GraphResponseCache.key(repo_ids, generations, level, tuple(expand or ()))
+
+    def get_graph_response(self, key: tuple, repo_ids: list, level: str = None,
+                           expand: list = None) -> CachedResponse:
+        entry = self.graph_cache.get(key)
+        if entry is None:
+            payload = self.get_graph_lod(repo_ids, level, expand) if level else self.get_graph_for_repos(repo_ids)
+            entry = self.graph_cache.put(key, payload)
+        return entry
+
+    def get_nodes_page(self, limit: int, cursor: str = None) -> dict:
+        after = decode_cursor(cursor)
+        nodes = list(self.neo_repo.iter_nodes(after=after[0] if after else None, limit=limit + 1))
+        return paginate(nodes, limit, key=lambda n: [n["uid"]])
+
+    def get_edges_page(self, limit: int, cursor: str = None) -> dict:
+        after = decode_cursor(cursor)
+        if after is not None and len(after) != 3:
+            raise ValueError("invalid cursor")
+        edges = list(self.neo_repo.iter_edges(after=after, limit=limit + 1))
+        return paginate(edges, limit, key=lambda e: [e["src"], e["type"], e["dst"]])
+
+    def get_graph_page(self, repo_ids: list, limit: int, cursor: str = None) -> dict:
+        # a page holds nodes until they run out, then edges; the cursor
+        # records which of the two it stopped in
+        after = decode_cursor(cursor) or ["nodes"]
+        if after[0] not in ("nodes", "edges"):
+            raise ValueError("invalid cursor")
+
+        nodes = []
+        if after[0] == "nodes":
+            nodes = list(self.neo_repo.iter_nodes(repo_ids, after=after[1] if len(after) > 1 else None,
+                                                  limit=limit + 1, graph_fields=True))
+            if len(nodes) > limit:
+                nodes = nodes[:limit]
+                return {"nodes": nodes, "edges": [], "next_cursor": encode_cursor(["nodes", nodes[-1]["id"]])}
+            after = ["edges"]
+
+        remaining = limit - len(nodes)
+        if remaining == 0:
+            return {"nodes": nodes, "edges": [], "next_cursor": encode_cursor(["edges"])}
+        if len(after) not in (1, 4):
+            raise ValueError("invalid cursor")
+        edges = list(self.neo_repo.iter_edges(repo_ids, after=after[1:] or None, limit=remaining + 1,
+                                              graph_fields=True))
+        page = paginate(edges, remaining, key=lambda e: ["edges", e["from"], e["type"], e["to"]])
+        return {"nodes": nodes, "edges": page["items"], "next_cursor": page["next_cursor"]}
+
+    @staticmethod
+    def _check_lod_params(level: str, expand: list = None):
+        if level not in LOD_LEVELS:
+            raise ValueError(f"level must be one of {', '.join(LOD_LEVELS)}")
+        if expand is not None and (not isinstance(expand, list) or not all(isinstance(e, str) for e in expand)):
+            raise ValueError("expand must be a list of group ids")
+
+    def get_graph_lod(self, repo_ids: list, level: str, expand: list = None) -> dict:
+        self._check_lod_params(level, expand)
+        with tracing.span("graph.lod", repo_count=len(repo_ids), level=level,
+                          expand_count=len(expand or [])) as sp:
+            result = aggregate(self.neo_repo.iter_lod_entities(repo_ids), self.neo_repo.iter_lod_edges(repo_ids),
+                               level, expand)
+            sp.set(node_count=len(result["nodes"]), edge_count=len(result["edges"]))
+        return result
+
+    def get_neighborhood(self, uid: str, depth: int = 2, direction: str = "both", edge_types: list = None,
+                         limit: int = 200) -> dict | None:
+        if not uid:
+            raise ValueError("uid is required")
+        if not 1 <= depth <= self.MAX_NEIGHBORHOOD_DEPTH:
+            raise ValueError(f"depth must be between 1 and {self.MAX_NEIGHBORHOOD_DEPTH}")
+        if not 1 <= limit <= self.MAX_NEIGHBORHOOD_NODES:
+            raise ValueError(f"limit must be between 1 and {self.MAX_NEIGHBORHOOD_NODES}")
+        if direction not in ("out", "in", "both"):
+            raise ValueError("direction must be out, in or both")
+        edge_types = [t.upper() for t in edge_types] if edge_types else sorted(GraphEdge.ALLOWED)
+        invalid = [t for t in edge_types if t not in GraphEdge.ALLOWED]
+        if invalid:
+            raise ValueError(f"Invalid edge types: {', '.join(invalid)}")
+
+        start = self.neo_repo.get_entity(uid)
+        if start is None:
+            return None
+
+        # breadth-first, one query per hop, so the nearest nodes fill the limit first
+        nodes = {uid: {**start, "depth": 0}}
+        edges = {}
+        frontier, truncated = [uid], False
+        max_rows = max(limit * 10, 1000)
+        with tracing.span("graph.neighborhood", depth=depth, direction=direction, limit=limit) as sp:
+            for hop in range(1, depth + 1):
+                if not frontier:
+                    break
+                rows = self.neo_repo.get_neighbors(frontier, direction, edge_types, max_rows)
+                truncated = truncated or len(rows) >= max_rows
+                next_frontier = []
+                for row in rows:
+                    via, edge_type, outgoing = row.pop("via"), row.pop("edge_type"), row.pop("outgoing")
+                    if row["id"] not in nodes:
+                        if len(nodes) >= limit:
+                            truncated = True
+                            continue
+                        nodes[row["id"]] = {**row, "depth": hop}
+                        # a Repo node's neighbourhood is the whole repo; it is shown but not expanded
+                        if "Entity" in (row.get("labels") or []):
+                            next_frontier.append(row["id"])
+                    src, dst = (via, row["id"]) if outgoing else (row["id"], via)
+                    edges[(src, edge_type, dst)] = {"from": src, "type": edge_type, "to": dst}
+                frontier = next_frontier
+            sp.set(node_count=len(nodes), edge_count=len(edges), truncated=truncated)
+        return {"root": uid, "nodes": list(nodes.values()), "edges": list(edges.values()), "truncated": truncated}
+
+    def search_entities(self, text: str, kinds: list = None, repo_ids: list = None, limit: int = 20,
+                        fuzzy: bool = True) -> list:
+        if not text or not text.strip():
+            raise ValueError("q is required")
+        if len(text) > 200:
+            raise ValueError("q must be at most 200 characters")
+        if not 1 <= limit <= self.MAX_SEARCH_RESULTS:
+            raise ValueError(f"limit must be between 1 and {self.MAX_SEARCH_RESULTS}")
+        terms = search_terms(text)
+        if not terms:
+            raise ValueError("q has no searchable terms")
+        query = build_entity_query(text, fuzzy)
+        with tracing.span("graph.search", terms=len(terms), limit=limit) as sp:
+            results = self.neo_repo.search_entities(query, kinds or None, repo_ids or None, limit)
+            sp.set(result_count=len(results))
+        return results
+
+    def stream_nodes(self):
+        return self.neo_repo.iter_nodes()
+
+    def stream_edges(self):
+        return self.neo_repo.iter_edges()
+
+    def stream_graph(self, repo_ids: list):
+        for node in self.neo_repo.iter_nodes(repo_ids, graph_fields=True):
+            yield {"node": node}
+        for edge in self.neo_repo.iter_edges(repo_ids, graph_fields=True):
+            yield {"edge": edge}
+
     def create_relationship(self, src_uid: str, dst_uid: str, edge_type: str):
-        return self.neo_repo.create_edge(src_uid, dst_uid, edge_type)
\ No newline at end of file
+        result = self.neo_repo.create_edge(src_uid, dst_uid, edge_type)
+        if result.get("ok"):
+            # the edge may link any two repos; manual edges are rare enough to drop everything
+            self.graph_cache.invalidate()
+        return result
\ No newline at end of file
@@ -1,9 +1,89 @@
 import json
+import math
+import os
 from textwrap import dedent
+from src.util.logger import log
 
 
 class PromptBuilder:
 
+    TOKEN_BUDGET = int(os.environ.get("PROMPT_TOKEN_BUDGET", "8000"))
+    MIN_IMPACT_TOKENS = 500
+    EXAMPLES_PER_FILE = 3
+    MAX_REPO_LINES = 20
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        # ~4 characters per token for English and code; close enough for budgeting
+        return math.ceil(len(text) / 4)
+
+    @staticmethod
+    def _node_line(n: dict) -> str:
+        return (
+            f"- [{n['kind']}] {n['name']}  (path: {n['path']})\n"
+            f"  from git_repo_name: {n['repo_name']} | repo_id: {n['repo_id']}  |"
+        )
+
+    @staticmethod
+    def compact_impacted_nodes(impact_nodes: list[dict], budget_tokens: int, pr_repo_id: str = None) -> list[str]:
+        lines = [PromptBuilder._node_line(n) for n in impact_nodes]
+        if PromptBuilder.estimate_tokens("\n".join(lines)) <= budget_tokens:
+            return lines
+
+        def external(n):
+            return pr_repo_id is not None and n.get("repo_id") != pr_repo_id
+
+        def depth(n):
+            return n.get("depth") if n.get("depth") is not None else math.inf
+
+        groups = {}
+        for n in impact_nodes:
+            groups.setdefault((n.get("repo_name"), n.get("repo_id"), n.get("path")), []).append(n)
+        for nodes in groups.values():
+            nodes.sort(key=lambda n: (depth(n), n.get("kind") or "", n.get("name") or ""))
+        # cross-repo files first, then the closest to the change, then the largest
+        ranked = sorted(groups.items(), key=lambda g: (not external(g[1][0]), depth(g[1][0]), -len(g[1])))
+
+        repos = {}
+        for (repo_name, repo_id, _), nodes in ranked:
+            entry = repos.setdefault((repo_name, repo_id), {"files": 0, "nodes": 0, "external": external(nodes[0])})
+            entry["files"] += 1
+            entry["nodes"] += len(nodes)
+        repo_items = sorted(repos.items(), key=lambda r: (not r[1]["external"], -r[1]["nodes"]))
+        out = [f"Impact too large to list ({len(impact_nodes)} nodes in {len(groups)} files); compacted by repo and file."]
+        out += [
+            f"- repo {name} | repo_id: {rid} | {'cross-repo' if r['external'] else 'same repo'} | "
+            f"{r['nodes']} nodes in {r['files']} files"
+            for (name, rid), r in repo_items[:PromptBuilder.MAX_REPO_LINES]
+        ]
+        if len(repo_items) > PromptBuilder.MAX_REPO_LINES:
+            out.append(f"- ... and {len(repo_items) - PromptBuilder.MAX_REPO_LINES} more repos")
+        out.append("")
+        out.append("Most relevant files (closest and cross-repo first):")
+
+        used = PromptBuilder.estimate_tokens("\n".join(out))
+        shown_files = shown_nodes = 0
+        for (repo_name, repo_id, path), nodes in ranked:
+            examples = nodes[:PromptBuilder.EXAMPLES_PER_FILE]
+            block = [f"- {repo_name} | repo_id: {repo_id} | path: {path} | {len(nodes)} impacted, min depth {nodes[0].get('depth')}"]
+            block += [f"  - [{n['kind']}] {n['name']} (depth {n.get('depth')})" for n in examples]
+            if len(nodes) > len(examples):
+                block.append(f"  - ... and {len(nodes) - len(examples)} more in this file")
+            cost = PromptBuilder.estimate_tokens("\n".join(block)) + 1
+            # reserve room for the trailing summary line
+            if used + cost > budget_tokens - 30:
+                break
+            out += block
+            used += cost
+            shown_files += 1
+            shown_nodes += len(nodes)
+        if shown_files < len(ranked):
+            out.append(
+                f"- ... {len(ranked) - shown_files} more files with {len(impact_nodes) - shown_nodes} "
+                f"impacted nodes omitted (counted in the repo totals above)"
+            )
+        return out
+
     @staticmethod
     def build_header(external_only:bool=False) -> str:
             if external_only:
@@ -25,16 +105,27 @@ class PromptBuilder:
             
 
     @staticmethod
-    def build_impact_prompt(pr_repo_name:str, pr_number:int, delta:dict, impact_nodes:list[dict], external_only:bool=False) -> str:
+    def build_impact_prompt(pr_repo_name:str, pr_number:int, delta:dict, impact_nodes:list[dict], external_only:bool=False,
+                            pr_repo_id:str=None, token_budget:int=None) -> str:
         header = PromptBuilder.build_header(external_only)
         updated = delta.get("modified", {})
+        removed = delta.get("removed", [])
+        new_deps = delta.get("added_edges", [])
+        dropped_deps = delta.get("removed_edges", [])
 
-        impacted_summary = [
-            f"- [{n['kind']}] {n['name']}  (path: {n['path']})\n"
-            f"  from git_repo_name: {n['repo_name']} | repo_id: {n['repo_id']}  |"
-            for n in impact_nodes
-        ]
+        budget = token_budget or PromptBuilder.TOKEN_BUDGET
+        fixed = PromptBuilder._render_impact_prompt(header, pr_repo_name, pr_number, updated, removed,
+                                                    new_deps, dropped_deps, [])
+        node_budget = max(budget - PromptBuilder.estimate_tokens(fixed), PromptBuilder.MIN_IMPACT_TOKENS)
+        impacted_summary = PromptBuilder.compact_impacted_nodes(impact_nodes, node_budget, pr_repo_id)
+        if len(impacted_summary) != len(impact_nodes):
+            log.info(f"Compacted {len(impact_nodes)} impacted nodes into {len(impacted_summary)} prompt lines")
+        return PromptBuilder._render_impact_prompt(header, pr_repo_name, pr_number, updated, removed,
+                                                   new_deps, dropped_deps, impacted_summary)
 
+    @staticmethod
+    def _render_impact_prompt(header, pr_repo_name, pr_number, updated, removed, new_deps, dropped_deps,
+                              impacted_summary) -> str:
         prompt = dedent(f"""
         You are generating a **short, concise Markdown impact table** based ONLY on the data provided.
         
@@ -45,6 +136,9 @@ class PromptBuilder:
 
         ## Changed Nodes Count
         **Modified:** {len(updated)}
+        **Removed:** {len(removed)}
+        **New dependencies:** {len(new_deps)}
+        **Dropped dependencies:** {len(dropped_deps)}
 
         ## Impacted Nodes
         {chr(10).join(impacted_summary)}
@@ -85,3 +179,46 @@ class PromptBuilder:
         """)
 
         return header + prompt
+
+    @staticmethod
+    def build_shard_prompt(pr_repo_name:str, pr_number:int, delta:dict, impact_nodes:list[dict], external_only:bool,
+                           pr_repo_id:str, shard_index:int, shard_count:int, shard_name:str, token_budget:int=None) -> str:
+        intro = (
+            f"PARTIAL REPORT {shard_index}/{shard_count}\n"
+            f"This part covers only the impacted nodes in: {shard_name}. "
+            "Report on these nodes only; a later step merges all parts.\n\n"
+        )
+        budget = (token_budget or PromptBuilder.TOKEN_BUDGET) - PromptBuilder.estimate_tokens(intro)
+        return intro + PromptBuilder.build_impact_prompt(
+            pr_repo_name, pr_number, delta, impact_nodes, external_only, pr_repo_id, budget)
+
+    @staticmethod
+    def build_reduce_prompt(pr_repo_name:str, pr_number:int, partials:list[tuple[str, str]], external_only:bool=False,
+                            token_budget:int=None) -> str:
+        header = PromptBuilder.build_header(external_only)
+        budget = token_budget or PromptBuilder.TOKEN_BUDGET
+        # every part gets an equal share of the budget, minus room for the instructions
+        per_part_chars = max((budget - 600) * 4 // max(len(partials), 1), 400)
+        parts = []
+        for i, (name, text) in enumerate(partials, 1):
+            text = text.strip()
+            if len(text) > per_part_chars:
+                text = text[:per_part_chars] + "\n[... truncated]"
+            parts.append(f"### Part {i}: {name}\n{text}")
+        return header + dedent(f"""
+        You are merging {len(partials)} partial impact reports for pull request **#{pr_number}** in repo **{pr_repo_name}**
+        into ONE short GitHub Markdown report.
+
+        Output exactly two tables:
+        ### 1. ChAIn Reaction Summary (columns: Area, Why Impacted, Type of Change, Risk Level)
+        ### B. Code Level Impact (columns: Kind, Name, Repo, Path, Impact Reason)
+
+        ### HARD RULES (STRICT)
+        - Merge duplicate rows; when rows conflict keep the higher Risk Level
+        - Prefer cross-repo rows; at most 25 rows in the Code Level Impact table
+        - Mention counts that the parts summarized instead of listing them
+        - ONLY use information present in the parts below
+        - NO paragraphs, NO narration
+
+        """) + "\n\n".join(parts) + "\n\nBegin generating the FINAL merged Markdown tables now:\n"
+
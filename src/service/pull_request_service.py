@@ -1,12 +1,42 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from contextlib import contextmanager
+from src.repository.analysis_repository import AnalysisRepository
+from src.repository.neo4j_repository import Neo4jRepository
+from src.repository.prepared_analysis_repository import PreparedAnalysisRepository
 from src.repository.user_repository import UserRepository
+from src.service.async_analysis_pipeline import AsyncAnalysisPipeline
 from src.service.graph_delta_service import GraphDeltaService
 from src.service.impact_service import ImpactService
 from src.service.prompt_service import PromptBuilder
+from src.service.report_renderer import ReportRenderer
 from src.util.logger import log
 from src.service.comment_notification_service import CommentNotificationService
 from src.service.github_service import GitHubService
 from src.service.diff_analyzer_service import DiffAnalyzerService
+from src.service.hunk_mapping_service import HunkMappingService
 from src.service.llm_service import LLMService
+from src.service.map_reduce_summary_service import MapReduceSummaryService
+from src.util import tracing
+from src.util.metrics import REGISTRY
+
+PR_STAGE_SECONDS = REGISTRY.histogram(
+    "chainreaction_pr_stage_seconds", "Time spent in each stage of a PR analysis", ["stage"])
+PR_ANALYSIS_SECONDS = REGISTRY.histogram(
+    "chainreaction_pr_analysis_seconds", "End-to-end PR analysis time by outcome", ["outcome"])
+PR_ANALYSES_TOTAL = REGISTRY.counter(
+    "chainreaction_pr_analyses_total", "PR analyses by outcome", ["outcome"])
+PR_REPORT_FALLBACKS_TOTAL = REGISTRY.counter(
+    "chainreaction_pr_report_fallbacks_total", "Deterministic reports posted because the LLM missed its deadline",
+    ["result"])
+
+
+@contextmanager
+def _stage(name: str, **attributes):
+    with PR_STAGE_SECONDS.time(stage=name), tracing.span(f"pr.{name}", **attributes) as sp:
+        yield sp
 
 
 class PullRequestService:
@@ -14,59 +44,374 @@ class PullRequestService:
         self.github = GitHubService()
         self.analyzer = DiffAnalyzerService()
         self.delta_service = GraphDeltaService()
+        self.hunk_mapper = HunkMappingService()
         self.impact_service = ImpactService()
         self.notification_service = CommentNotificationService()
         self.llm = LLMService(provider="gemini")
+        self.summarizer = MapReduceSummaryService(self.llm)
+        # 0 waits for the LLM however long it takes
+        self.llm_deadline = float(os.environ.get("LLM_DEADLINE_SECONDS", "0"))
+        self._llm_executor = ThreadPoolExecutor(
+            max_workers=int(os.environ.get("LLM_DEADLINE_WORKERS", "4")), thread_name_prefix="llm-report")
         self.user_repository = UserRepository()
+        self.analysis_repository = AnalysisRepository()
+        self.neo_repo = Neo4jRepository()
+        self.prepared_repository = PreparedAnalysisRepository()
+        self.speculative_enabled = os.environ.get("SPECULATIVE_ANALYSIS", "").lower() in ("1", "true", "yes")
+        self.speculative_wait = float(os.environ.get("SPECULATIVE_WAIT_SECONDS", "300"))
+        self.speculative_ttl = float(os.environ.get("SPECULATIVE_TTL_SECONDS", "1800"))
+        self._speculative_executor = ThreadPoolExecutor(
+            max_workers=int(os.environ.get("SPECULATIVE_WORKERS", "2")), thread_name_prefix="pre-analysis")
+        self.pipeline = os.environ.get("PR_PIPELINE", "sequential").lower()
+        self.async_pipeline = AsyncAnalysisPipeline(self)
 
     def _fetch_pr_files(self, repo_full_name: str, pr_number: int):
-        return self.github.get_pr_files(repo_full_name, pr_number)
+        # a listing page that cannot be fetched fails the run like the old
+        # all-at-once listing did, instead of analyzing a partial PR
+        try:
+            yield from self.github.iter_pr_files_limited(repo_full_name, pr_number)
+        except Exception as e:
+            log.error(f"Could not list the files of {repo_full_name}#{pr_number}: {e}")
+            raise Exception("Could not fetch the pull request files from GitHub.") from e
 
-    def _prepare_files_content(self, repo_full_name: str, files: list) -> dict:
+    def _prepare_files_content(self, repo_full_name: str, files) -> dict:
         return self.github.build_files_content(repo_full_name, files)
 
-    def _compute_delta(self, analysis_result: dict):
-        return self.delta_service.compute_delta(
-            pr_nodes=analysis_result.get("nodes", []),
-            pr_edges=analysis_result.get("edges", []),
-        )
+    def _is_source(self, path: str | None) -> bool:
+        return bool(path) and any(ext.matches(path) for ext in self.analyzer.repo_processor.router.extractors)
 
+    def _classify_file(self, f: dict):
+        # removed files and the old side of renames only contribute removed
+        # entities; files without content changes, or that no extractor
+        # reads, are not downloaded at all. Shared by both pipelines.
+        status = f.get("status")
+        parse = bool(f.get("sha")) and self._is_source(f.get("filename"))
+        if status == "removed":
+            return False, f.get("filename")
+        if status == "renamed" and f.get("previous_filename"):
+            return parse, f["previous_filename"]
+        if status == "unchanged" or (f.get("changes") == 0 and not f.get("patch")):
+            return False, None
+        return parse, None
 
-    def analyze_pr(self, repo_full_name: str, pr_number: int, clone_url: str, external_only: bool = False)-> None:
-        try:
-            log.info(f"Analyzing PR {repo_full_name}#{pr_number} (external_only={external_only})")
-            repo = self.user_repository.get_repo_by_url(clone_url)
-            if not repo:
-                raise Exception("Repository not found in the system. Please onboard the repo first.")
-            files = self._fetch_pr_files(repo_full_name, pr_number)
-            files_content = self._prepare_files_content(repo_full_name, files)
+    def _iter_parseable_files(self, files, parsed: list, removed_paths: list):
+        for f in files:
+            parse, removed_path = self._classify_file(f)
+            if removed_path:
+                removed_paths.append(removed_path)
+            if parse:
+                parsed.append(f)
+                yield f
+
+    def _compute_delta(self, analysis_result: dict, files: list, touched_paths: list):
+        nodes = analysis_result.get("nodes", [])
+        with _stage("delta", node_count=len(nodes)) as sp:
+            delta = self.delta_service.compute_delta(
+                pr_nodes=nodes,
+                pr_edges=analysis_result.get("edges", []),
+                touched_paths=touched_paths,
+                hunk_uids=self.hunk_mapper.map_changed_entities(files, nodes),
+            )
+            sp.set(**{k: len(delta.get(k, [])) for k in ("added", "modified", "removed", "added_edges", "removed_edges")})
+            return delta
+
+
+    def _prepare_analysis(self, repo_full_name: str, pr_number: int, clone_url: str) -> dict:
+        # everything up to and including the delta; the report step is separate
+        repo = self.user_repository.get_repo_by_url(clone_url)
+        if not repo:
+            raise Exception("Repository not found in the system. Please onboard the repo first.")
+        # taken before extraction so a graph update mid-run invalidates the result
+        generations = self.neo_repo.get_graph_generations([repo["id"]])
+        # the listing is paged lazily and each file is queued for download
+        # as soon as its page arrives
+        files, removed_paths = [], []
+        with _stage("github_fetch") as sp:
+            files_content = self._prepare_files_content(
+                repo_full_name,
+                self._iter_parseable_files(self._fetch_pr_files(repo_full_name, pr_number), files, removed_paths),
+            )
+            sp.set(file_count=len(files), removed_count=len(removed_paths))
+        with _stage("extract", file_count=len(files_content)) as sp:
             result = self.analyzer.analyze_files(pr_number, files_content, repo)
+            sp.set(node_count=len(result.get("nodes", [])), edge_count=len(result.get("edges", [])))
 
-            delta = self._compute_delta(result)
+        delta = self._compute_delta(result, files, list(files_content.keys()) + removed_paths)
+        return {"repo": repo, "delta": delta, "impacted": {}, "generations": generations,
+                "impact_lock": threading.Lock()}
 
-            impacted_nodes = self.impact_service.get_impact(delta, external_only)
-            log.info(impacted_nodes)
+    def _get_impact(self, prepared: dict, external_only: bool) -> list:
+        # a pre-analysis is shared by the speculative run and the trigger;
+        # the second caller waits for the traversal instead of repeating it
+        with prepared["impact_lock"]:
+            impacted = prepared["impacted"]
+            if external_only not in impacted:
+                with _stage("impact"):
+                    impacted[external_only] = self.impact_service.get_impact(prepared["delta"], external_only)
+            return impacted[external_only]
 
-            if not impacted_nodes:
-                self.notification_service.post_no_impact_comment(repo_full_name, pr_number)
+    def queue_speculative(self, repo_full_name: str, pr_number: int, clone_url: str, head_sha: str) -> bool:
+        # registered before it is queued, so a newer head supersedes it and a
+        # trigger for this head waits for it, on any worker
+        if not self.prepared_repository.begin(repo_full_name, pr_number, head_sha, self.speculative_wait):
+            log.info(f"Pre-analysis for {repo_full_name}#{pr_number}@{head_sha[:7]} already available")
+            return False
+        self._speculative_executor.submit(
+            tracing.bind_context(self.prepare_speculatively), repo_full_name, pr_number, clone_url, head_sha)
+        return True
+
+    def _superseded(self, repo_full_name: str, pr_number: int, head_sha: str) -> bool:
+        if self.prepared_repository.is_current(repo_full_name, pr_number, head_sha):
+            return False
+        log.info(f"Pre-analysis of {repo_full_name}#{pr_number}@{head_sha[:7]} superseded by a newer push")
+        return True
+
+    @classmethod
+    def _to_stored(cls, prepared: dict) -> dict:
+        # JSON has no bool keys, so impact results are stored by mode name
+        return {"repo": prepared["repo"], "delta": prepared["delta"], "generations": prepared["generations"],
+                "impacted": {cls._mode(external_only): nodes for external_only, nodes in prepared["impacted"].items()}}
+
+    @classmethod
+    def _from_stored(cls, stored: dict) -> dict:
+        impacted = {external_only: stored["impacted"][cls._mode(external_only)]
+                    for external_only in (False, True) if cls._mode(external_only) in stored["impacted"]}
+        return {**stored, "impacted": impacted, "impact_lock": threading.Lock()}
+
+    def prepare_speculatively(self, repo_full_name: str, pr_number: int, clone_url: str, head_sha: str) -> None:
+        prepared = None
+        try:
+            if self._superseded(repo_full_name, pr_number, head_sha):
                 return
+            log.info(f"Pre-analyzing {repo_full_name}#{pr_number}@{head_sha[:7]}")
+            with tracing.span("pr.prepare_speculatively", repo=repo_full_name, pr_number=pr_number, head_sha=head_sha):
+                prepared = self._prepare_analysis(repo_full_name, pr_number, clone_url)
+                # the impact traversal is the expensive part; skip it for an outdated head
+                if self._superseded(repo_full_name, pr_number, head_sha):
+                    return
+                for external_only in (False, True):
+                    self._get_impact(prepared, external_only)
+        except Exception as e:
+            log.error(f"Speculative pre-analysis failed for {repo_full_name}#{pr_number}: {e}")
+            prepared = None
+        finally:
+            # a no-op for a superseded head
+            try:
+                self.prepared_repository.complete(repo_full_name, pr_number, head_sha,
+                                                  prepared and self._to_stored(prepared), self.speculative_ttl)
+            except Exception as e:
+                log.error(f"Could not store pre-analysis of {repo_full_name}#{pr_number}: {e}")
+
+    def _get_speculative(self, repo_full_name: str, pr_number: int, head_sha: str) -> dict | None:
+        # waits for a pre-analysis of the same head that is still running
+        try:
+            stored = self.prepared_repository.get(repo_full_name, pr_number, head_sha, self.speculative_wait)
+        except Exception as e:
+            log.warning(f"Could not read pre-analysis: {e}")
+            return None
+        if stored is None:
+            return None
+        prepared = self._from_stored(stored)
+        if not self._graphs_unchanged(prepared["generations"]):
+            log.info(f"Pre-analysis of {repo_full_name}#{pr_number}@{head_sha[:7]} is stale, graph has changed")
+            self.prepared_repository.discard(repo_full_name, pr_number, head_sha)
+            return None
+        log.info(f"Using pre-analysis of {repo_full_name}#{pr_number}@{head_sha[:7]}")
+        return prepared
+
+    def _get_prepared(self, repo_full_name: str, pr_number: int, clone_url: str, head_sha: str | None,
+                      force: bool = False) -> dict:
+        prepared = self._get_speculative(repo_full_name, pr_number, head_sha) if head_sha and not force else None
+        return prepared or self._prepare_analysis(repo_full_name, pr_number, clone_url)
+
+    def _graphs_unchanged(self, generations: dict) -> bool:
+        try:
+            return self.neo_repo.get_graph_generations(list(generations)) == generations
+        except Exception as e:
+            log.warning(f"Could not read graph generations: {e}")
+            return False
+
+    @staticmethod
+    def _mode(external_only: bool) -> str:
+        return "external" if external_only else "full"
 
+    def _get_cached_result(self, repo_full_name: str, head_sha: str, external_only: bool) -> dict | None:
+        try:
+            cached = self.analysis_repository.get_result(repo_full_name, head_sha, self._mode(external_only))
+            if not cached:
+                return None
+            if not self._graphs_unchanged(cached["generations"]):
+                log.info(f"Cached analysis for {repo_full_name}@{head_sha[:7]} is stale, graph has changed")
+                return None
+            return cached
+        except Exception as e:
+            log.warning(f"Could not read cached analysis: {e}")
+            return None
+
+    def _save_result(self, repo_full_name: str, pr_number: int, head_sha: str | None, external_only: bool,
+                     prepared: dict, impacted_nodes: list, report: str | None):
+        if not head_sha or prepared["delta"].get("error"):
+            return
+        try:
+            generations = dict(prepared.get("generations") or {})
+            other_repos = {n.get("repo_id") for n in impacted_nodes} - set(generations) - {None}
+            if other_repos:
+                generations.update(self.neo_repo.get_graph_generations(list(other_repos)))
+            self.analysis_repository.save_result(
+                repo_full_name, pr_number, head_sha, self._mode(external_only),
+                generations, prepared["delta"], impacted_nodes, report,
+            )
+        except Exception as e:
+            log.warning(f"Could not cache analysis result: {e}")
+
+    def _post_cached(self, repo_full_name: str, pr_number: int, head_sha: str, cached: dict) -> str:
+        log.info(f"Posting cached analysis for {repo_full_name}#{pr_number}@{head_sha[:7]}")
+        with _stage("comment"):
+            if cached["report"] is None:
+                self.notification_service.post_no_impact_comment(repo_full_name, pr_number)
+            else:
+                self.notification_service.post_impact_comment(repo_full_name, pr_number, cached["report"])
+        return "cached"
+
+    def _report(self, repo_full_name: str, pr_number: int, head_sha: str | None, external_only: bool,
+                prepared: dict, impacted_nodes: list, force: bool = False) -> str:
+        if not impacted_nodes:
+            self._save_result(repo_full_name, pr_number, head_sha, external_only, prepared, impacted_nodes, None)
+            with _stage("comment"):
+                self.notification_service.post_no_impact_comment(repo_full_name, pr_number)
+            return "no_impact"
+
+        pr_repo_id = (prepared.get("repo") or {}).get("id")
+        if self.llm_deadline > 0:
+            return self._report_with_deadline(repo_full_name, pr_number, head_sha, external_only, prepared,
+                                              impacted_nodes, pr_repo_id, force)
+
+        with _stage("llm", impacted_count=len(impacted_nodes)):
+            llm_response, partial = self._summarize(repo_full_name, pr_number, external_only, prepared,
+                                                    impacted_nodes, pr_repo_id, force)
+        if not partial:
+            self._save_result(repo_full_name, pr_number, head_sha, external_only, prepared, impacted_nodes,
+                              llm_response)
+        with _stage("comment"):
+            self.notification_service.post_impact_comment(repo_full_name, pr_number, llm_response)
+        return "reported"
+
+    def _summarize(self, repo_full_name: str, pr_number: int, external_only: bool, prepared: dict,
+                   impacted_nodes: list, pr_repo_id: str | None, force: bool) -> tuple[str, bool]:
+        # a forced run also skips cached LLM responses; a partial report,
+        # with map shards missing, is not cached either
+        if self.summarizer.needs_map_reduce(impacted_nodes):
+            log.info(f"Impact of {len(impacted_nodes)} nodes is too large for one prompt, using map-reduce...")
+            llm_response, usage = self.summarizer.summarize(
+                repo_full_name, pr_number, prepared["delta"], impacted_nodes, external_only, pr_repo_id,
+                use_cache=not force)
+        else:
             prompt = PromptBuilder.build_impact_prompt(
                 pr_repo_name=repo_full_name,
                 pr_number=pr_number,
-                delta=delta,
+                delta=prepared["delta"],
                 impact_nodes=impacted_nodes,
-                external_only=external_only
+                external_only=external_only,
+                pr_repo_id=pr_repo_id,
             )
+            log.info("Calling LLM for impact analysis...")
+            llm_response, usage = self.llm.call_with_usage(prompt, use_cache=not force)
+        tracing.set_attributes(**usage)
+        return llm_response, usage.get("partial", False)
 
+    def _report_with_deadline(self, repo_full_name: str, pr_number: int, head_sha: str | None, external_only: bool,
+                              prepared: dict, impacted_nodes: list, pr_repo_id: str | None, force: bool) -> str:
+        # the LLM races the deadline; if it loses, reviewers get the graph-only
+        # tables now and the comment is edited once the LLM answers
+        future = self._llm_executor.submit(
+            tracing.bind_context(self._summarize), repo_full_name, pr_number, external_only, prepared,
+            impacted_nodes, pr_repo_id, force)
+        try:
+            with _stage("llm", impacted_count=len(impacted_nodes), deadline=self.llm_deadline):
+                llm_response, partial = future.result(timeout=self.llm_deadline)
+        except FuturesTimeoutError:
+            llm_response = None
 
-            log.info("Calling LLM for impact analysis...")
-            llm_response = self.llm.call(prompt)
-            self.notification_service.post_impact_comment(repo_full_name, pr_number, llm_response)
+        if llm_response is not None:
+            if not partial:
+                self._save_result(repo_full_name, pr_number, head_sha, external_only, prepared, impacted_nodes,
+                                  llm_response)
+            with _stage("comment"):
+                self.notification_service.post_impact_comment(repo_full_name, pr_number, llm_response)
+            return "reported"
 
-        except Exception as e:
-            log.error(f"Error analyzing PR: {e}")
-            self.notification_service.post_error_comment(repo_full_name, pr_number, str(e))
+        log.info(f"LLM missed the {self.llm_deadline:.0f}s deadline for {repo_full_name}#{pr_number}, "
+                 f"posting the deterministic report")
+        fallback = ReportRenderer.render(repo_full_name, pr_number, prepared["delta"], impacted_nodes,
+                                         external_only, pr_repo_id, pending=True)
+        with _stage("comment", fallback=True):
+            comment_id = self.notification_service.create_comment(repo_full_name, pr_number, fallback)
+        future.add_done_callback(tracing.bind_context(
+            lambda f: self._replace_fallback(repo_full_name, pr_number, head_sha, external_only, prepared,
+                                             impacted_nodes, pr_repo_id, comment_id, f)))
+        return "fallback"
+
+    def _replace_fallback(self, repo_full_name: str, pr_number: int, head_sha: str | None, external_only: bool,
+                          prepared: dict, impacted_nodes: list, pr_repo_id: str | None, comment_id: int | None,
+                          future) -> None:
+        with tracing.span("pr.replace_fallback", repo=repo_full_name, pr_number=pr_number, comment_id=comment_id):
+            try:
+                llm_response, partial = future.result()
+            except Exception as e:
+                log.error(f"LLM report for {repo_full_name}#{pr_number} failed after the fallback was posted: {e}")
+                PR_REPORT_FALLBACKS_TOTAL.inc(result="llm_failed")
+                # drop the "will be updated" note so the fallback reads as final
+                if comment_id:
+                    self.notification_service.update_comment(repo_full_name, comment_id, ReportRenderer.render(
+                        repo_full_name, pr_number, prepared["delta"], impacted_nodes, external_only, pr_repo_id))
+                return
+
+            if not partial:
+                self._save_result(repo_full_name, pr_number, head_sha, external_only, prepared, impacted_nodes,
+                                  llm_response)
+            if comment_id:
+                self.notification_service.update_comment(repo_full_name, comment_id, llm_response)
+            else:
+                self.notification_service.post_impact_comment(repo_full_name, pr_number, llm_response)
+            PR_REPORT_FALLBACKS_TOTAL.inc(result="replaced")
+
+    def _analyze_sequential(self, repo_full_name: str, pr_number: int, clone_url: str, external_only: bool,
+                            force: bool) -> str:
+        with _stage("head_sha"):
+            head_sha = self.github.get_pr_head_sha(repo_full_name, pr_number)
+        tracing.set_attributes(head_sha=head_sha)
+
+        # same head, same mode and unchanged graphs give the same report
+        with _stage("cache_lookup"):
+            cached = None if force or not head_sha else self._get_cached_result(repo_full_name, head_sha, external_only)
+        if cached:
+            return self._post_cached(repo_full_name, pr_number, head_sha, cached)
+
+        prepared = self._get_prepared(repo_full_name, pr_number, clone_url, head_sha, force)
 
+        impacted_nodes = self._get_impact(prepared, external_only)
+        log.info(impacted_nodes)
+        return self._report(repo_full_name, pr_number, head_sha, external_only, prepared, impacted_nodes, force)
 
+    def analyze_pr(self, repo_full_name: str, pr_number: int, clone_url: str, external_only: bool = False,
+                   force: bool = False) -> None:
+        started = time.perf_counter()
+        outcome = "error"
+        with tracing.span("pr.analyze", repo=repo_full_name, pr_number=pr_number, external_only=external_only,
+                          force=force, pipeline=self.pipeline) as root:
+            try:
+                log.info(f"Analyzing PR {repo_full_name}#{pr_number} (external_only={external_only}, force={force})")
+                if self.pipeline == "async":
+                    outcome = self.async_pipeline.run(repo_full_name, pr_number, clone_url, external_only, force)
+                else:
+                    outcome = self._analyze_sequential(repo_full_name, pr_number, clone_url, external_only, force)
 
+            except Exception as e:
+                log.error(f"Error analyzing PR: {e}")
+                self.notification_service.post_error_comment(repo_full_name, pr_number, str(e))
+            finally:
+                root.set(outcome=outcome)
+                elapsed = time.perf_counter() - started
+                PR_ANALYSIS_SECONDS.observe(elapsed, outcome=outcome)
+                PR_ANALYSES_TOTAL.inc(outcome=outcome)
+                log.info(f"PR {repo_full_name}#{pr_number} analysis finished in {elapsed:.2f}s ({outcome})")
@@ -0,0 +1,102 @@
+import math
+import posixpath
+
+
+class ReportRenderer:
+    """Builds the impact report tables straight from the impacted nodes.
+
+    Produces the same two tables the LLM is asked for, without any model
+    call, so a report can be posted while the LLM is slow or unavailable.
+    """
+
+    MAX_AREAS = 15
+    MAX_ROWS = 25
+
+    @staticmethod
+    def _cell(value) -> str:
+        return str(value if value is not None else "-").replace("|", "\\|").replace("\n", " ")
+
+    @staticmethod
+    def _depth(n: dict):
+        return n.get("depth") if n.get("depth") is not None else math.inf
+
+    @staticmethod
+    def _change_type(delta: dict) -> str:
+        parts = []
+        for key, label in (("modified", "modified"), ("removed", "removed"), ("added", "added")):
+            if delta.get(key):
+                parts.append(f"{len(delta[key])} {label}")
+        edges = len(delta.get("added_edges", [])) + len(delta.get("removed_edges", []))
+        if edges:
+            parts.append(f"{edges} dependency edges changed")
+        return ", ".join(parts) or "-"
+
+    @staticmethod
+    def _risk(min_depth, external: bool, removed: bool) -> str:
+        if min_depth <= 1 and (external or removed):
+            return "High"
+        if min_depth <= 2 or external:
+            return "Medium"
+        return "Low"
+
+    @staticmethod
+    def render(pr_repo_name: str, pr_number: int, delta: dict, impact_nodes: list[dict], external_only: bool = False,
+               pr_repo_id: str = None, pending: bool = False) -> str:
+        def external(n):
+            return pr_repo_id is not None and n.get("repo_id") != pr_repo_id
+
+        areas = {}
+        for n in impact_nodes:
+            package = posixpath.dirname(n.get("path") or "") or "."
+            areas.setdefault((n.get("repo_name") or n.get("repo_id"), package), []).append(n)
+        ranked = sorted(areas.items(), key=lambda a: (not external(a[1][0]),
+                                                      min(ReportRenderer._depth(n) for n in a[1]), -len(a[1])))
+        change_type = ReportRenderer._change_type(delta)
+        removed = bool(delta.get("removed"))
+
+        title = "External Impact Report" if external_only else "Impact Report"
+        lines = [
+            f"## 🔗 ChAIn Reaction {title}",
+            "",
+            f"**{len(impact_nodes)}** impacted nodes in **{len(areas)}** areas for #{pr_number} in "
+            f"`{pr_repo_name}`.",
+            "",
+            "### 1. ChAIn Reaction Summary",
+            "| Area | Why Impacted | Type of Change | Risk Level |",
+            "|---|---|---|---|",
+        ]
+        for (repo_name, package), nodes in ranked[:ReportRenderer.MAX_AREAS]:
+            min_depth = min(ReportRenderer._depth(n) for n in nodes)
+            scope = "cross-repo" if external(nodes[0]) else "same repo"
+            why = f"{len(nodes)} nodes depend on the change ({scope}, closest at depth {min_depth})"
+            lines.append(
+                f"| {ReportRenderer._cell(f'{repo_name}/{package}')} | {ReportRenderer._cell(why)} | "
+                f"{change_type} | {ReportRenderer._risk(min_depth, external(nodes[0]), removed)} |"
+            )
+        if len(ranked) > ReportRenderer.MAX_AREAS:
+            lines.append(f"| ... | {len(ranked) - ReportRenderer.MAX_AREAS} more areas | | |")
+
+        rows = sorted(impact_nodes, key=lambda n: (not external(n), ReportRenderer._depth(n),
+                                                   n.get("kind") or "", n.get("name") or ""))
+        lines += [
+            "",
+            "### B. Code Level Impact",
+            "| Kind | Name | Repo | Path | Impact Reason |",
+            "|---|---|---|---|---|",
+        ]
+        for n in rows[:ReportRenderer.MAX_ROWS]:
+            depth = n.get("depth")
+            reason = "Direct dependency of changed code" if depth == 1 else f"Transitive dependency (depth {depth})"
+            if external(n):
+                reason = f"Cross-repo: {reason[0].lower()}{reason[1:]}"
+            lines.append(
+                f"| {ReportRenderer._cell(n.get('kind'))} | {ReportRenderer._cell(n.get('name'))} | "
+                f"{ReportRenderer._cell(n.get('repo_name'))} | {ReportRenderer._cell(n.get('path'))} | {reason} |"
+            )
+        if len(rows) > ReportRenderer.MAX_ROWS:
+            lines.append(f"| ... | {len(rows) - ReportRenderer.MAX_ROWS} more nodes | | | |")
+
+        if pending:
+            lines += ["", "_Generated from the dependency graph. This comment will be updated with an "
+                          "AI-written summary when it is ready._"]
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,37 @@
+import importlib
+
+import pytest
+
+from src.repository.lease_repository import LeaseRepository
+from src.service.project_service import ProjectService
+from src.service.pull_request_service import PullRequestService
+from src.service.user_service import UserService
+from src.util.response_cache import GraphResponseCache
+
+
+@pytest.fixture(scope="session")
+def pr_controller():
+    # the module builds its services on import; keep them off Neo4j/Postgres
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(PullRequestService, "__init__", lambda self: None)
+        mp.setattr(LeaseRepository, "__init__", lambda self: None)
+        return importlib.import_module("src.controller.pull_request_controller")
+
+
+@pytest.fixture(scope="session")
+def project_controller():
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(ProjectService, "__init__", lambda self: None)
+        mp.setattr(UserService, "__init__", lambda self: None)
+        return importlib.import_module("src.controller.project_controller")
+
+
+@pytest.fixture
+def project_service():
+    """Builds a ProjectService around a fake Neo4j repository."""
+    def build(neo_repo=None):
+        svc = ProjectService.__new__(ProjectService)
+        svc.neo_repo = neo_repo
+        svc.graph_cache = GraphResponseCache(max_bytes=1024 * 1024)
+        return svc
+    return build
@@ -0,0 +1,146 @@
+import datetime
+import os
+import threading
+import time
+import uuid
+
+import pytest
+from sqlalchemy import create_engine, func, update
+from sqlalchemy.orm import sessionmaker
+
+from src.repository.lease_repository import AnalysisLease, LeaseRepository
+from src.repository.user_repository import DATABASE_URL
+
+
+@pytest.fixture(scope="module")
+def leases():
+    # runs against a real Postgres: the lease logic lives in its SQL
+    engine = create_engine(os.getenv("LEASE_TEST_DATABASE_URL", DATABASE_URL))
+    try:
+        AnalysisLease.__table__.create(bind=engine, checkfirst=True)
+    except Exception as e:
+        pytest.skip(f"Postgres not reachable: {e}")
+    repo = LeaseRepository.__new__(LeaseRepository)
+    repo._Session = sessionmaker(bind=engine)
+    yield repo
+    engine.dispose()
+
+
+@pytest.fixture
+def key(leases):
+    key = f"test/{uuid.uuid4().hex}#1"
+    yield key
+    session = leases._Session()
+    session.query(AnalysisLease).filter(AnalysisLease.key == key).delete()
+    session.commit()
+    session.close()
+
+
+def _expire(leases, key):
+    session = leases._Session()
+    session.execute(update(AnalysisLease).where(AnalysisLease.key == key)
+                    .values(expires_at=func.now() - datetime.timedelta(hours=1)))
+    session.commit()
+    session.close()
+
+
+def test_only_one_owner_acquires(leases, key):
+    assert leases.acquire(key, "a", 60)
+    assert not leases.acquire(key, "b", 60)
+    assert leases.renew(key, "a", 60)
+    assert not leases.renew(key, "b", 60)
+
+
+def test_triggers_coalesce_and_a_full_request_wins(leases, key):
+    leases.acquire(key, "a", 60)
+    assert leases.request_follow_up(key, external_only=False, force=False)
+    assert leases.request_follow_up(key, external_only=True, force=True)
+
+    assert leases.release_or_continue(key, "a", 60) == {"external_only": False, "force": True}
+    assert leases.release_or_continue(key, "a", 60) is None
+    assert leases.acquire(key, "b", 60)
+
+
+def test_external_only_triggers_stay_external_only(leases, key):
+    leases.acquire(key, "a", 60)
+    leases.request_follow_up(key, external_only=True, force=False)
+    leases.request_follow_up(key, external_only=True, force=False)
+
+    assert leases.release_or_continue(key, "a", 60) == {"external_only": True, "force": False}
+
+
+def test_follow_up_needs_a_live_lease(leases, key):
+    assert not leases.request_follow_up(key, external_only=False, force=False)
+    leases.acquire(key, "a", 60)
+    _expire(leases, key)
+    assert not leases.request_follow_up(key, external_only=False, force=False)
+
+
+def test_takeover_keeps_the_queued_triggers(leases, key):
+    leases.acquire(key, "a", 60)
+    leases.request_follow_up(key, external_only=False, force=True)
+    _expire(leases, key)
+
+    assert leases.acquire(key, "b", 60)
+    assert not leases.renew(key, "a", 60)
+    assert leases.release_or_continue(key, "a", 60) is None
+    assert leases.release_or_continue(key, "b", 60) == {"external_only": False, "force": True}
+
+
+class FakeLeaseRepository:
+    """In-memory stand-in for the controller tests."""
+
+    def __init__(self, follow_ups=()):
+        self.follow_ups = list(follow_ups)
+        self.renewals = 0
+        self.released = False
+
+    def renew(self, key, owner, ttl_seconds):
+        self.renewals += 1
+        return True
+
+    def release_or_continue(self, key, owner, ttl_seconds):
+        if self.follow_ups:
+            return self.follow_ups.pop(0)
+        self.released = True
+        return None
+
+
+class RecordingPRService:
+    def __init__(self, fail_first=False, delay=0.0):
+        self.runs = []
+        self.fail_first = fail_first
+        self.delay = delay
+
+    def analyze_pr(self, repo_full_name, pr_number, clone_url, external_only, force):
+        self.runs.append((external_only, force))
+        time.sleep(self.delay)
+        if self.fail_first and len(self.runs) == 1:
+            raise RuntimeError("neo4j went away")
+
+
+def test_failed_run_still_serves_the_queued_follow_up(pr_controller, monkeypatch):
+    leases = FakeLeaseRepository([{"external_only": False, "force": True}])
+    service = RecordingPRService(fail_first=True)
+    monkeypatch.setattr(pr_controller, "lease_repository", leases)
+    monkeypatch.setattr(pr_controller, "pr_service", service)
+
+    pr_controller._run_and_manage("o/app", 5, "url", "o/app#5", "owner", external_only=True)
+
+    assert service.runs == [(True, False), (False, True)]
+    assert leases.released
+
+
+def test_lease_is_renewed_while_a_run_is_slow(pr_controller, monkeypatch):
+    leases = FakeLeaseRepository()
+    monkeypatch.setattr(pr_controller, "lease_repository", leases)
+    monkeypatch.setattr(pr_controller, "pr_service", RecordingPRService(delay=0.25))
+    monkeypatch.setattr(pr_controller, "LEASE_RENEW_SECONDS", 0.05)
+
+    pr_controller._run_and_manage("o/app", 5, "url", "o/app#5", "owner")
+    renewals = leases.renewals
+    time.sleep(0.15)
+
+    assert renewals >= 3
+    assert leases.renewals == renewals
+    assert not any(t.name == "lease-o/app#5" for t in threading.enumerate())
@@ -0,0 +1,120 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.service.async_analysis_pipeline import AsyncAnalysisPipeline
+from src.service.graph_delta_service import GraphDeltaService
+from src.service.pull_request_service import PullRequestService
+
+REPO = {"id": "r1", "name": "repo"}
+STEP = 0.1
+
+
+class FakePRService:
+    """Stands in for PullRequestService with slow, concurrency-counting dependencies."""
+
+    _classify_file = PullRequestService._classify_file
+    _is_source = PullRequestService._is_source
+
+    def __init__(self, files):
+        self.files = files
+        self.lock = threading.Lock()
+        self.active = {}
+        self.peak = {}
+        self.reports = []
+        self.github = SimpleNamespace(get_pr_head_sha=lambda repo, pr: "abc1234",
+                                      download_blob=self._tracked("github", lambda repo, sha: f"def f_{sha}():\n    pass\n"))
+        self.user_repository = SimpleNamespace(get_repo_by_url=lambda url: REPO)
+        self.neo_repo = SimpleNamespace(get_graph_generations=lambda ids: {"r1": "g1"})
+        self.delta_service = SimpleNamespace(compute_delta=self._removed_delta,
+                                             merge_deltas=GraphDeltaService.merge_deltas)
+        self.impact_service = SimpleNamespace(get_impact=self._tracked("neo4j", self._impact))
+        self.analyzer = SimpleNamespace(repo_processor=SimpleNamespace(router=SimpleNamespace(
+            extractors=[SimpleNamespace(matches=lambda p: p.endswith(".py"))])))
+
+    def _tracked(self, dependency, fn):
+        def run(*args):
+            with self.lock:
+                self.active[dependency] = self.active.get(dependency, 0) + 1
+                self.peak[dependency] = max(self.peak.get(dependency, 0), self.active[dependency])
+            try:
+                time.sleep(STEP)
+                return fn(*args)
+            finally:
+                with self.lock:
+                    self.active[dependency] -= 1
+        return run
+
+    def _fetch_pr_files(self, repo_full_name, pr_number):
+        return iter(self.files)
+
+    def _compute_delta(self, result, files, touched_paths):
+        nodes = [n for n in result.get("nodes", []) if n["kind"] != "repo"]
+        return {**GraphDeltaService._empty_delta(), "modified": nodes}
+
+    def _removed_delta(self, pr_nodes, pr_edges, touched_paths, hunk_uids, repo_id):
+        return {**GraphDeltaService._empty_delta(), "removed": [{"uid": f"repo:{touched_paths[0]}", "path": touched_paths[0]}]}
+
+    @staticmethod
+    def _impact(delta, external_only):
+        seeds = delta["modified"] + delta["removed"]
+        return [{"uid": "shared", "depth": 2}] + [{"uid": f"{n['uid']}-dep", "depth": 1} for n in seeds]
+
+    def _get_cached_result(self, repo_full_name, head_sha, external_only):
+        return None
+
+    def _get_speculative(self, repo_full_name, pr_number, head_sha):
+        return None
+
+    def _report(self, repo_full_name, pr_number, head_sha, external_only, prepared, impacted, force):
+        self.reports.append((prepared, impacted))
+        return "reported"
+
+
+def test_files_flow_through_stages_concurrently(monkeypatch):
+    monkeypatch.setenv("PIPELINE_GITHUB_CONCURRENCY", "2")
+    monkeypatch.setenv("PIPELINE_NEO4J_CONCURRENCY", "4")
+    files = [{"filename": f"m{i}.py", "sha": f"s{i}", "status": "modified", "changes": 1} for i in range(4)]
+    files += [{"filename": "README.md", "sha": "doc", "status": "modified", "changes": 1},
+              {"filename": "old.py", "sha": "x", "status": "removed", "changes": 1}]
+    fake = FakePRService(files)
+    pipeline = AsyncAnalysisPipeline(fake)
+    pipeline._extract = lambda pr, content, repo: {
+        "nodes": [{"uid": f"{path}:function:f", "kind": "function", "path": path} for path in content]
+                 + [{"uid": "repo::repo", "kind": "repo"}],
+        "edges": [],
+    }
+
+    started = time.perf_counter()
+    assert pipeline.run("o/repo", 7, "url", False, False) == "reported"
+    elapsed = time.perf_counter() - started
+
+    # 4 downloads at 2 at a time, then impact: sequentially this would take 9 steps
+    assert elapsed < 6 * STEP
+    assert fake.peak["github"] == 2
+    assert fake.peak["neo4j"] > 1
+
+    (prepared, impacted), = fake.reports
+    assert len(prepared["delta"]["modified"]) == 4
+    assert [n["uid"] for n in prepared["delta"]["removed"]] == ["repo:old.py"]
+    assert prepared["generations"] == {"r1": "g1"}
+    uids = [n["uid"] for n in impacted]
+    assert len(uids) == len(set(uids)) == 6
+    assert impacted[-1]["uid"] == "shared"
+
+
+def test_failed_listing_stops_the_pipeline():
+    fake = FakePRService([])
+
+    def failing_listing(repo_full_name, pr_number):
+        yield {"filename": "m0.py", "sha": "s0", "status": "modified", "changes": 1}
+        raise Exception("Could not fetch the pull request files from GitHub.")
+
+    fake._fetch_pr_files = failing_listing
+    pipeline = AsyncAnalysisPipeline(fake)
+
+    with pytest.raises(Exception, match="Could not fetch the pull request files"):
+        pipeline.run("o/repo", 7, "url", False, False)
+    assert fake.reports == []
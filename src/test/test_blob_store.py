@@ -0,0 +1,69 @@
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import pytest
+
+from src.util.blob_store import BlobStore
+
+
+def sha(i: int) -> str:
+    return f"{i:040x}"
+
+
+def test_put_get_uses_sharded_paths(tmp_path):
+    store = BlobStore(root=str(tmp_path), max_bytes=1024)
+    key = "ab12" + "0" * 36
+
+    assert store.get(key) is None
+    assert store.put(key, b"hello")
+    assert store.get(key) == b"hello"
+    assert (tmp_path / "ab" / "12" / key).is_file()
+    assert store.put("../etc/passwd", b"x") is False
+
+
+def test_evicts_least_recently_used_first(tmp_path):
+    store = BlobStore(root=str(tmp_path), max_bytes=130)
+    for i in range(4):
+        store.put(sha(i), b"x" * 30)
+        path = store._path(sha(i))
+        os.utime(path, (time.time() - 100 + i, time.time() - 100 + i))
+    # touch the oldest blob so it becomes the most recently used
+    assert store.get(sha(0)) is not None
+
+    store.put(sha(4), b"x" * 30)
+
+    remaining = {i for i in range(5) if store.get(sha(i)) is not None}
+    assert remaining == {0, 3, 4}
+
+
+def test_concurrent_writers_of_the_same_blob(tmp_path):
+    store = BlobStore(root=str(tmp_path), max_bytes=10 * 1024 * 1024)
+    data = os.urandom(256 * 1024)
+    errors = []
+
+    def write():
+        try:
+            assert BlobStore(root=str(tmp_path), max_bytes=store.max_bytes).put(sha(7), data)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not errors
+    assert store.get(sha(7)) == data
+    leftovers = [n for n in os.listdir(os.path.dirname(store._path(sha(7)))) if n.startswith(BlobStore.TMP_PREFIX)]
+    assert leftovers == []
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
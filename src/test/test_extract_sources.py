@@ -0,0 +1,91 @@
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import pytest
+
+from src.processor.repo_processor import RepoProcessor
+
+
+SOURCES = {
+    "src/main/java/com/example/UserService.java": b'''package com.example;
+
+import com.example.repo.UserRepository;
+
+public class UserService {
+    private UserRepository repo;
+
+    public User find(int id) {
+        String q = "SELECT * FROM users WHERE id = " + id;
+        return repo.load(q);
+    }
+
+    public void save(User user) {
+        repo.store(user);
+    }
+}
+''',
+    "src/main/java/com/example/repo/UserRepository.java": b'''package com.example.repo;
+
+public class UserRepository {
+    public User load(String q) {
+        return null;
+    }
+
+    public void store(User user) {
+        // INSERT INTO users
+    }
+}
+''',
+    "pkg/processor.py": b'''import os
+from pkg.helpers import normalize
+
+
+class Processor:
+    def run(self, value):
+        return normalize(value)
+
+    def path(self):
+        return os.getcwd()
+''',
+    "pkg/helpers.py": "def normalize(value):\n    return value.strip()  # café\n".encode("utf-8"),
+    "README.md": b"# not source\n",
+}
+
+
+def _graph(nodes, edges):
+    return (sorted((n.uid, n.kind, n.name, n.path, n.meta) for n in nodes),
+            sorted((e.src, e.type, e.dst) for e in edges))
+
+
+@pytest.fixture(scope="module")
+def processor():
+    return RepoProcessor()
+
+
+def test_in_memory_extraction_matches_the_checkout_path(processor, tmp_path):
+    for rel, content in SOURCES.items():
+        target = tmp_path / rel
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(content)
+
+    from_disk = _graph(*processor.process("r1", str(tmp_path), "app"))
+    from_memory = _graph(*processor.process_sources("r1", SOURCES, "app"))
+
+    assert from_memory == from_disk
+    kinds = {kind for _, kind, _, _, _ in from_memory[0]}
+    assert {"repo", "file", "class", "method"} <= kinds
+    assert not any(path == "README.md" for _, _, _, path, _ in from_memory[0])
+    assert any(edge_type == "DEPENDS_ON" for _, edge_type, _ in from_memory[1])
+
+
+def test_text_and_bytes_sources_extract_the_same(processor):
+    as_text = {rel: content.decode("utf-8") for rel, content in SOURCES.items()}
+    assert _graph(*processor.process_sources("r1", as_text, "app")) == \
+        _graph(*processor.process_sources("r1", SOURCES, "app"))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
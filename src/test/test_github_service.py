@@ -0,0 +1,216 @@
+import base64
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import pytest
+
+from src.service.github_service import GitHubService
+from src.util.github_client import GitHubClient, GitHubRateLimitError, RateLimitBucket
+
+
+class StubGitHub:
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.requests = []
+        self.throttle_once = set()
+        self.pr_files = []
+        self.etags = False
+        self.not_modified = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with stub.lock:
+                    stub.active += 1
+                    stub.max_active = max(stub.max_active, stub.active)
+                    stub.requests.append(self.path)
+                try:
+                    time.sleep(stub.delay)
+                    if "/pulls/" in self.path:
+                        self._send_files_page()
+                        return
+                    sha = self.path.rsplit("/", 1)[-1]
+                    if sha in stub.throttle_once:
+                        stub.throttle_once.discard(sha)
+                        self._send(429, {"message": "slow down"}, {"Retry-After": "0"})
+                        return
+                    content = base64.b64encode(f"content of {sha}".encode()).decode()
+                    self._send(200, {"sha": sha, "content": content, "encoding": "base64"})
+                finally:
+                    with stub.lock:
+                        stub.active -= 1
+
+            def _send_files_page(self):
+                parsed = urlparse(self.path)
+                query = parse_qs(parsed.query)
+                per_page = int(query.get("per_page", ["30"])[0])
+                page = int(query.get("page", ["1"])[0])
+                items = stub.pr_files[(page - 1) * per_page:page * per_page]
+                headers = {}
+                if page * per_page < len(stub.pr_files):
+                    headers["Link"] = f'<{stub.url}{parsed.path}?per_page={per_page}&page={page + 1}>; rel="next"'
+                if stub.etags:
+                    headers["ETag"] = f'"page-{page}"'
+                    if self.headers.get("If-None-Match") == headers["ETag"]:
+                        stub.not_modified += 1
+                        self.send_response(304)
+                        for k, v in headers.items():
+                            self.send_header(k, v)
+                        self.end_headers()
+                        return
+                self._send(200, items, headers)
+
+            def _send(self, status, body, headers=None):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    with StubGitHub() as s:
+        monkeypatch.setenv("GITHUB_API_BASE", s.url)
+        monkeypatch.setenv("GITHUB_DOWNLOAD_WORKERS", "4")
+        monkeypatch.delenv("GITHUB_TOKEN", raising=False)
+        monkeypatch.setenv("BLOB_CACHE_MAX_BYTES", "0")
+        yield s
+
+
+def test_build_files_content_downloads_concurrently(stub):
+    files = [{"filename": f"src/f{i}.py", "sha": f"sha{i}"} for i in range(12)]
+
+    content = GitHubService().build_files_content("o/r", files)
+
+    assert content == {f"src/f{i}.py": f"content of sha{i}" for i in range(12)}
+    assert 1 < stub.max_active <= 4
+
+
+def test_download_blobs_records_timings_and_retries_rate_limit(stub):
+    stub.throttle_once.add("sha1")
+    files = [{"filename": "a.py", "sha": "sha0"}, {"filename": "b.py", "sha": "sha1"}, {"filename": "c.py"}]
+
+    content, timings = GitHubService().download_blobs("o/r", files)
+
+    assert content == {"a.py": "content of sha0", "b.py": "content of sha1"}
+    assert sorted(t["filename"] for t in timings) == ["a.py", "b.py"]
+    assert all(t["ok"] and t["seconds"] > 0 for t in timings)
+    assert stub.requests.count("/repos/o/r/git/blobs/sha1") == 2
+
+
+def test_blobs_are_served_from_the_blob_store(stub, monkeypatch, tmp_path):
+    monkeypatch.setenv("BLOB_CACHE_DIR", str(tmp_path))
+    monkeypatch.setenv("BLOB_CACHE_MAX_BYTES", str(1024 * 1024))
+    files = [{"filename": "a.py", "sha": "aa00"}, {"filename": "b.py", "sha": "bb00"}]
+
+    first = GitHubService().build_files_content("o/r", files)
+    second = GitHubService().build_files_content("other/repo", files)
+
+    assert first == second == {"a.py": "content of aa00", "b.py": "content of bb00"}
+    assert len(stub.requests) == 2
+
+
+def test_pr_file_listing_follows_pages_and_caps(stub, monkeypatch):
+    stub.pr_files = [{"filename": f"f{i}.py", "sha": f"sha{i}", "changes": i % 7} for i in range(250)]
+
+    assert len(GitHubService().get_pr_files("o/r", 1)) == 250
+    assert stub.requests[0] == "/repos/o/r/pulls/1/files?per_page=100"
+
+    monkeypatch.setenv("PR_MAX_FILES", "120")
+    stub.requests.clear()
+    capped = GitHubService().get_pr_files("o/r", 1)
+    assert [f["filename"] for f in capped] == [f"f{i}.py" for i in range(120)]
+    assert len(stub.requests) == 2
+
+    monkeypatch.setenv("PR_MAX_FILES", "5")
+    monkeypatch.setenv("PR_FILE_SAMPLING", "most_changed")
+    sampled = GitHubService().get_pr_files("o/r", 1)
+    assert [f["filename"] for f in sampled] == ["f6.py", "f13.py", "f20.py", "f27.py", "f34.py"]
+
+
+def test_listing_revalidates_with_etags(stub):
+    stub.pr_files = [{"filename": f"f{i}.py", "sha": f"sha{i}"} for i in range(150)]
+    stub.etags = True
+    service = GitHubService(client=GitHubClient(token=""))
+
+    first = service.get_pr_files("o/r", 1)
+    second = service.get_pr_files("o/r", 1)
+
+    assert first == second and len(first) == 150
+    assert stub.not_modified == 2
+    assert all(isinstance(body, bytes) for _, body, _ in service.client._etags.values())
+
+
+def test_etag_cache_is_bounded_by_bytes(stub):
+    stub.pr_files = [{"filename": f"f{i}.py", "sha": f"sha{i}"} for i in range(150)]
+    stub.etags = True
+    first_page = len(json.dumps(stub.pr_files[:100]).encode())
+    client = GitHubClient(token="", etag_cache_bytes=first_page + 100)
+    service = GitHubService(client=client)
+
+    service.get_pr_files("o/r", 1)
+
+    # the second page pushed the first one out
+    assert len(client._etags) == 1
+    assert client._etag_bytes <= client.etag_cache_bytes
+    assert client._etag_bytes == sum(len(body) for _, body, _ in client._etags.values())
+
+
+def test_rate_limit_bucket_keeps_a_reserve_for_priority_requests():
+    bucket = RateLimitBucket(reserve=3, max_wait=0.1)
+    bucket.update(remaining=4, limit=5000, reset_at=time.time() + 3600)
+
+    bucket.acquire()
+    with pytest.raises(GitHubRateLimitError):
+        bucket.acquire()
+    bucket.acquire(priority=True)
+
+
+def test_rate_limit_bucket_refills_at_reset():
+    bucket = RateLimitBucket(max_wait=5)
+    bucket.update(remaining=0, limit=10, reset_at=time.time() + 0.2)
+
+    started = time.time()
+    bucket.acquire()
+
+    assert time.time() - started >= 0.15
+    assert bucket.tokens == 9
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
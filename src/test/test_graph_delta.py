@@ -0,0 +1,196 @@
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import pytest
+
+from src.extractor.entity_meta import body_hash, build_meta, parse_meta
+from src.extractor.extract_repo import ExtractorRouter
+from src.service.graph_delta_service import GraphDeltaService
+
+
+SERVICE_PY = b'''class Service:
+    limit = 3
+
+    def run(self, x):
+        return x + 1
+
+    def stop(self):
+        return None
+'''
+
+SERVICE_JAVA = b'''package com.example;
+
+public class Service {
+    private int limit = 3;
+
+    public int run(int x) {
+        return x + 1;
+    }
+}
+'''
+
+
+class FakeGraphDeltaService(GraphDeltaService):
+    """GraphDeltaService over an in-memory graph instead of Neo4j."""
+
+    def __init__(self, nodes, edges=()):
+        self.nodes = {n["uid"]: n for n in nodes}
+        self.edges = list(edges)
+
+    def get_existing_nodes(self, uids):
+        return [{"uid": u, "meta": self.nodes[u].get("meta")} for u in uids if u in self.nodes]
+
+    def get_removed_nodes(self, repo_id, paths, keep_uids):
+        return [n for n in self.nodes.values()
+                if n["repo_id"] == repo_id and n["path"] in paths and n["uid"] not in keep_uids]
+
+    def get_dependency_edges(self, repo_id, paths):
+        # same restriction as the Cypher query: both ends in the touched files
+        path_of = {u: n["path"] for u, n in self.nodes.items() if n["repo_id"] == repo_id}
+        return [{"src": s, "type": t, "dst": d} for s, t, d in self.edges
+                if path_of.get(s) in paths and path_of.get(d) in paths]
+
+
+def extract(sources):
+    nodes, _ = ExtractorRouter().extract_sources("r1", sources, "app")
+    return {n["name"]: parse_meta(n["meta"])["body_hash"] for n in nodes if n["kind"] != "repo"}
+
+
+def node(uid, path, digest, kind="method"):
+    return {"uid": uid, "repo_id": "r1", "path": path, "kind": kind, "name": uid,
+            "meta": build_meta(body_hash=digest, start_line=1, end_line=2)}
+
+
+@pytest.mark.parametrize("path,before,after", [
+    ("svc.py", SERVICE_PY, SERVICE_PY.replace(b"return x + 1", b"# bump\n        return x  +  1")),
+    ("Service.java", SERVICE_JAVA, SERVICE_JAVA.replace(b"return x + 1;", b"/* bump */ return x\n            + 1;")),
+])
+def test_whitespace_and_comment_changes_keep_every_hash(path, before, after):
+    assert extract({path: before}) == extract({path: after})
+
+
+@pytest.mark.parametrize("path,before,after", [
+    ("svc.py", SERVICE_PY, SERVICE_PY.replace(b"return x + 1", b"return x + 2")),
+    ("Service.java", SERVICE_JAVA, SERVICE_JAVA.replace(b"return x + 1;", b"return x + 2;")),
+])
+def test_nested_method_change_leaves_the_enclosing_class_hash(path, before, after):
+    old, new = extract({path: before}), extract({path: after})
+    assert old["run"] != new["run"]
+    assert old["Service"] == new["Service"]
+
+
+def test_class_hash_changes_with_its_own_code():
+    old = extract({"svc.py": SERVICE_PY})
+    new = extract({"svc.py": SERVICE_PY.replace(b"limit = 3", b"limit = 4")})
+    assert old["Service"] != new["Service"] and old["run"] == new["run"]
+
+
+def test_excluded_ranges_are_cut_out_of_the_hash():
+    src = b"outer { inner_a } tail"
+    inner = (src.index(b"inner"), src.index(b"inner") + len(b"inner_a"))
+    changed = src.replace(b"inner_a", b"inner_b")
+    assert body_hash(src, 0, len(src), [inner]) == body_hash(changed, 0, len(changed), [inner])
+    assert body_hash(src, 0, len(src)) != body_hash(changed, 0, len(changed))
+    assert body_hash(b"a  b", 0, 4) == body_hash(b"a\n b", 0, 4)
+    assert body_hash(b"if a:\n  b", 0, 9, significant_indent=True) != \
+        body_hash(b"if a:\nb", 0, 7, significant_indent=True)
+
+
+def test_delta_puts_each_entity_in_one_bucket():
+    svc = FakeGraphDeltaService([
+        node("same", "a.py", "h1"),
+        node("edited", "a.py", "h2"),
+        node("deleted", "a.py", "h3"),
+        node("untouched", "b.py", "h4"),
+    ])
+    pr_nodes = [node("same", "a.py", "h1"), node("edited", "a.py", "h2-new"), node("new", "a.py", "h5")]
+
+    delta = svc.compute_delta(pr_nodes, [], touched_paths=["a.py"])
+
+    assert [n["uid"] for n in delta["added"]] == ["new"]
+    assert [n["uid"] for n in delta["modified"]] == ["edited"]
+    assert [n["uid"] for n in delta["removed"]] == ["deleted"]
+    assert [n["uid"] for n in delta["unchanged"]] == ["same"]
+
+
+def test_delta_looks_up_only_the_pr_uids():
+    class RecordingGraphDeltaService(FakeGraphDeltaService):
+        def get_existing_nodes(self, uids):
+            self.lookups.append(sorted(uids))
+            return super().get_existing_nodes(uids)
+
+    stored = [node(f"other{i}", "other.py", f"o{i}") for i in range(50)]
+    svc = RecordingGraphDeltaService(stored + [node("kept", "a.py", "h1"), node("edited", "a.py", "h2")])
+    svc.lookups = []
+    pr_nodes = [{"uid": "repo:r1", "repo_id": "r1", "kind": "repo", "path": None},
+                node("kept", "a.py", "h1"), node("edited", "a.py", "h2-new"), node("new", "a.py", "h3")]
+
+    delta = svc.compute_delta(pr_nodes, [{"src": "new", "type": "DEPENDS_ON", "dst": "other7"}])
+
+    # the PR entities and edge targets, never the rest of the repository
+    assert svc.lookups == [["edited", "kept", "new", "other7"]]
+    assert [n["uid"] for n in delta["added"]] == ["new"]
+    assert [n["uid"] for n in delta["modified"]] == ["edited"]
+    assert [n["uid"] for n in delta["unchanged"]] == ["kept"]
+    assert delta["removed"] == []
+
+
+def test_nodes_without_a_stored_hash_fall_back_to_hunks():
+    stored = node("legacy", "a.py", None)
+    stored["meta"] = build_meta(start_line=1, end_line=2)
+    svc = FakeGraphDeltaService([stored, {**stored, "uid": "legacy2"}])
+    pr_nodes = [node("legacy", "a.py", "h1"), node("legacy2", "a.py", "h2")]
+
+    delta = svc.compute_delta(pr_nodes, [], touched_paths=["a.py"], hunk_uids={"a.py": {"legacy2"}})
+    assert [n["uid"] for n in delta["modified"]] == ["legacy2"]
+    assert [n["uid"] for n in delta["unchanged"]] == ["legacy"]
+
+    # without patch hunks an unhashed node is reported as modified
+    assert len(svc.compute_delta(pr_nodes, [], touched_paths=["a.py"])["modified"]) == 2
+
+
+def test_edge_delta_reports_added_and_removed_dependency_edges():
+    svc = FakeGraphDeltaService(
+        [node("a", "a.py", "h1"), node("b", "a.py", "h2"), node("c", "a.py", "h3")],
+        [("a", "DEPENDS_ON", "b"), ("b", "READS_FROM", "c")],
+    )
+    pr_edges = [
+        {"src": "a", "type": "DEPENDS_ON", "dst": "b"},
+        {"src": "a", "type": "WRITES_TO", "dst": "c"},
+        {"src": "a", "type": "CONTAINS", "dst": "c"},
+        {"src": "a", "type": "DEPENDS_ON", "dst": "unresolved"},
+    ]
+
+    delta = svc.compute_edge_delta("r1", pr_edges, ["a.py"], {"a", "b", "c"})
+
+    assert delta["added_edges"] == [{"src": "a", "type": "WRITES_TO", "dst": "c"}]
+    assert delta["removed_edges"] == [{"src": "b", "type": "READS_FROM", "dst": "c"}]
+
+
+def test_edges_outside_the_changed_paths_are_ignored():
+    svc = FakeGraphDeltaService(
+        [node("a", "a.py", "h1"), node("b", "a.py", "h2"), node("x", "b.py", "h3"), node("y", "b.py", "h4")],
+        [("a", "DEPENDS_ON", "b"), ("x", "DEPENDS_ON", "y"), ("x", "DEPENDS_ON", "a")],
+    )
+    pr_nodes = [node("a", "a.py", "h1"), node("b", "a.py", "h2")]
+
+    delta = svc.compute_delta(pr_nodes, [{"src": "a", "type": "DEPENDS_ON", "dst": "b"}], touched_paths=["a.py"])
+
+    assert delta["added_edges"] == [] and delta["removed_edges"] == []
+    assert delta["removed"] == []
+
+
+def test_edges_of_removed_entities_count_as_removed():
+    svc = FakeGraphDeltaService([node("a", "a.py", "h1"), node("b", "a.py", "h2")], [("a", "DEPENDS_ON", "b")])
+
+    delta = svc.compute_delta([node("a", "a.py", "h1")], [], touched_paths=["a.py"])
+
+    assert [n["uid"] for n in delta["removed"]] == ["b"]
+    assert delta["removed_edges"] == [{"src": "a", "type": "DEPENDS_ON", "dst": "b"}]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
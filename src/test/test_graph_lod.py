@@ -0,0 +1,96 @@
+import pytest
+
+from src.util.graph_lod import aggregate, lod_key, package_dir
+
+
+def entity(uid, kind, path, name=None, owner=None, repo_id="r1"):
+    return {"uid": uid, "repo_id": repo_id, "repo_name": f"app-{repo_id}", "kind": kind, "name": name or uid,
+            "path": path, "owner_uid": owner, "owner_name": owner and owner.split(":")[-1]}
+
+
+ENTITIES = [
+    entity("f:a", "file", "src/api/a.py", name="a.py"),
+    entity("c:A", "class", "src/api/a.py", name="A"),
+    entity("m:A.get", "method", "src/api/a.py", owner="c:A"),
+    entity("m:A.put", "method", "src/api/a.py", owner="c:A"),
+    entity("m:helper", "method", "src/api/a.py"),
+    entity("f:b", "file", "src/db/b.py", name="b.py"),
+    entity("m:load", "method", "src/db/b.py"),
+    entity("f:main", "file", "main.py", name="main.py"),
+]
+
+EDGES = [
+    {"src": "m:A.get", "type": "CALLS", "dst": "m:load"},
+    {"src": "m:A.put", "type": "CALLS", "dst": "m:load"},
+    {"src": "m:A.get", "type": "CALLS", "dst": "m:helper"},
+    {"src": "f:main", "type": "DEPENDS_ON", "dst": "f:a"},
+    {"src": "m:A.get", "type": "CALLS", "dst": "m:elsewhere"},
+]
+
+
+class FakeNeo4jRepository:
+    def __init__(self):
+        self.calls = []
+
+    def iter_lod_entities(self, repo_ids):
+        self.calls.append(repo_ids)
+        return iter(e for e in ENTITIES if e["repo_id"] in repo_ids)
+
+    def iter_lod_edges(self, repo_ids):
+        return iter(EDGES)
+
+
+def test_lod_validates_level_and_expand(project_service):
+    svc = project_service(FakeNeo4jRepository())
+    with pytest.raises(ValueError):
+        svc.get_graph_lod(["r1"], "module")
+    with pytest.raises(ValueError):
+        svc.get_graph_lod(["r1"], "repo", expand="repo:r1")
+    assert svc.neo_repo.calls == []
+
+
+def test_package_is_the_directory_of_the_path():
+    assert package_dir("src/api/a.py") == "src/api"
+    assert package_dir("main.py") == "."
+    assert package_dir(None) == "."
+
+
+def test_class_level_falls_back_to_the_owner_then_the_file():
+    by_uid = {e["uid"]: e for e in ENTITIES}
+    class_level = 3
+    assert lod_key(by_uid["c:A"], class_level, set()) == ("class:c:A", "A", 3)
+    assert lod_key(by_uid["m:A.get"], class_level, set()) == ("class:c:A", "A", 3)
+    assert lod_key(by_uid["m:helper"], class_level, set()) == ("file:r1:src/api/a.py", "src/api/a.py", 3)
+    assert lod_key(by_uid["m:A.get"], class_level, {"class:c:A"}) == ("m:A.get", "m:A.get", 4)
+    # nothing is finer than a method
+    assert lod_key(by_uid["m:A.get"], 4, {"m:A.get"})[2] == 4
+
+
+def test_expand_steps_one_level_down_and_keeps_the_rest_collapsed():
+    result = aggregate(ENTITIES, EDGES, "package", ["package:r1:src/api"])
+
+    nodes = {n["id"]: n for n in result["nodes"]}
+    assert set(nodes) == {"file:r1:src/api/a.py", "package:r1:src/db", "package:r1:."}
+    assert nodes["file:r1:src/api/a.py"]["level"] == "file"
+    assert nodes["file:r1:src/api/a.py"]["size"] == 5
+    assert nodes["package:r1:src/db"] == {"id": "package:r1:src/db", "name": "src/db", "level": "package",
+                                          "repoId": "r1", "repoName": "app-r1", "size": 2,
+                                          "kinds": ["file", "method"]}
+    assert result["expand"] == ["package:r1:src/api"]
+
+
+def test_edges_are_weighted_per_group_pair_and_internal_edges_dropped(project_service):
+    result = project_service(FakeNeo4jRepository()).get_graph_lod(["r1"], "file")
+
+    assert result["edges"] == [
+        {"from": "file:r1:src/api/a.py", "to": "file:r1:src/db/b.py", "type": "CALLS", "weight": 2},
+        {"from": "file:r1:main.py", "to": "file:r1:src/api/a.py", "type": "DEPENDS_ON", "weight": 1},
+    ]
+    assert aggregate(ENTITIES, EDGES, "repo")["edges"] == []
+
+
+def test_method_level_keeps_every_edge_between_known_entities():
+    result = aggregate(ENTITIES, EDGES, "method")
+
+    assert len(result["nodes"]) == len(ENTITIES)
+    assert sum(e["weight"] for e in result["edges"]) == 4
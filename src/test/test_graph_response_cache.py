@@ -0,0 +1,96 @@
+import gzip
+import json
+
+from flask import Flask
+
+from src.util.response_cache import GraphResponseCache
+
+
+class CountingNeo4jRepository:
+    def __init__(self):
+        self.generations = {"r1": "g1", "r2": "g1"}
+        self.graph_reads = 0
+
+    def get_graph_generations(self, repo_ids):
+        return {r: self.generations[r] for r in repo_ids if r in self.generations}
+
+    def get_graph_for_repos(self, repo_ids):
+        self.graph_reads += 1
+        return {"nodes": [{"id": f"{r}:n{i}", "name": "x" * 40} for r in repo_ids for i in range(50)], "edges": []}
+
+    def create_edge(self, src, dst, edge_type):
+        return {"ok": True, "src": src, "dst": dst, "type": edge_type}
+
+
+def test_responses_are_reused_until_the_generation_changes(project_service):
+    svc = project_service(CountingNeo4jRepository())
+    key = svc.graph_cache_key(["r2", "r1"])
+    assert key == svc.graph_cache_key(["r1", "r2", "r1"])
+
+    first = svc.get_graph_response(key, ["r1", "r2"])
+    again = svc.get_graph_response(svc.graph_cache_key(["r1", "r2"]), ["r1", "r2"])
+    assert again is first and svc.neo_repo.graph_reads == 1
+    assert json.loads(gzip.decompress(first.encode("gzip"))) == json.loads(first.body)
+
+    svc.neo_repo.generations["r2"] = "g2"
+    new_key = svc.graph_cache_key(["r1", "r2"])
+    assert GraphResponseCache.etag(new_key) != first.etag
+    svc.get_graph_response(new_key, ["r1", "r2"])
+    assert svc.neo_repo.graph_reads == 2
+
+
+def test_writes_invalidate_cached_entries(project_service):
+    svc = project_service(CountingNeo4jRepository())
+    key = svc.graph_cache_key(["r1"])
+    svc.get_graph_response(key, ["r1"])
+    svc.create_relationship("a", "b", "DEPENDS_ON")
+    assert svc.graph_cache.get(key) is None
+
+
+def test_cache_stays_within_its_byte_budget():
+    cache = GraphResponseCache(max_bytes=20_000)
+    for i in range(20):
+        cache.put((("r1",), (f"g{i}",)), {"payload": "x" * 4000})
+    assert cache._bytes <= 20_000
+    assert cache.get((("r1",), ("g19",))) is not None
+    assert cache.get((("r1",), ("g0",))) is None
+
+
+def test_each_encoding_gets_its_own_etag(project_controller, project_service):
+    svc = project_service(CountingNeo4jRepository())
+    entry = svc.get_graph_response(GraphResponseCache.key(["r1"], {"r1": "g1"}), ["r1"])
+    app = Flask(__name__)
+
+    etags = {}
+    for accept in ("identity", "gzip"):
+        with app.test_request_context(headers={"Accept-Encoding": accept}):
+            resp = project_controller._cached_json(entry)
+        etags[accept] = resp.get_etag()
+        assert resp.get_etag() == (f"{entry.etag}-{accept}", False)
+    assert etags["identity"] != etags["gzip"]
+
+    for accept, (etag, _) in etags.items():
+        with app.test_request_context(headers={"If-None-Match": f'"{etag}"'}):
+            resp = project_controller._not_modified(entry.etag)
+        assert resp.status_code == 304 and resp.get_etag() == (etag, False)
+    with app.test_request_context(headers={"If-None-Match": f'"{entry.etag}"'}):
+        assert project_controller._not_modified(entry.etag) is None
+
+
+def test_repos_without_a_generation_are_never_cached(project_controller, project_service):
+    svc = project_service(CountingNeo4jRepository())
+    svc.neo_repo.generations["r1"] = None
+    # r3 has no Repo node at all, e.g. after clear_all
+    for repo_ids in (["r1"], ["r2", "r3"]):
+        key = svc.graph_cache_key(repo_ids)
+        assert key is None and GraphResponseCache.etag(key) is None
+        svc.get_graph_response(key, repo_ids)
+        entry = svc.get_graph_response(key, repo_ids)
+    assert svc.neo_repo.graph_reads == 4
+    assert svc.graph_cache._entries == {}
+
+    with Flask(__name__).test_request_context(headers={"If-None-Match": "*"}):
+        assert project_controller._not_modified(None) is None
+        resp = project_controller._cached_json(entry)
+    assert resp.get_etag() == (None, None) and resp.headers["Cache-Control"] == "no-store"
+
@@ -0,0 +1,72 @@
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import pytest
+
+from src.extractor.entity_meta import build_meta
+from src.service.hunk_mapping_service import HunkMappingService
+from src.util.interval_tree import IntervalTree
+
+
+PATCH = """@@ -3,7 +3,8 @@ class Service:
+     def first(self):
+         return 1
+ 
+     def second(self):
+-        return 2
++        value = 2
++        return value
+ 
+     def third(self):
+@@ -20,3 +21,3 @@ def helper():
+     x = 1
+-    y = 2
++    y = 3
+"""
+
+
+def make_node(uid, path, start, end):
+    return {"uid": uid, "path": path, "meta": build_meta(start_line=start, end_line=end)}
+
+
+def test_changed_line_ranges_skip_context_lines():
+    ranges = HunkMappingService.changed_line_ranges(PATCH)
+    assert ranges == [(7, 8), (22, 22)]
+
+
+def test_interval_tree_overlap_matches_brute_force():
+    intervals = [(s, s + (s * 7) % 13, s) for s in range(1, 200, 3)]
+    tree = IntervalTree(intervals)
+    for lo, hi in [(1, 1), (5, 9), (50, 50), (120, 180), (250, 260)]:
+        expected = sorted(i for i in intervals if i[0] <= hi and i[1] >= lo)
+        assert sorted(tree.overlap(lo, hi)) == expected
+
+
+def test_changes_map_to_innermost_enclosing_entities():
+    nodes = [
+        make_node("file", "svc.py", 1, 25),
+        make_node("Service", "svc.py", 3, 14),
+        make_node("first", "svc.py", 4, 5),
+        make_node("second", "svc.py", 7, 9),
+        make_node("third", "svc.py", 11, 14),
+        make_node("helper", "svc.py", 20, 23),
+        make_node("other", "other.py", 1, 10),
+    ]
+    files = [{"filename": "svc.py", "patch": PATCH}, {"filename": "other.py"}]
+
+    changed = HunkMappingService().map_changed_entities(files, nodes)
+
+    assert changed == {"svc.py": {"second", "helper"}}
+
+
+def test_change_in_container_body_keeps_container():
+    tree = IntervalTree([(1, 20, "file"), (3, 14, "Service"), (7, 9, "second")])
+    assert HunkMappingService.enclosing_entities(tree, 6, 8) == {"Service", "second"}
+    assert HunkMappingService.enclosing_entities(tree, 16, 16) == {"file"}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
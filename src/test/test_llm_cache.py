@@ -0,0 +1,33 @@
+import time
+
+from src.util.llm_cache import LLMResponseCache, normalize_prompt
+
+
+def test_normalization_strips_volatile_fields():
+    a = "A pull request **#12** was raised.\n   Modified: 3  \n\n"
+    b = "A pull request **#407** was raised.\nModified: 3"
+    assert normalize_prompt(a) == normalize_prompt(b)
+    assert LLMResponseCache.key("gemini", "m", a) == LLMResponseCache.key("gemini", "m", b)
+    assert LLMResponseCache.key("gemini", "m", a) != LLMResponseCache.key("openai", "m", a)
+    assert normalize_prompt("Modified: 3") != normalize_prompt("Modified: 4")
+
+
+def test_cache_round_trip_and_ttl(tmp_path):
+    cache = LLMResponseCache(path=str(tmp_path / "llm.sqlite3"), ttl_seconds=0.2, max_entries=10)
+    assert cache.get("k") is None
+    assert cache.put("k", "report")
+    assert cache.get("k") == "report"
+    time.sleep(0.25)
+    assert cache.get("k") is None
+
+
+def test_cache_keeps_most_recently_used_entries(tmp_path):
+    cache = LLMResponseCache(path=str(tmp_path / "llm.sqlite3"), ttl_seconds=60, max_entries=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    time.sleep(0.01)
+    cache.get("a")
+    cache.put("c", "3")
+    assert cache.get("a") == "1"
+    assert cache.get("b") is None
+    assert cache.get("c") == "3"
@@ -0,0 +1,139 @@
+import threading
+import time
+
+import pytest
+
+from src.service.llm_gateway import (
+    AdaptiveLimiter,
+    FakeProvider,
+    LLMGateway,
+    LLMRateLimitError,
+    LLMUnavailableError,
+)
+
+
+class FlakyProvider:
+    name = "flaky"
+    default_model = "flaky-1"
+    available = True
+
+    def __init__(self):
+        self.calls = 0
+
+    def complete(self, prompt, model):
+        self.calls += 1
+        raise LLMRateLimitError("slow down", retry_after=30)
+
+
+class RejectingProvider:
+    """Answers every request with an HTTP error of the given status."""
+
+    name = "rejecting"
+    default_model = "rejecting-1"
+    available = True
+
+    def __init__(self, status):
+        self.status = status
+        self.calls = 0
+
+    def complete(self, prompt, model):
+        self.calls += 1
+        error = Exception(f"Error code: {self.status}")
+        error.status_code = self.status
+        raise error
+
+
+def test_limit_grows_additively_and_halves_on_rate_limit():
+    limiter = AdaptiveLimiter(initial=4, max_limit=8, target_latency=1.0, cooldown=0)
+    for _ in range(8):
+        limiter.acquire()
+        limiter.release(latency=0.1)
+    assert 5.5 < limiter.limit < 6.5
+
+    limiter.acquire()
+    limiter.release(latency=0.1, overloaded=True)
+    assert 2.5 < limiter.limit < 3.5
+
+    limiter.acquire()
+    limiter.release(latency=5.0)
+    assert limiter.limit < 3.2
+
+
+def test_waiters_are_admitted_by_priority():
+    limiter = AdaptiveLimiter(initial=1, max_limit=1)
+    limiter.acquire()
+    order = []
+
+    def wait(priority, label):
+        limiter.acquire(priority)
+        order.append(label)
+        limiter.release()
+
+    batch = threading.Thread(target=wait, args=(1, "batch"))
+    batch.start()
+    time.sleep(0.05)
+    interactive = threading.Thread(target=wait, args=(0, "interactive"))
+    interactive.start()
+    time.sleep(0.05)
+
+    limiter.release()
+    batch.join(2)
+    interactive.join(2)
+    assert order == ["interactive", "batch"]
+
+
+def test_rate_limited_provider_fails_over_and_cools_down():
+    flaky = FlakyProvider()
+    gateway = LLMGateway(providers={"flaky": flaky, "fake": FakeProvider(latency=0)}, failover=["fake"])
+
+    text, _, _, provider, model = gateway.complete("hello", "flaky")
+    assert provider == "fake" and model == "fake" and text.startswith("| Area |")
+
+    gateway.complete("again", "flaky")
+    assert flaky.calls == 1
+
+
+def test_no_provider_left_raises():
+    gateway = LLMGateway(providers={"flaky": FlakyProvider()}, failover=[], max_wait=0)
+    with pytest.raises(LLMUnavailableError):
+        gateway.complete("hello", "flaky")
+
+
+def test_client_errors_are_raised_without_cooldown_or_failover():
+    rejecting = RejectingProvider(400)
+    fake = FakeProvider(latency=0)
+    gateway = LLMGateway(providers={"rejecting": rejecting, "fake": fake}, failover=["fake"])
+    limit = gateway.limiter.limit
+
+    for _ in range(2):
+        with pytest.raises(Exception, match="Error code: 400"):
+            gateway.complete("far too long", "rejecting")
+
+    assert rejecting.calls == 2
+    assert gateway._cooldown_until == {}
+    assert gateway.limiter.limit == limit and gateway.limiter.in_flight == 0
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_rate_limits_and_server_errors_fail_over(status):
+    gateway = LLMGateway(providers={"rejecting": RejectingProvider(status), "fake": FakeProvider(latency=0)},
+                         failover=["fake"])
+
+    _, _, _, provider, _ = gateway.complete("hello", "rejecting")
+
+    assert provider == "fake"
+    assert gateway._cooldown_until["rejecting"] > time.time()
+
+
+def test_transport_errors_fail_over():
+    class Unreachable(RejectingProvider):
+        def complete(self, prompt, model):
+            raise ConnectionError("connection reset")
+
+    gateway = LLMGateway(providers={"rejecting": Unreachable(None), "fake": FakeProvider(latency=0)},
+                         failover=["fake"])
+
+    _, _, _, provider, _ = gateway.complete("hello", "rejecting")
+
+    assert provider == "fake"
+    assert "rejecting" in gateway._cooldown_until
@@ -0,0 +1,108 @@
+import threading
+import time
+
+from src.service.llm_gateway import FakeProvider, LLMGateway
+from src.service.llm_service import LLMService
+from src.service.map_reduce_summary_service import MapReduceSummaryService
+from src.util.llm_cache import LLMResponseCache
+
+DELTA = {"modified": [{"uid": "a"}], "removed": [], "added_edges": [], "removed_edges": []}
+
+
+def _nodes(count, repo_id, packages=4):
+    return [
+        {"uid": f"{repo_id}:{i}", "kind": "method", "name": f"method_{i}", "path": f"pkg{i % packages}/f{i}.py",
+         "repo_name": f"repo-{repo_id}", "repo_id": repo_id, "depth": 2}
+        for i in range(count)
+    ]
+
+
+def _llm(tmp_path, latency=0.0):
+    gateway = LLMGateway(providers={"fake": FakeProvider(latency=latency)})
+    return LLMService(provider="fake", cache=LLMResponseCache(path=str(tmp_path / "cache.sqlite3")), gateway=gateway)
+
+
+class CountingLLM:
+    def __init__(self, llm):
+        self.llm = llm
+        self.active = self.peak = 0
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def call_with_usage(self, prompt, use_cache=True, priority=0):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            self.prompts.append(prompt)
+        try:
+            return self.llm.call_with_usage(prompt, use_cache, priority)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def test_small_impact_uses_a_single_prompt(tmp_path):
+    summarizer = MapReduceSummaryService(_llm(tmp_path), shard_token_budget=4000)
+    assert not summarizer.needs_map_reduce(_nodes(10, "r1"))
+
+
+def test_shards_split_oversized_repos_by_package_and_stay_balanced(tmp_path):
+    summarizer = MapReduceSummaryService(_llm(tmp_path), shard_token_budget=4000, max_shards=4)
+    nodes = _nodes(800, "r1") + _nodes(40, "r2")
+    assert summarizer.needs_map_reduce(nodes)
+
+    shards = summarizer.shard(nodes)
+    assert len(shards) == 4
+    assert sorted(uid for s in shards for uid in (n["uid"] for n in s["nodes"])) == sorted(n["uid"] for n in nodes)
+    assert any(name.startswith("repo-r1:pkg") for s in shards for name in s["names"])
+    sizes = [s["tokens"] for s in shards]
+    assert max(sizes) - min(sizes) <= max(sizes) // 2
+
+
+def test_map_calls_run_in_parallel_and_costs_add_up(tmp_path):
+    llm = CountingLLM(_llm(tmp_path, latency=0.2))
+    summarizer = MapReduceSummaryService(llm, max_parallel=4, shard_token_budget=4000, max_shards=4)
+    nodes = _nodes(800, "r1") + _nodes(40, "r2")
+
+    started = time.perf_counter()
+    report, cost = summarizer.summarize("o/repo", 7, DELTA, nodes, False, pr_repo_id="r1")
+    elapsed = time.perf_counter() - started
+
+    assert report.startswith("| Area |")
+    assert cost["shards"] == 4 and cost["calls"] == 5
+    assert llm.peak > 1
+    assert elapsed < 5 * 0.2
+    assert "PARTIAL REPORT 1/4" in llm.prompts[0]
+    assert "merging 4 partial impact reports" in llm.prompts[-1]
+    assert cost["prompt_tokens"] == sum(len(p) // 4 for p in llm.prompts)
+
+    _, again = summarizer.summarize("o/repo", 7, DELTA, nodes, False, pr_repo_id="r1")
+    assert again["cached_calls"] == 5 and again["prompt_tokens"] == 0
+
+
+class FailingShardLLM(CountingLLM):
+    def __init__(self, llm, failing):
+        super().__init__(llm)
+        self.failing = failing
+
+    def call_with_usage(self, prompt, use_cache=True, priority=0):
+        if self.failing in prompt:
+            raise RuntimeError("shard timed out")
+        return super().call_with_usage(prompt, use_cache, priority)
+
+
+def test_report_with_failed_shards_is_partial_and_not_cached(tmp_path):
+    llm = FailingShardLLM(_llm(tmp_path), failing="PARTIAL REPORT 2/4")
+    summarizer = MapReduceSummaryService(llm, shard_token_budget=4000, max_shards=4)
+    nodes = _nodes(800, "r1") + _nodes(40, "r2")
+
+    _, cost = summarizer.summarize("o/repo", 7, DELTA, nodes, False, pr_repo_id="r1")
+    assert cost["partial"] and cost["failed_shards"] == 1
+    assert "missing parts" in llm.prompts[-1]
+
+    # the shard recovers: its partial reports are cached, the reduce step runs again
+    llm.failing = "never matches"
+    _, cost = summarizer.summarize("o/repo", 7, DELTA, nodes, False, pr_repo_id="r1")
+    assert not cost["partial"] and cost["failed_shards"] == 0
+    assert cost["calls"] == 5 and cost["cached_calls"] == 3
+
@@ -0,0 +1,78 @@
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import pytest
+from flask import Flask
+
+from src.controller.admin_controller import admin_bp
+from src.util.metrics import MetricsRegistry
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    h = registry.histogram("stage_seconds", "Stage time", ["stage"], buckets=(0.1, 1.0))
+    h.observe(0.05, stage="fetch")
+    h.observe(0.5, stage="fetch")
+    h.observe(5, stage="fetch")
+
+    text = registry.render()
+    assert 'stage_seconds_bucket{stage="fetch",le="0.1"} 1' in text
+    assert 'stage_seconds_bucket{stage="fetch",le="1"} 2' in text
+    assert 'stage_seconds_bucket{stage="fetch",le="+Inf"} 3' in text
+    assert 'stage_seconds_count{stage="fetch"} 3' in text
+    assert "# TYPE stage_seconds histogram" in text
+
+
+def test_counter_gauge_and_callback():
+    registry = MetricsRegistry()
+    c = registry.counter("runs_total", "Runs", ["outcome"])
+    c.inc(outcome="ok")
+    c.inc(2, outcome="ok")
+    g = registry.gauge("in_flight", "In flight")
+    with g.track():
+        assert 'in_flight 1' in registry.render()
+    registry.gauge("queued", "Queued", fn=lambda: 4)
+
+    text = registry.render()
+    assert 'runs_total{outcome="ok"} 3' in text
+    assert "in_flight 0" in text
+    assert "queued 4" in text
+
+
+def test_registry_reuses_metrics_and_checks_labels():
+    registry = MetricsRegistry()
+    assert registry.counter("x_total", "X") is registry.counter("x_total", "X")
+    with pytest.raises(ValueError):
+        registry.histogram("x_total", "X")
+    with pytest.raises(ValueError):
+        registry.counter("y_total", "Y", ["a"]).inc(b="1")
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(admin_bp)
+    return app.test_client()
+
+
+def test_metrics_endpoint_is_closed_without_a_token(client, monkeypatch):
+    monkeypatch.delenv("METRICS_TOKEN", raising=False)
+    monkeypatch.delenv("METRICS_PUBLIC", raising=False)
+    assert client.get("/metrics").status_code == 403
+
+    monkeypatch.setenv("METRICS_PUBLIC", "true")
+    assert client.get("/metrics").status_code == 200
+
+
+def test_metrics_endpoint_checks_the_bearer_token(client, monkeypatch):
+    monkeypatch.setenv("METRICS_TOKEN", "s3cret")
+    monkeypatch.setenv("METRICS_PUBLIC", "true")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer nope"}).status_code == 401
+
+    resp = client.get("/metrics", headers={"Authorization": "Bearer s3cret"})
+    assert resp.status_code == 200
+    assert resp.content_type.startswith("text/plain; version=0.0.4")
@@ -0,0 +1,59 @@
+import pytest
+
+
+# a -> b -> c -> d, plus a -> e and a repo node containing a
+EDGES = [("a", "DEPENDS_ON", "b"), ("b", "DEPENDS_ON", "c"), ("c", "DEPENDS_ON", "d"), ("a", "DEPENDS_ON", "e"),
+         ("repo", "CONTAINS", "a"), ("repo", "CONTAINS", "z")]
+
+
+def _node(uid):
+    return {"id": uid, "name": uid, "type": "repo" if uid == "repo" else "method",
+            "labels": ["Repo"] if uid == "repo" else ["Entity"]}
+
+
+class FakeNeo4jRepository:
+    def __init__(self):
+        self.hops = []
+
+    def get_entity(self, uid):
+        return _node(uid) if uid != "repo" and any(uid in (s, d) for s, _, d in EDGES) else None
+
+    def get_neighbors(self, uids, direction, edge_types, max_rows):
+        self.hops.append(list(uids))
+        rows = []
+        for src, edge_type, dst in EDGES:
+            if edge_type not in edge_types:
+                continue
+            if direction in ("out", "both") and src in uids:
+                rows.append({"via": src, "edge_type": edge_type, "outgoing": True, **_node(dst)})
+            if direction in ("in", "both") and dst in uids:
+                rows.append({"via": dst, "edge_type": edge_type, "outgoing": False, **_node(src)})
+        return rows[:max_rows]
+
+
+def test_depth_and_direction_bound_the_neighbourhood(project_service):
+    result = project_service(FakeNeo4jRepository()).get_neighborhood("a", depth=2, direction="out")
+    depths = {n["id"]: n["depth"] for n in result["nodes"]}
+    assert depths == {"a": 0, "b": 1, "e": 1, "c": 2}
+    assert {"from": "b", "type": "DEPENDS_ON", "to": "c"} in result["edges"]
+    assert not result["truncated"]
+
+
+def test_repo_nodes_are_returned_but_not_expanded(project_service):
+    svc = project_service(FakeNeo4jRepository())
+    result = svc.get_neighborhood("a", depth=3, direction="in", edge_types=["contains"])
+    assert [n["id"] for n in result["nodes"]] == ["a", "repo"]
+    assert {"from": "repo", "type": "CONTAINS", "to": "a"} in result["edges"]
+    assert svc.neo_repo.hops == [["a"]]
+
+
+def test_limit_truncates_and_inputs_are_validated(project_service):
+    svc = project_service(FakeNeo4jRepository())
+    result = svc.get_neighborhood("a", depth=5, limit=3)
+    assert len(result["nodes"]) == 3 and result["truncated"]
+    assert all(e["from"] in {n["id"] for n in result["nodes"]} and e["to"] in {n["id"] for n in result["nodes"]}
+               for e in result["edges"])
+    assert svc.get_neighborhood("missing") is None
+    for kwargs in ({"depth": 6}, {"limit": 501}, {"direction": "up"}, {"edge_types": ["CALLS"]}):
+        with pytest.raises(ValueError):
+            svc.get_neighborhood("a", **kwargs)
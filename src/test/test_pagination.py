@@ -0,0 +1,83 @@
+import re
+
+import pytest
+
+from src.repository.neo4j_repository import Neo4jRepository
+from src.util.pagination import MAX_PAGE_SIZE, decode_cursor, encode_cursor, parse_limit
+
+
+class FakeNeo4jRepository:
+    """Keyset semantics of Neo4jRepository.iter_nodes/iter_edges over in-memory lists."""
+
+    def __init__(self, nodes, edges):
+        self.nodes = sorted(nodes, key=lambda n: n["id"])
+        self.edges = sorted(edges, key=lambda e: (e["from"], e["type"], e["to"]))
+
+    def iter_nodes(self, repo_ids=None, after=None, limit=None, graph_fields=False):
+        rows = [n for n in self.nodes if after is None or n["id"] > after]
+        return iter(rows[:limit] if limit else rows)
+
+    def iter_edges(self, repo_ids=None, after=None, limit=None, graph_fields=False):
+        rows = [e for e in self.edges if after is None or (e["from"], e["type"], e["to"]) > tuple(after)]
+        return iter(rows[:limit] if limit else rows)
+
+
+def _repo(node_count, edge_count):
+    nodes = [{"id": f"n{i:03d}"} for i in range(node_count)]
+    edges = [{"from": f"n{i:03d}", "type": "CALLS", "to": f"n{(i + 1) % node_count:03d}"} for i in range(edge_count)]
+    return FakeNeo4jRepository(nodes, edges)
+
+
+def test_cursor_round_trip_and_validation():
+    key = ["edges", "a:b", "CALLS", "c/d"]
+    assert decode_cursor(encode_cursor(key)) == key
+    assert decode_cursor(None) is None
+    with pytest.raises(ValueError):
+        decode_cursor("not a cursor!")
+    assert parse_limit(None) == 1000
+    assert parse_limit("50000") == MAX_PAGE_SIZE
+    with pytest.raises(ValueError):
+        parse_limit("0")
+
+
+def test_graph_pages_cover_nodes_then_edges_exactly_once(project_service):
+    svc = project_service(_repo(node_count=25, edge_count=18))
+    nodes, edges, cursor, pages = [], [], None, 0
+    while True:
+        page = svc.get_graph_page(["r1"], 10, cursor)
+        assert len(page["nodes"]) + len(page["edges"]) <= 10
+        nodes += page["nodes"]
+        edges += page["edges"]
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert pages == 5
+    assert [n["id"] for n in nodes] == [f"n{i:03d}" for i in range(25)]
+    assert len(edges) == 18 and len({(e["from"], e["to"]) for e in edges}) == 18
+
+
+def test_page_ending_exactly_on_the_last_node_continues_with_edges(project_service):
+    svc = project_service(_repo(node_count=10, edge_count=3))
+    first = svc.get_graph_page(["r1"], 10, None)
+    assert len(first["nodes"]) == 10 and first["next_cursor"]
+    second = svc.get_graph_page(["r1"], 10, first["next_cursor"])
+    assert second["nodes"] == [] and len(second["edges"]) == 3 and second["next_cursor"] is None
+
+
+def _captured_query(method, **kwargs):
+    repo = Neo4jRepository.__new__(Neo4jRepository)
+    repo._iter = lambda q, **params: q
+    return getattr(repo, method)(**kwargs)
+
+
+@pytest.mark.parametrize("method, var", [("iter_nodes", "n"), ("iter_edges", "a")])
+def test_pages_start_from_labelled_uid_seeks(method, var):
+    q = _captured_query(method, repo_ids=["r1"], limit=10)
+    # an unlabelled start node would scan and sort the whole graph per page
+    assert not re.search(rf"MATCH \({var}\)\s", q)
+    assert f"MATCH ({var}:Entity)" in q and f"MATCH ({var}:Repo)" in q
+    assert q.count("LIMIT $limit") == 3
+    assert "ORDER BY" not in _captured_query(method)
+
@@ -0,0 +1,70 @@
+import hashlib
+import hmac
+import json
+
+import pytest
+from flask import Flask
+
+from src.util import tracing
+
+SECRET = "webhook-secret"
+
+
+class FakeLeaseRepository:
+    def __init__(self):
+        self.held = set()
+
+    def acquire(self, key, owner, ttl_seconds):
+        if key in self.held:
+            return False
+        self.held.add(key)
+        return True
+
+    def request_follow_up(self, key, external_only, force):
+        return key in self.held
+
+    def count_active(self, pending_only=False):
+        return len(self.held)
+
+
+@pytest.fixture
+def client(pr_controller, monkeypatch):
+    queued = []
+
+    def queue_speculative(*args):
+        queued.append(("queue_speculative", args))
+        return True
+
+    monkeypatch.setenv("GITHUB_WEBHOOK_SECRET", SECRET)
+    monkeypatch.setattr(pr_controller, "run_async", lambda fn, *args: queued.append((fn.__name__, args)))
+    monkeypatch.setattr(pr_controller, "lease_repository", FakeLeaseRepository())
+    monkeypatch.setattr(pr_controller.pr_service, "speculative_enabled", True, raising=False)
+    monkeypatch.setattr(pr_controller.pr_service, "queue_speculative", queue_speculative, raising=False)
+    app = Flask(__name__)
+    app.register_blueprint(pr_controller.pr_bp)
+    test_client = app.test_client()
+    test_client.queued = queued
+    return test_client
+
+
+def _post(client, event, payload):
+    body = json.dumps(payload).encode("utf-8")
+    signature = "sha256=" + hmac.new(SECRET.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    return client.post("/webhook/pr", data=body, headers={
+        "X-GitHub-Event": event, "X-GitHub-Delivery": "delivery-1", "X-Hub-Signature-256": signature})
+
+
+@pytest.mark.parametrize("mode", ["off", "memory"])
+def test_webhooks_are_handled_with_and_without_tracing(client, monkeypatch, mode):
+    monkeypatch.setattr(tracing.EXPORTER, "mode", mode)
+    repo = {"full_name": "o/app", "clone_url": "https://example.com/o/app.git"}
+
+    resp = _post(client, "pull_request", {
+        "action": "synchronize", "repository": repo, "pull_request": {"number": 3, "head": {"sha": "abc1234"}}})
+    assert resp.status_code == 202 and resp.get_json() == {"message": "prefetching"}
+
+    resp = _post(client, "issue_comment", {
+        "action": "created", "repository": repo, "comment": {"body": "analyze impact"},
+        "issue": {"number": 3, "pull_request": {"url": "https://example.com/pulls/3"}}})
+    assert resp.status_code == 202 and resp.get_json() == {"message": "queued"}
+    assert [name for name, _ in client.queued] == ["queue_speculative", "post_acknowledgement", "_run_and_manage"]
@@ -0,0 +1,76 @@
+import datetime
+import os
+import threading
+import uuid
+
+import pytest
+from sqlalchemy import create_engine, func, update
+from sqlalchemy.orm import sessionmaker
+
+from src.repository.prepared_analysis_repository import PreparedAnalysis, PreparedAnalysisRepository
+from src.repository.user_repository import DATABASE_URL
+
+
+@pytest.fixture(scope="module")
+def prepared():
+    # runs against a real Postgres: workers share pre-analyses through it
+    engine = create_engine(os.getenv("LEASE_TEST_DATABASE_URL", DATABASE_URL))
+    try:
+        PreparedAnalysis.__table__.create(bind=engine, checkfirst=True)
+    except Exception as e:
+        pytest.skip(f"Postgres not reachable: {e}")
+    repo = PreparedAnalysisRepository.__new__(PreparedAnalysisRepository)
+    repo._Session = sessionmaker(bind=engine)
+    repo.POLL_SECONDS = 0.05
+    yield repo
+    engine.dispose()
+
+
+@pytest.fixture
+def pr(prepared):
+    repo_full_name = f"test/{uuid.uuid4().hex}"
+    yield repo_full_name, 1
+    session = prepared._Session()
+    session.query(PreparedAnalysis).filter(PreparedAnalysis.repo_full_name == repo_full_name).delete()
+    session.commit()
+    session.close()
+
+
+def _expire(prepared, pr):
+    session = prepared._Session()
+    session.execute(update(PreparedAnalysis).where(PreparedAnalysis.repo_full_name == pr[0])
+                    .values(expires_at=func.now() - datetime.timedelta(hours=1)))
+    session.commit()
+    session.close()
+
+
+def test_a_running_pre_analysis_is_handed_to_a_waiting_trigger(prepared, pr):
+    assert prepared.begin(*pr, "a", 60)
+    assert not prepared.begin(*pr, "a", 60)
+    threading.Timer(0.1, prepared.complete, args=(*pr, "a", {"delta": "ready"}, 60)).start()
+
+    assert prepared.get(*pr, "a", timeout=2) == {"delta": "ready"}
+    assert not prepared.begin(*pr, "a", 60)
+
+
+def test_a_newer_head_replaces_the_row(prepared, pr):
+    prepared.begin(*pr, "a", 60)
+    assert prepared.begin(*pr, "b", 60)
+
+    assert not prepared.is_current(*pr, "a")
+    prepared.complete(*pr, "a", {"delta": "outdated"}, 60)
+    assert prepared.get(*pr, "a") is None
+    assert prepared.is_current(*pr, "b")
+
+
+def test_failed_and_expired_runs_may_be_retried(prepared, pr):
+    prepared.begin(*pr, "a", 60)
+    prepared.complete(*pr, "a", None, 60)
+    assert prepared.get(*pr, "a") is None
+    assert prepared.begin(*pr, "a", 60)
+
+    _expire(prepared, pr)
+    assert prepared.get(*pr, "a") is None
+    assert prepared.begin(*pr, "a", 60)
+    prepared.discard(*pr, "a")
+    assert not prepared.is_current(*pr, "a")
@@ -0,0 +1,43 @@
+from src.service.prompt_service import PromptBuilder
+
+DELTA = {"modified": [{"uid": "a"}], "removed": [], "added_edges": [], "removed_edges": []}
+
+
+def _nodes(count, repo_id="r1", files=10, depth=3):
+    return [
+        {"uid": f"{repo_id}:{i}", "kind": "method", "name": f"m{i}", "path": f"src/f{i % files}.py",
+         "repo_name": f"repo-{repo_id}", "repo_id": repo_id, "depth": depth}
+        for i in range(count)
+    ]
+
+
+def test_small_impact_sets_are_listed_in_full():
+    nodes = _nodes(5)
+    prompt = PromptBuilder.build_impact_prompt("o/repo", 1, DELTA, nodes, pr_repo_id="r1")
+    assert all(f"[method] m{i}  (path: src/f{i}.py)" in prompt for i in range(5))
+    assert "compacted" not in prompt
+
+
+def test_prompt_size_stays_bounded_as_impact_grows():
+    sizes = []
+    for count in (2_000, 20_000):
+        prompt = PromptBuilder.build_impact_prompt("o/repo", 1, DELTA, _nodes(count, files=400),
+                                                   pr_repo_id="r1", token_budget=3000)
+        sizes.append(PromptBuilder.estimate_tokens(prompt))
+    assert all(size <= 3000 for size in sizes)
+    assert abs(sizes[0] - sizes[1]) < 300
+
+
+def test_cross_repo_and_shallow_files_are_kept_first():
+    nodes = _nodes(3000, repo_id="r1", files=300, depth=4)
+    nodes += _nodes(5, repo_id="r2", files=1, depth=6)
+    nodes[0] = {**nodes[0], "path": "src/close.py", "depth": 1}
+    lines = PromptBuilder.compact_impacted_nodes(nodes, 800, pr_repo_id="r1")
+    text = "\n".join(lines)
+
+    assert "repo repo-r2 | repo_id: r2 | cross-repo | 5 nodes in 1 files" in text
+    assert "repo repo-r1 | repo_id: r1 | same repo | 3000 nodes in 301 files" in text
+    detail = [l for l in lines if "| path:" in l]
+    assert detail[0].startswith("- repo-r2 | repo_id: r2 | path: src/f0.py | 5 impacted")
+    assert "path: src/close.py" in detail[1]
+    assert "more files with" in lines[-1]
@@ -0,0 +1,246 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+from src.service.pull_request_service import PullRequestService
+
+LISTING_ERROR = "Could not fetch the pull request files from GitHub."
+
+
+class FakeGitHub:
+    def __init__(self, files, fail_after=None):
+        self.files = files
+        self.fail_after = fail_after
+        self.downloads = []
+
+    def iter_pr_files_limited(self, repo_full_name, pr_number):
+        for i, f in enumerate(self.files):
+            if i == self.fail_after:
+                raise requests.HTTPError("502 Server Error: Bad Gateway")
+            yield f
+
+    def build_files_content(self, repo_full_name, files):
+        content = {}
+        for f in files:
+            self.downloads.append(f["filename"])
+            content[f["filename"]] = "def f():\n    pass\n"
+        return content
+
+    def get_pr_head_sha(self, repo_full_name, pr_number):
+        return None
+
+
+class RecordingNotifications:
+    def __init__(self):
+        self.errors = []
+        self.reports = []
+
+    def post_error_comment(self, repo_full_name, pr_number, message):
+        self.errors.append(message)
+        return True
+
+    def post_impact_comment(self, repo_full_name, pr_number, report):
+        self.reports.append(report)
+        return True
+
+
+def _service(github):
+    svc = PullRequestService.__new__(PullRequestService)
+    svc.github = github
+    svc.pipeline = "sequential"
+    svc.analyzer = SimpleNamespace(repo_processor=SimpleNamespace(router=SimpleNamespace(
+        extractors=[SimpleNamespace(matches=lambda path: path.endswith(".py"))])))
+    svc.user_repository = SimpleNamespace(get_repo_by_url=lambda url: {"id": "r1", "name": "app"})
+    svc.neo_repo = SimpleNamespace(get_graph_generations=lambda ids: {"r1": "g1"})
+    svc.notification_service = RecordingNotifications()
+    return svc
+
+
+FILES = [{"filename": f"f{i}.py", "sha": f"s{i}", "status": "modified", "changes": 1} for i in range(3)]
+
+
+def test_failed_listing_raises_the_user_facing_error():
+    svc = _service(FakeGitHub(FILES, fail_after=2))
+    with pytest.raises(Exception, match=LISTING_ERROR):
+        svc._prepare_analysis("o/app", 5, "url")
+
+
+def test_failed_listing_is_reported_on_the_pr():
+    svc = _service(FakeGitHub(FILES, fail_after=0))
+    svc.analyze_pr("o/app", 5, "url")
+    assert svc.notification_service.errors == [LISTING_ERROR]
+    assert svc.github.downloads == []
+
+
+def test_only_source_files_are_downloaded():
+    files = FILES + [
+        {"filename": "README.md", "sha": "doc", "status": "modified", "changes": 1},
+        {"filename": "new.py", "sha": "s9", "status": "renamed", "previous_filename": "old.py", "changes": 0},
+        {"filename": "gone.py", "sha": "s8", "status": "removed", "changes": 1},
+    ]
+    svc = _service(FakeGitHub(files))
+    parsed, removed_paths = [], []
+
+    svc._prepare_files_content("o/app", svc._iter_parseable_files(svc._fetch_pr_files("o/app", 5), parsed,
+                                                                  removed_paths))
+
+    assert svc.github.downloads == ["f0.py", "f1.py", "f2.py", "new.py"]
+    assert removed_paths == ["old.py", "gone.py"]
+
+
+class FakePreparedAnalysisRepository:
+    """In-memory stand-in with the one-row-per-PR semantics of the Postgres table."""
+
+    def __init__(self):
+        self.rows = {}
+
+    def begin(self, repo_full_name, pr_number, head_sha, ttl_seconds):
+        row = self.rows.get((repo_full_name, pr_number))
+        if row and row["head_sha"] == head_sha and row["status"] != "failed":
+            return False
+        self.rows[(repo_full_name, pr_number)] = {"head_sha": head_sha, "status": "running", "payload": None}
+        return True
+
+    def is_current(self, repo_full_name, pr_number, head_sha):
+        row = self.rows.get((repo_full_name, pr_number))
+        return bool(row and row["head_sha"] == head_sha)
+
+    def complete(self, repo_full_name, pr_number, head_sha, result, ttl_seconds):
+        if self.is_current(repo_full_name, pr_number, head_sha):
+            self.rows[(repo_full_name, pr_number)].update(
+                status="done" if result is not None else "failed", payload=result and json.dumps(result))
+
+    def discard(self, repo_full_name, pr_number, head_sha):
+        if self.is_current(repo_full_name, pr_number, head_sha):
+            del self.rows[(repo_full_name, pr_number)]
+
+    def get(self, repo_full_name, pr_number, head_sha, timeout=0):
+        row = self.rows.get((repo_full_name, pr_number))
+        if not self.is_current(repo_full_name, pr_number, head_sha) or row["status"] != "done":
+            return None
+        return json.loads(row["payload"])
+
+
+class CountingImpact:
+    def __init__(self):
+        self.calls = []
+
+    def get_impact(self, delta, external_only):
+        self.calls.append(external_only)
+        time.sleep(0.05)
+        return [{"uid": f"impact-{external_only}"}]
+
+
+def _prepared_service(generations, during_prepare=None):
+    svc = _service(FakeGitHub(FILES))
+    svc.prepared_repository = FakePreparedAnalysisRepository()
+    svc.speculative_wait = 1
+    svc.speculative_ttl = 60
+    svc.impact_service = CountingImpact()
+    svc.neo_repo = SimpleNamespace(get_graph_generations=lambda ids: dict(generations))
+    svc.fresh_runs = 0
+
+    def prepare(repo_full_name, pr_number, clone_url):
+        svc.fresh_runs += 1
+        if during_prepare:
+            during_prepare()
+        return {"repo": {"id": "r1"}, "delta": {}, "impacted": {}, "generations": dict(generations),
+                "impact_lock": threading.Lock()}
+
+    svc._prepare_analysis = prepare
+    return svc
+
+
+def _pre_analyze(svc, head_sha):
+    assert svc.prepared_repository.begin("o/app", 5, head_sha, 60)
+    svc.prepare_speculatively("o/app", 5, "url", head_sha)
+
+
+def test_pre_analysis_is_reused_only_while_the_graph_is_unchanged():
+    generations = {"r1": "g1"}
+    svc = _prepared_service(generations)
+    _pre_analyze(svc, "abc1234")
+    assert svc.fresh_runs == 1
+
+    prepared = svc._get_prepared("o/app", 5, "url", "abc1234")
+    assert prepared["generations"] == {"r1": "g1"}
+    # both impact modes come back from the stored JSON without a new traversal
+    assert svc._get_impact(prepared, True) == [{"uid": "impact-True"}]
+    assert svc.fresh_runs == 1 and sorted(svc.impact_service.calls) == [False, True]
+
+    generations["r1"] = "g2"
+    assert svc._get_prepared("o/app", 5, "url", "abc1234")["generations"] == {"r1": "g2"}
+    assert svc.fresh_runs == 2
+    # the stale entry is dropped so the next push can pre-analyze again
+    assert svc.prepared_repository.rows == {}
+
+
+def test_forced_run_ignores_the_pre_analysis():
+    svc = _prepared_service({"r1": "g1"})
+    _pre_analyze(svc, "abc1234")
+
+    svc._get_prepared("o/app", 5, "url", "abc1234", force=True)
+
+    assert svc.fresh_runs == 2
+
+
+def test_a_newer_push_supersedes_the_running_pre_analysis():
+    svc = _prepared_service({"r1": "g1"}, during_prepare=lambda: svc.prepared_repository.begin("o/app", 5, "new", 60))
+    _pre_analyze(svc, "old")
+
+    # the impact traversal of the outdated head is skipped and nothing is stored for it
+    assert svc.fresh_runs == 1 and svc.impact_service.calls == []
+    assert svc.prepared_repository.rows[("o/app", 5)] == {"head_sha": "new", "status": "running", "payload": None}
+
+
+def test_queued_pre_analyses_run_bounded_and_skip_replaced_heads():
+    release = threading.Event()
+    svc = _prepared_service({"r1": "g1"}, during_prepare=lambda: release.wait(2))
+    svc._speculative_executor = ThreadPoolExecutor(max_workers=1)
+
+    assert svc.queue_speculative("o/app", 5, "url", "a")
+    assert not svc.queue_speculative("o/app", 5, "url", "a")
+    assert svc.queue_speculative("o/app", 5, "url", "b")
+    assert svc.queue_speculative("o/app", 5, "url", "c")
+    release.set()
+    svc._speculative_executor.shutdown(wait=True)
+
+    # "a" was already running when replaced, "b" never started
+    assert svc.fresh_runs == 2
+    assert sorted(svc.impact_service.calls) == [False, True]
+    assert svc._get_speculative("o/app", 5, "c") is not None
+    assert svc._get_speculative("o/app", 5, "a") is None
+
+
+def test_shared_pre_analysis_traces_each_mode_once():
+    svc = _prepared_service({"r1": "g1"})
+    prepared = svc._prepare_analysis("o/app", 5, "url")
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda mode: svc._get_impact(prepared, mode), [False, True, False, True]))
+
+    assert sorted(svc.impact_service.calls) == [False, True]
+    assert results[0] is results[2] and results[1] is results[3]
+
+
+@pytest.mark.parametrize("partial", [False, True])
+def test_partial_map_reduce_reports_are_posted_but_not_cached(partial):
+    svc = _service(FakeGitHub(FILES))
+    svc.llm_deadline = 0
+    svc.summarizer = SimpleNamespace(
+        needs_map_reduce=lambda nodes: True,
+        summarize=lambda *args, **kwargs: ("report", {"calls": 5, "partial": partial}))
+    saved = []
+    svc.analysis_repository = SimpleNamespace(save_result=lambda *args: saved.append(args))
+    prepared = {"repo": {"id": "r1"}, "delta": {}, "generations": {"r1": "g1"}}
+
+    assert svc._report("o/app", 5, "abc1234", False, prepared, [{"uid": "x", "repo_id": "r1"}]) == "reported"
+
+    assert svc.notification_service.reports == ["report"]
+    assert len(saved) == (0 if partial else 1)
+
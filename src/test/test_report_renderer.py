@@ -0,0 +1,85 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from src.service.llm_gateway import FakeProvider, LLMGateway
+from src.service.llm_service import LLMService
+from src.service.map_reduce_summary_service import MapReduceSummaryService
+from src.service.pull_request_service import PullRequestService
+from src.service.report_renderer import ReportRenderer
+from src.util.llm_cache import LLMResponseCache
+
+DELTA = {"modified": [{"uid": "a"}], "removed": [], "added_edges": [{"src": "a", "type": "CALLS", "dst": "b"}],
+         "removed_edges": []}
+NODES = [
+    {"uid": "r1:1", "kind": "method", "name": "save", "path": "app/db/store.py", "repo_name": "app", "repo_id": "r1",
+     "depth": 3},
+    {"uid": "r2:1", "kind": "class", "name": "Client|V2", "path": "sdk/client.py", "repo_name": "sdk",
+     "repo_id": "r2", "depth": 1},
+]
+
+
+class RecordingNotifications:
+    def __init__(self):
+        self.created = []
+        self.updated = []
+        self.done = threading.Event()
+
+    def create_comment(self, repo, pr, text):
+        self.created.append(text)
+        return 42
+
+    def post_impact_comment(self, repo, pr, text):
+        self.created.append(text)
+        return True
+
+    def update_comment(self, repo, comment_id, text):
+        self.updated.append((comment_id, text))
+        self.done.set()
+        return True
+
+
+def _service(tmp_path, latency, deadline):
+    svc = PullRequestService.__new__(PullRequestService)
+    svc.llm = LLMService(provider="fake", cache=LLMResponseCache(path=str(tmp_path / "cache.sqlite3")),
+                         gateway=LLMGateway(providers={"fake": FakeProvider(latency=latency)}))
+    svc.summarizer = MapReduceSummaryService(svc.llm)
+    svc.llm_deadline = deadline
+    svc._llm_executor = ThreadPoolExecutor(max_workers=1)
+    svc.notification_service = RecordingNotifications()
+    svc.saved = []
+    svc._save_result = lambda *args: svc.saved.append(args[-1])
+    return svc
+
+
+def test_renders_both_tables_cross_repo_first():
+    report = ReportRenderer.render("o/app", 3, DELTA, NODES, pr_repo_id="r1")
+    assert "### 1. ChAIn Reaction Summary" in report and "### B. Code Level Impact" in report
+    rows = [line for line in report.splitlines() if line.startswith("| class") or line.startswith("| method")]
+    assert rows[0].startswith("| class | Client\\|V2 | sdk |")
+    assert "Cross-repo: direct dependency" in rows[0]
+    assert "| sdk/sdk | 1 nodes depend on the change (cross-repo, closest at depth 1) | 1 modified, " \
+           "1 dependency edges changed | High |" in report
+    assert "will be updated" not in report
+
+
+def test_slow_llm_posts_fallback_then_edits_the_comment(tmp_path):
+    svc = _service(tmp_path, latency=0.3, deadline=0.05)
+    prepared = {"delta": DELTA, "repo": {"id": "r1"}}
+
+    assert svc._report("o/app", 3, "sha", False, prepared, NODES) == "fallback"
+    assert "will be updated" in svc.notification_service.created[0]
+    assert svc.saved == []
+
+    assert svc.notification_service.done.wait(5)
+    comment_id, text = svc.notification_service.updated[0]
+    assert comment_id == 42 and text.startswith("| Area |")
+    assert svc.saved == [text]
+
+
+def test_fast_llm_is_posted_directly(tmp_path):
+    svc = _service(tmp_path, latency=0, deadline=5)
+    prepared = {"delta": DELTA, "repo": {"id": "r1"}}
+
+    assert svc._report("o/app", 3, "sha", False, prepared, NODES) == "reported"
+    assert svc.notification_service.created[0].startswith("| Area |")
+    assert svc.notification_service.updated == []
@@ -0,0 +1,137 @@
+import types
+
+import pytest
+from flask import Flask
+
+from src.repository.neo4j_repository import Neo4jRepository
+from src.util.search_query import build_entity_query, escape_lucene
+
+
+def test_special_characters_are_escaped():
+    assert escape_lucene('a+b-c:(d)[e]{f}^"g"~h*i?j\\k/l!m') == \
+        'a\\+b\\-c\\:\\(d\\)\\[e\\]\\{f\\}\\^\\"g\\"\\~h\\*i\\?j\\\\k\\/l\\!m'
+    assert escape_lucene("x && y || z") == "x \\&& y \\|| z"
+
+
+def test_query_ranks_exact_over_prefix_substring_and_fuzzy():
+    query = build_entity_query("UserService")
+    assert query == ("(name:userservice^8 OR name:userservice*^4 OR name:*userservice*^2 "
+                     "OR path:userservice* OR name:userservice~2)")
+
+
+def test_terms_are_split_on_whitespace_and_path_separators():
+    query = build_entity_query("src/auth  login", fuzzy=False)
+    assert query.count(" AND ") == 2
+    assert "~" not in query
+    assert "(name:src^8" in query and "path:auth*" in query
+    # short terms are never fuzzy
+    assert "~" not in build_entity_query("db")
+
+
+def test_search_validates_input(project_service):
+    svc = project_service()
+    for kwargs in ({"text": ""}, {"text": "  / "}, {"text": "x", "limit": 0}, {"text": "x" * 201}):
+        with pytest.raises(ValueError):
+            svc.search_entities(**kwargs)
+
+
+ROWS = [{"uid": "c:UserService", "name": "UserService", "kind": "class", "path": "src/user.py",
+         "repoId": "r1", "repoName": "app", "score": 4.2}]
+
+
+class FakeSearchRepository:
+    def __init__(self):
+        self.calls = []
+
+    def search_entities(self, query, kinds=None, repo_ids=None, limit=20):
+        self.calls.append((query, kinds, repo_ids, limit))
+        return ROWS
+
+
+class StubDriver:
+    def __init__(self, rows):
+        self.rows, self.runs = rows, []
+
+    def session(self):
+        driver = self
+
+        class Session:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def run(self, q, **params):
+                driver.runs.append((q, params))
+                return iter(driver.rows)
+
+        return Session()
+
+
+@pytest.fixture
+def client(project_controller, project_service, monkeypatch):
+    svc = project_service(FakeSearchRepository())
+    monkeypatch.setattr(project_controller, "service", svc)
+    monkeypatch.setattr("src.util.auth.get_user_service",
+                        lambda: types.SimpleNamespace(decode_token=lambda token: {"sub": "u1"}))
+    app = Flask(__name__)
+    app.register_blueprint(project_controller.project_blueprint)
+    client = app.test_client()
+    client.calls = svc.neo_repo.calls
+    return client
+
+
+def _search(client, query):
+    return client.get(f"/search?{query}", headers={"Authorization": "Bearer t"})
+
+
+def test_search_route_requires_a_token(client):
+    assert client.get("/search?q=user").status_code == 401
+    assert client.calls == []
+
+
+@pytest.mark.parametrize("query", ["q=", "q=user&limit=abc", "q=user&limit=0", "q=user&limit=101"])
+def test_search_route_rejects_bad_arguments(client, query):
+    resp = _search(client, query)
+
+    assert resp.status_code == 400
+    assert "error" in resp.get_json()
+    assert client.calls == []
+
+
+def test_search_route_returns_the_ranked_results(client):
+    resp = _search(client, "q=UserService&kind=Class,%20Method,&repo_ids=r1,r2&limit=5&fuzzy=false")
+
+    assert resp.status_code == 200
+    assert resp.get_json() == {"results": ROWS}
+    query, kinds, repo_ids, limit = client.calls[0]
+    assert query == build_entity_query("UserService", fuzzy=False)
+    assert (kinds, repo_ids, limit) == (["class", "method"], ["r1", "r2"], 5)
+
+
+def test_search_route_leaves_empty_filters_unset(client):
+    assert _search(client, "q=user&kind=,&repo_ids=").status_code == 200
+    assert client.calls[0][1:] == (None, None, 20)
+
+
+def test_repository_queries_the_fulltext_index_with_parameters():
+    repo = Neo4jRepository.__new__(Neo4jRepository)
+    repo.driver = StubDriver(ROWS)
+
+    assert repo.search_entities("name:user*", ["class"], ["r1"], 5) == ROWS
+    q, params = repo.driver.runs[0]
+    assert "db.index.fulltext.queryNodes('entity_search', $query)" in q
+    assert "node.kind IN $kinds" in q and "node.repo_id IN $repo_ids" in q
+    assert "ORDER BY score DESC" in q and "LIMIT $limit" in q
+    assert params == {"query": "name:user*", "kinds": ["class"], "repo_ids": ["r1"], "limit": 5}
+
+
+def test_repository_omits_filters_that_are_not_given():
+    repo = Neo4jRepository.__new__(Neo4jRepository)
+    repo.driver = StubDriver([])
+
+    assert repo.search_entities("name:user*") == []
+    q, params = repo.driver.runs[0]
+    assert "$kinds" not in q and "$repo_ids" not in q
+    assert params["limit"] == 20
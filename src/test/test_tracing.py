@@ -0,0 +1,66 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.util import tracing
+
+
+@pytest.fixture(autouse=True)
+def clean_exporter():
+    tracing.EXPORTER.clear()
+    yield
+    tracing.EXPORTER.clear()
+
+
+def test_spans_nest_and_cross_threads():
+    with tracing.span("root", trace_id="t1") as root:
+        with tracing.span("child", file_count=2) as child:
+            child.set(node_count=5)
+        done = threading.Event()
+
+        def background():
+            with tracing.span("bg"):
+                pass
+            done.set()
+
+        threading.Thread(target=tracing.bind_context(background)).start()
+        def pooled():
+            with tracing.span("pooled"):
+                pass
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            pool.submit(tracing.bind_context(pooled)).result()
+        done.wait(1)
+
+    spans = {s["name"]: s for s in tracing.EXPORTER.spans("t1")}
+    assert spans["child"]["parent_id"] == root.span_id
+    assert spans["child"]["attributes"] == {"file_count": 2, "node_count": 5}
+    assert spans["bg"]["parent_id"] == root.span_id
+    assert spans["pooled"]["parent_id"] == root.span_id
+    assert spans["root"]["parent_id"] is None
+    assert tracing.current_span() is None
+
+
+def test_errors_are_recorded():
+    with pytest.raises(ValueError):
+        with tracing.span("failing", trace_id="t2"):
+            raise ValueError("boom")
+    (span,) = tracing.EXPORTER.spans("t2")
+    assert span["status"] == "error"
+    assert "boom" in span["error"]
+
+
+def test_critical_path_follows_latest_child():
+    with tracing.span("root", trace_id="t3"):
+        with tracing.span("fast"):
+            pass
+        with tracing.span("slow"):
+            with tracing.span("llm"):
+                time.sleep(0.01)
+
+    trace = tracing.get_trace("t3")
+    assert [s["name"] for s in trace["critical_path"]] == ["root", "slow", "llm"]
+    assert trace["span_count"] == 4
+    assert tracing.recent_traces()[0]["trace_id"] == "t3"
@@ -1,15 +1,29 @@
-
 import threading
 from src.util.logger import log
+from src.util.metrics import REGISTRY
+from src.util.tracing import bind_context
+
+TASKS_QUEUED = REGISTRY.gauge(
+    "chainreaction_background_tasks_queued", "Background tasks submitted but not yet started", ["task"])
+TASKS_IN_FLIGHT = REGISTRY.gauge(
+    "chainreaction_background_tasks_in_flight", "Background tasks currently running", ["task"])
+TASK_SECONDS = REGISTRY.histogram(
+    "chainreaction_background_task_seconds", "Background task run time", ["task"])
 
 
 def run_async(func, *args, **kwargs):
-    thread = threading.Thread(target=_run_with_error_handling, args=(func, args, kwargs), daemon=True)
+    task = getattr(func, "__name__", "task")
+    TASKS_QUEUED.inc(task=task)
+    # the task inherits the caller's trace
+    thread = threading.Thread(target=bind_context(_run_with_error_handling), args=(func, args, kwargs), daemon=True)
     thread.start()
 
 
 def _run_with_error_handling(func, args, kwargs):
+    task = getattr(func, "__name__", "task")
+    TASKS_QUEUED.dec(task=task)
     try:
-        func(*args, **kwargs)
+        with TASKS_IN_FLIGHT.track(task=task), TASK_SECONDS.time(task=task):
+            func(*args, **kwargs)
     except Exception as e:
         log.error(f"Background task failed: {e}", exc_info=True)
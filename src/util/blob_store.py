@@ -0,0 +1,130 @@
+import os
+import re
+import tempfile
+import threading
+import time
+from src.util.logger import log
+
+
+class BlobStore:
+    """Content-addressed on-disk store for git blobs.
+
+    Blobs are immutable, so a SHA is a permanent cache key. Files live under
+    two levels of shard directories, are written to a temp file and renamed
+    into place (atomic with concurrent writers), and the store is trimmed
+    least-recently-used first once it grows past max_bytes.
+    """
+
+    SHA_PATTERN = re.compile(r"^[0-9a-f]{4,64}$")
+    TMP_PREFIX = ".tmp-"
+    STALE_TMP_SECONDS = 3600
+
+    def __init__(self, root: str = None, max_bytes: int = None):
+        self.root = root or os.environ.get("BLOB_CACHE_DIR", "./cache/blobs")
+        if max_bytes is None:
+            max_bytes = int(os.environ.get("BLOB_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path(self, sha: str) -> str | None:
+        sha = (sha or "").lower()
+        if not self.SHA_PATTERN.match(sha):
+            return None
+        return os.path.join(self.root, sha[:2], sha[2:4], sha)
+
+    def get(self, sha: str) -> bytes | None:
+        path = self._path(sha)
+        if not self.enabled or not path:
+            return None
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+            return data
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            log.warning(f"BlobStore.get failed for {sha}: {e}")
+            return None
+
+    def put(self, sha: str, data: bytes) -> bool:
+        path = self._path(sha)
+        if not self.enabled or not path or len(data) > self.max_bytes:
+            return False
+        if os.path.exists(path):
+            return True
+        try:
+            shard = os.path.dirname(path)
+            os.makedirs(shard, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix=self.TMP_PREFIX, dir=shard)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        except OSError as e:
+            log.warning(f"BlobStore.put failed for {sha}: {e}")
+            return False
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += len(data)
+            over = self._size > self.max_bytes
+        if over:
+            self.evict()
+        return True
+
+    def _iter_entries(self):
+        now = time.time()
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if name.startswith(self.TMP_PREFIX):
+                    # left behind by a writer that died mid-write
+                    if now - st.st_mtime > self.STALE_TMP_SECONDS:
+                        self._remove(path)
+                    continue
+                yield path, st.st_mtime, st.st_size
+
+    def _scan_size(self) -> int:
+        return sum(size for _, _, size in self._iter_entries())
+
+    @staticmethod
+    def _remove(path: str) -> int:
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            return size
+        except FileNotFoundError:
+            return 0
+
+    def evict(self):
+        # other processes share the directory, so re-scan instead of trusting
+        # the in-memory size
+        with self._lock:
+            entries = sorted(self._iter_entries(), key=lambda e: e[1])
+            total = sum(size for _, _, size in entries)
+            target = int(self.max_bytes * 0.9)
+            removed = 0
+            for path, _, _ in entries:
+                if total <= target:
+                    break
+                total -= self._remove(path)
+                removed += 1
+            self._size = total
+        if removed:
+            log.info(f"BlobStore evicted {removed} blobs, {total} bytes remain")
@@ -0,0 +1,255 @@
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.util.logger import log
+from src.util.metrics import REGISTRY
+
+GITHUB_REQUESTS_TOTAL = REGISTRY.counter(
+    "chainreaction_github_requests_total", "GitHub API requests by method and status", ["method", "status"])
+GITHUB_ETAG_TOTAL = REGISTRY.counter(
+    "chainreaction_github_etag_requests_total", "Conditional GitHub requests by result", ["result"])
+GITHUB_RATE_LIMIT_WAIT_SECONDS = REGISTRY.histogram(
+    "chainreaction_github_rate_limit_wait_seconds", "Time requests waited for GitHub rate limit tokens")
+
+
+class GitHubRateLimitError(Exception):
+    pass
+
+
+class RateLimitBucket:
+    """Client-side copy of GitHub's request quota.
+
+    Tokens follow X-RateLimit-Remaining, minus the requests still in flight,
+    and refill to X-RateLimit-Limit when the window resets. Normal requests
+    stop at `reserve` tokens so that priority requests (PR comments) can still
+    get through when a burst of analyses has used up the quota.
+    """
+
+    def __init__(self, reserve: int = 0, max_wait: float = 60.0):
+        self.reserve = reserve
+        self.max_wait = max_wait
+        self.tokens = None
+        self.limit = None
+        self.reset_at = 0.0
+        self.paused_until = 0.0
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+    def _wait_time(self, priority: bool, now: float) -> float:
+        if self.reset_at and now >= self.reset_at and self.limit is not None:
+            self.tokens, self.reset_at = self.limit, 0.0
+        if self.paused_until > now:
+            return self.paused_until - now
+        floor = 0 if priority else self.reserve
+        # until the first response the quota is unknown
+        if self.tokens is None or self.tokens > floor or not self.reset_at:
+            return 0.0
+        return self.reset_at - now
+
+    def acquire(self, priority: bool = False) -> float:
+        started = time.time()
+        with self._cond:
+            while True:
+                now = time.time()
+                wait = self._wait_time(priority, now)
+                if wait <= 0:
+                    if self.tokens is not None:
+                        self.tokens -= 1
+                    self.in_flight += 1
+                    return now - started
+                # pauses are already capped; only an empty bucket can outlast max_wait
+                if self.paused_until <= now and now + wait - started > self.max_wait:
+                    raise GitHubRateLimitError(f"GitHub rate limit exhausted for another {wait:.0f}s")
+                self._cond.wait(wait)
+
+    def update(self, remaining: int, limit: int, reset_at: float):
+        # called before release(), so in_flight still counts this request
+        with self._cond:
+            self.tokens = max(0, remaining - max(0, self.in_flight - 1))
+            self.limit = limit
+            self.reset_at = reset_at
+            self._cond.notify_all()
+
+    def release(self):
+        with self._cond:
+            self.in_flight = max(0, self.in_flight - 1)
+
+    def pause(self, seconds: float):
+        with self._cond:
+            self.paused_until = max(self.paused_until, time.time() + min(max(seconds, 0.0), self.max_wait))
+            self._cond.notify_all()
+
+
+class GitHubClient:
+    """Process-wide GitHub REST client.
+
+    Keeps one pooled session, a byte-bounded LRU of ETags and bodies for
+    listing endpoints (a 304 does not count against the rate limit) and a
+    rate-limit bucket fed by the X-RateLimit-* headers of every response.
+    """
+
+    RETRIES = 3
+
+    def __init__(self, token: str = None, max_connections: int = None, etag_cache_bytes: int = None,
+                 reserve: int = None, max_rate_limit_wait: float = None, backoff_seconds: float = None):
+        self.token = token if token is not None else os.environ.get("GITHUB_TOKEN")
+        self.max_connections = max_connections or int(os.environ.get(
+            "GITHUB_MAX_CONNECTIONS", max(16, int(os.environ.get("GITHUB_DOWNLOAD_WORKERS", "8")))))
+        self.etag_cache_bytes = etag_cache_bytes if etag_cache_bytes is not None else int(
+            os.environ.get("GITHUB_ETAG_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+        self.backoff_seconds = backoff_seconds if backoff_seconds is not None else float(
+            os.environ.get("GITHUB_BACKOFF_SECONDS", "1"))
+        self.bucket = RateLimitBucket(
+            reserve=reserve if reserve is not None else int(os.environ.get("GITHUB_RATE_LIMIT_RESERVE", "50")),
+            max_wait=max_rate_limit_wait if max_rate_limit_wait is not None else float(
+                os.environ.get("GITHUB_MAX_RATE_LIMIT_WAIT", "60")),
+        )
+
+        self.session = requests.Session()
+        # pool_block keeps concurrent requests at the pool size instead of
+        # opening throwaway connections
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.max_connections, pool_block=True)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._etags = OrderedDict()
+        self._etag_bytes = 0
+        self._etag_lock = threading.Lock()
+
+    def headers(self, accept: str = None) -> dict:
+        headers = {}
+        if accept:
+            headers["Accept"] = accept
+        if self.token:
+            headers["Authorization"] = f"token {self.token}"
+        return headers
+
+    def _cached(self, key):
+        with self._etag_lock:
+            entry = self._etags.get(key)
+            if entry is not None:
+                self._etags.move_to_end(key)
+            return entry
+
+    def _store_etag(self, key, resp):
+        # only the validator, the body and the pagination links are kept,
+        # not the response with its headers and connection
+        etag = resp.headers.get("ETag")
+        body = resp.content
+        if not etag or len(body) > self.etag_cache_bytes:
+            return
+        with self._etag_lock:
+            old = self._etags.pop(key, None)
+            if old is not None:
+                self._etag_bytes -= len(old[1])
+            self._etags[key] = (etag, body, resp.headers.get("Link"))
+            self._etag_bytes += len(body)
+            while self._etag_bytes > self.etag_cache_bytes:
+                _, evicted = self._etags.popitem(last=False)
+                self._etag_bytes -= len(evicted[1])
+
+    @staticmethod
+    def _replay(url: str, cached: tuple) -> requests.Response:
+        etag, body, link = cached
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.url = url
+        resp.encoding = "utf-8"
+        resp._content = body
+        resp.headers["ETag"] = etag
+        if link:
+            resp.headers["Link"] = link
+        return resp
+
+    def _update_rate_limit(self, resp):
+        retry_after = resp.headers.get("Retry-After")
+        if retry_after is not None:
+            try:
+                self.bucket.pause(float(retry_after))
+            except ValueError:
+                pass
+        try:
+            self.bucket.update(
+                int(resp.headers["X-RateLimit-Remaining"]),
+                int(resp.headers["X-RateLimit-Limit"]),
+                float(resp.headers["X-RateLimit-Reset"]),
+            )
+        except (KeyError, ValueError):
+            pass
+
+    @staticmethod
+    def _is_rate_limited(resp) -> bool:
+        if resp.status_code == 429:
+            return True
+        return resp.status_code == 403 and (
+            "Retry-After" in resp.headers or resp.headers.get("X-RateLimit-Remaining") == "0"
+        )
+
+    def request(self, method: str, url: str, accept: str = None, etag: bool = False, priority: bool = False,
+                **kwargs) -> requests.Response:
+        headers = self.headers(accept)
+        key = (url, accept)
+        cached = self._cached(key) if etag else None
+        if cached:
+            headers["If-None-Match"] = cached[0]
+
+        for attempt in range(1, self.RETRIES + 1):
+            waited = self.bucket.acquire(priority)
+            if waited:
+                GITHUB_RATE_LIMIT_WAIT_SECONDS.observe(waited)
+            try:
+                resp = self.session.request(method, url, headers=headers, timeout=30, **kwargs)
+                GITHUB_REQUESTS_TOTAL.inc(method=method, status=str(resp.status_code))
+                self._update_rate_limit(resp)
+            finally:
+                self.bucket.release()
+
+            if resp.status_code == 304 and cached:
+                GITHUB_ETAG_TOTAL.inc(result="not_modified")
+                return self._replay(url, cached)
+            if self._is_rate_limited(resp) and attempt < self.RETRIES:
+                if "Retry-After" not in resp.headers and resp.headers.get("X-RateLimit-Remaining") != "0":
+                    # secondary limits without a hint: back off with jitter
+                    self.bucket.pause(self.backoff_seconds * (2 ** (attempt - 1)) + random.uniform(0, 0.5))
+                log.warning(f"GitHub returned {resp.status_code} for {method} {url}, retrying (attempt {attempt})")
+                continue
+            resp.raise_for_status()
+            if etag:
+                GITHUB_ETAG_TOTAL.inc(result="modified" if cached else "miss")
+                self._store_etag(key, resp)
+            return resp
+
+    def get(self, url: str, accept: str = None, etag: bool = False, **kwargs) -> requests.Response:
+        return self.request("GET", url, accept=accept, etag=etag, **kwargs)
+
+    def post(self, url: str, json: dict = None, accept: str = None, priority: bool = False,
+             **kwargs) -> requests.Response:
+        return self.request("POST", url, accept=accept, priority=priority, json=json, **kwargs)
+
+    def patch(self, url: str, json: dict = None, accept: str = None, priority: bool = False,
+              **kwargs) -> requests.Response:
+        return self.request("PATCH", url, accept=accept, priority=priority, json=json, **kwargs)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_github_client() -> GitHubClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = GitHubClient()
+        return _client
+
+
+REGISTRY.gauge("chainreaction_github_rate_limit_remaining", "GitHub requests left in the current window",
+               fn=lambda: _client.bucket.tokens if _client else None)
+REGISTRY.gauge("chainreaction_github_etag_cache_bytes", "Bytes of listing bodies kept for ETag revalidation",
+               fn=lambda: _client._etag_bytes if _client else None)
@@ -0,0 +1,72 @@
+from collections import Counter
+
+LOD_LEVELS = ["repo", "package", "file", "class", "method"]
+
+
+def package_dir(path: str | None) -> str:
+    path = path or ""
+    return path.rsplit("/", 1)[0] if "/" in path else "."
+
+
+def group_keys(entity: dict) -> list[tuple[str, str]]:
+    """(group id, group name) of an entity at every level, coarsest first."""
+    repo_id, path = entity["repo_id"], entity.get("path") or ""
+    directory = package_dir(path)
+    file_key = (f"file:{repo_id}:{path}", path)
+    if entity.get("kind") == "class":
+        class_key = (f"class:{entity['uid']}", entity.get("name"))
+    elif entity.get("owner_uid"):
+        class_key = (f"class:{entity['owner_uid']}", entity.get("owner_name"))
+    else:
+        # methods outside a class stay with their file
+        class_key = file_key
+    return [
+        (f"repo:{repo_id}", entity.get("repo_name")),
+        (f"package:{repo_id}:{directory}", directory),
+        file_key,
+        class_key,
+        (entity["uid"], entity.get("name")),
+    ]
+
+
+def lod_key(entity: dict, level: int, expand: set) -> tuple[str, str, int]:
+    # the coarsest group at or below `level` that is not expanded
+    keys = group_keys(entity)
+    depth = next(i for i in range(level, len(LOD_LEVELS)) if i == len(LOD_LEVELS) - 1 or keys[i][0] not in expand)
+    return keys[depth] + (depth,)
+
+
+def aggregate(entities, edges, level: str, expand: list = None) -> dict:
+    """Groups entities into super-nodes at `level` and weights the edges between them.
+
+    Groups listed in `expand` are replaced by their members one level down.
+    Edges inside a single group are dropped, and so are edges to entities
+    that are not in `entities`.
+    """
+    depth, expand = LOD_LEVELS.index(level), list(expand or [])
+    expanded = set(expand)
+    groups, group_of = {}, {}
+    for entity in entities:
+        group_id, name, group_depth = lod_key(entity, depth, expanded)
+        group_of[entity["uid"]] = group_id
+        group = groups.get(group_id)
+        if group is None:
+            group = groups[group_id] = {"id": group_id, "name": name, "level": LOD_LEVELS[group_depth],
+                                        "repoId": entity["repo_id"], "repoName": entity.get("repo_name"),
+                                        "size": 0, "kinds": []}
+        group["size"] += 1
+        if entity.get("kind") not in group["kinds"]:
+            group["kinds"].append(entity.get("kind"))
+
+    weights = Counter()
+    for edge in edges:
+        src, dst = group_of.get(edge["src"]), group_of.get(edge["dst"])
+        if src is not None and dst is not None and src != dst:
+            weights[(src, dst, edge["type"])] += 1
+    return {
+        "level": level,
+        "expand": expand,
+        "nodes": [groups[k] for k in sorted(groups)],
+        "edges": [{"from": src, "to": dst, "type": edge_type, "weight": weight}
+                  for (src, dst, edge_type), weight in sorted(weights.items(), key=lambda kv: (-kv[1], kv[0]))],
+    }
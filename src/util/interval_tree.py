@@ -0,0 +1,48 @@
+from typing import Any, Iterable, List, Tuple
+
+
+class IntervalTree:
+    """Static interval tree over closed integer intervals.
+
+    Intervals are kept sorted by start in an implicit balanced tree where every
+    node also stores the largest end of its subtree, so an overlap query costs
+    O(log n + k).
+    """
+
+    def __init__(self, intervals: Iterable[Tuple[int, int, Any]]):
+        self._items = sorted(intervals, key=lambda i: (i[0], i[1]))
+        self._max_end = [0] * len(self._items)
+        self._build(0, len(self._items) - 1)
+
+    def __len__(self):
+        return len(self._items)
+
+    def _build(self, lo: int, hi: int) -> float:
+        if lo > hi:
+            return float("-inf")
+        mid = (lo + hi) // 2
+        self._max_end[mid] = max(
+            self._items[mid][1],
+            self._build(lo, mid - 1),
+            self._build(mid + 1, hi),
+        )
+        return self._max_end[mid]
+
+    def overlap(self, start: int, end: int) -> List[Tuple[int, int, Any]]:
+        out = []
+        self._query(0, len(self._items) - 1, start, end, out)
+        return out
+
+    def _query(self, lo: int, hi: int, start: int, end: int, out: list):
+        if lo > hi:
+            return
+        mid = (lo + hi) // 2
+        if self._max_end[mid] < start:
+            return
+        self._query(lo, mid - 1, start, end, out)
+        item = self._items[mid]
+        if item[0] > end:
+            return
+        if item[1] >= start:
+            out.append(item)
+        self._query(mid + 1, hi, start, end, out)
@@ -0,0 +1,129 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from src.util.logger import log
+from src.util.metrics import REGISTRY
+
+LLM_CACHE_REQUESTS_TOTAL = REGISTRY.counter(
+    "chainreaction_llm_cache_requests_total", "LLM response cache lookups by result", ["result"])
+
+
+def _hit_ratio():
+    hits = LLM_CACHE_REQUESTS_TOTAL.value(result="hit")
+    lookups = hits + LLM_CACHE_REQUESTS_TOTAL.value(result="miss")
+    return hits / lookups if lookups else None
+
+
+REGISTRY.gauge("chainreaction_llm_cache_hit_ratio", "Share of LLM cache lookups served from the cache",
+               fn=_hit_ratio)
+
+# parts of a prompt that change between runs without changing the question
+VOLATILE_PATTERNS = [
+    (re.compile(r"#\d+\b"), "#<n>"),
+    (re.compile(r"\b[0-9a-f]{40}\b"), "<sha>"),
+    (re.compile(r"\b\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(\.\d+)?(Z|[+-]\d{2}:?\d{2})?\b"), "<timestamp>"),
+]
+
+
+def normalize_prompt(prompt: str) -> str:
+    for pattern, replacement in VOLATILE_PATTERNS:
+        prompt = pattern.sub(replacement, prompt)
+    lines = (" ".join(line.split()) for line in prompt.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+class LLMResponseCache:
+    """SQLite-backed cache of LLM responses.
+
+    Keys hash the provider, model and normalized prompt, so re-running an
+    analysis whose prompt only differs in PR number or whitespace is served
+    locally. Entries expire after ttl_seconds and the table is trimmed
+    least-recently-used first past max_entries. SQLite handles concurrent
+    worker processes sharing the file.
+    """
+
+    def __init__(self, path: str = None, ttl_seconds: float = None, max_entries: int = None):
+        self.path = path or os.environ.get("LLM_CACHE_PATH", "./cache/llm_cache.sqlite3")
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(
+            os.environ.get("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+        self.max_entries = max_entries if max_entries is not None else int(
+            os.environ.get("LLM_CACHE_MAX_ENTRIES", "5000"))
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+    @staticmethod
+    def key(provider: str, model: str, prompt: str) -> str:
+        digest = hashlib.sha256(normalize_prompt(prompt).encode("utf-8")).hexdigest()
+        return f"{provider}:{model}:{digest}"
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        if not self._initialized:
+            with self._lock:
+                if not self._initialized:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS llm_responses ("
+                        " key TEXT PRIMARY KEY, response TEXT NOT NULL,"
+                        " created_at REAL NOT NULL, last_used REAL NOT NULL)"
+                    )
+                    conn.execute("CREATE INDEX IF NOT EXISTS llm_responses_last_used ON llm_responses (last_used)")
+                    conn.commit()
+                    self._initialized = True
+        return conn
+
+    def get(self, key: str) -> str | None:
+        if not self.enabled:
+            return None
+        try:
+            conn = self._connect()
+            try:
+                now = time.time()
+                row = conn.execute(
+                    "SELECT response FROM llm_responses WHERE key = ? AND created_at > ?",
+                    (key, now - self.ttl_seconds),
+                ).fetchone()
+                if row is None:
+                    return None
+                conn.execute("UPDATE llm_responses SET last_used = ? WHERE key = ?", (now, key))
+                conn.commit()
+                return row[0]
+            finally:
+                conn.close()
+        except (sqlite3.Error, OSError) as e:
+            log.warning(f"LLMResponseCache.get failed: {e}")
+            return None
+
+    def put(self, key: str, response: str) -> bool:
+        if not self.enabled or not response:
+            return False
+        try:
+            conn = self._connect()
+            try:
+                now = time.time()
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_responses (key, response, created_at, last_used) VALUES (?, ?, ?, ?)",
+                    (key, response, now, now),
+                )
+                conn.execute("DELETE FROM llm_responses WHERE created_at <= ?", (now - self.ttl_seconds,))
+                conn.execute(
+                    "DELETE FROM llm_responses WHERE key IN ("
+                    " SELECT key FROM llm_responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+                conn.commit()
+                return True
+            finally:
+                conn.close()
+        except (sqlite3.Error, OSError) as e:
+            log.warning(f"LLMResponseCache.put failed: {e}")
+            return False
@@ -0,0 +1,42 @@
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 5000
+
+
+def encode_cursor(key: list) -> str:
+    raw = json.dumps(key, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str | None) -> list | None:
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        key = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("invalid cursor")
+    if not isinstance(key, list) or not key:
+        raise ValueError("invalid cursor")
+    return key
+
+
+def parse_limit(value) -> int:
+    if value is None or value == "":
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("limit must be an integer")
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def paginate(records: list, limit: int, key) -> dict:
+    # callers fetch limit + 1 records; the extra one only signals another page
+    items = records[:limit]
+    next_cursor = encode_cursor(key(items[-1])) if len(records) > limit else None
+    return {"items": items, "next_cursor": next_cursor}
@@ -0,0 +1,131 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from src.util.metrics import REGISTRY
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GRAPH_CACHE_REQUESTS_TOTAL = REGISTRY.counter(
+    "chainreaction_graph_cache_requests_total", "Graph response cache lookups by result", ["result"])
+
+
+class CachedResponse:
+    """A serialized JSON payload plus its compressed variants, built on first use."""
+
+    def __init__(self, etag: str | None, repo_ids: tuple, body: bytes):
+        self.etag = etag
+        self.repo_ids = repo_ids
+        self.body = body
+        self._encoded = {"identity": body}
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        return sum(len(b) for b in self._encoded.values())
+
+    def encode(self, encoding: str) -> bytes:
+        with self._lock:
+            data = self._encoded.get(encoding)
+            if data is None:
+                if encoding == "br" and brotli is not None:
+                    data = brotli.compress(self.body, quality=5)
+                elif encoding == "gzip":
+                    data = gzip.compress(self.body, compresslevel=6)
+                else:
+                    raise ValueError(f"unsupported encoding {encoding}")
+                self._encoded[encoding] = data
+            return data
+
+
+class GraphResponseCache:
+    """LRU cache of serialized graph responses.
+
+    Keys carry the graph generation of every requested repo, so an entry can
+    never be served after its graph changed, even when the change was made
+    by another worker process. invalidate() only frees memory early. A repo
+    without a generation (wiped by clear_all, or ingested before generations
+    existed) has no version to key on, so such requests are not cached.
+    """
+
+    def __init__(self, max_bytes: int = None):
+        self.max_bytes = max_bytes if max_bytes is not None else int(
+            os.environ.get("GRAPH_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(repo_ids, generations: dict, *variant) -> tuple | None:
+        repos = tuple(sorted(set(repo_ids)))
+        versions = tuple(generations.get(r) for r in repos)
+        if None in versions:
+            return None
+        return (repos, versions) + tuple(variant)
+
+    @staticmethod
+    def etag(key: tuple | None) -> str | None:
+        if key is None:
+            return None
+        return hashlib.sha256(json.dumps(key, default=str).encode("utf-8")).hexdigest()[:32]
+
+    def get(self, key: tuple | None) -> CachedResponse | None:
+        if key is None:
+            GRAPH_CACHE_REQUESTS_TOTAL.inc(result="uncacheable")
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        GRAPH_CACHE_REQUESTS_TOTAL.inc(result="hit" if entry else "miss")
+        return entry
+
+    def put(self, key: tuple | None, payload) -> CachedResponse:
+        body = json.dumps(payload, default=str, separators=(",", ":")).encode("utf-8")
+        entry = CachedResponse(self.etag(key), key[0] if key else (), body)
+        if key is None or not self.max_bytes or len(body) > self.max_bytes // 4:
+            return entry
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+            self._evict()
+        return entry
+
+    def _evict(self):
+        # compressed variants are counted once they exist
+        self._bytes = sum(e.size for e in self._entries.values())
+        while self._bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+
+    def invalidate(self, repo_ids=None):
+        with self._lock:
+            if repo_ids is None:
+                self._entries.clear()
+            else:
+                repo_ids = set(repo_ids)
+                for key in [k for k, e in self._entries.items() if repo_ids & set(e.repo_ids)]:
+                    del self._entries[key]
+            self._bytes = sum(e.size for e in self._entries.values())
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_graph_response_cache() -> GraphResponseCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = GraphResponseCache()
+        return _cache
+
+
+REGISTRY.gauge("chainreaction_graph_cache_bytes", "Bytes held by the graph response cache",
+               fn=lambda: _cache._bytes if _cache else None)
@@ -0,0 +1,32 @@
+import re
+
+LUCENE_SPECIAL = re.compile(r'([+\-!(){}\[\]^"~*?:\\/]|&&|\|\|)')
+MAX_TERMS = 5
+
+
+def escape_lucene(term: str) -> str:
+    return LUCENE_SPECIAL.sub(r"\\\1", term)
+
+
+def search_terms(text: str) -> list[str]:
+    # the full-text analyzer lowercases and splits paths, wildcard terms are
+    # not analyzed, so the query has to do the same
+    terms = [t for t in re.split(r"[\s/]+", (text or "").lower()) if t]
+    return terms[:MAX_TERMS]
+
+
+def build_entity_query(text: str, fuzzy: bool = True) -> str:
+    """Lucene query for the entity full-text index.
+
+    Every term must match the name or path. Per term, an exact name scores
+    above a name prefix, which scores above a substring and a fuzzy match;
+    paths only count as prefixes.
+    """
+    clauses = []
+    for term in search_terms(text):
+        t = escape_lucene(term)
+        options = [f"name:{t}^8", f"name:{t}*^4", f"name:*{t}*^2", f"path:{t}*"]
+        if fuzzy and len(term) >= 4:
+            options.append(f"name:{t}~{1 if len(term) < 8 else 2}")
+        clauses.append("(" + " OR ".join(options) + ")")
+    return " AND ".join(clauses)
@@ -0,0 +1,217 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+from src.util.logger import log
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start", "end", "attributes", "status", "error",
+                 "thread")
+
+    def __init__(self, name: str, trace_id: str, parent_id: str = None, attributes: dict = None):
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.time()
+        self.end = None
+        self.attributes = dict(attributes or {})
+        self.status = "ok"
+        self.error = None
+        self.thread = threading.current_thread().name
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self) -> float | None:
+        return None if self.end is None else round((self.end - self.start) * 1000, 3)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "end": self.end,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+            "status": self.status,
+            "error": self.error,
+            "thread": self.thread,
+        }
+
+
+class SpanExporter:
+    """Keeps finished spans in a ring buffer and optionally appends them to a JSONL file.
+
+    TRACE_EXPORT selects the sink: ``memory`` (default), ``jsonl`` (memory and
+    file) or ``off``.
+    """
+
+    def __init__(self, mode: str = None, max_spans: int = None, path: str = None):
+        self.mode = (mode or os.environ.get("TRACE_EXPORT", "memory")).lower()
+        self.max_spans = max_spans or int(os.environ.get("TRACE_BUFFER_SIZE", "5000"))
+        self.path = path or os.environ.get("TRACE_JSONL_PATH", "./traces/spans.jsonl")
+        self._spans = deque(maxlen=self.max_spans)
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def export(self, span: Span):
+        data = span.to_dict()
+        with self._lock:
+            self._spans.append(data)
+            if self.mode == "jsonl":
+                self._append_jsonl(data)
+
+    def _append_jsonl(self, data: dict):
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(data, default=str) + "\n")
+        except OSError as e:
+            log.warning(f"Could not write span to {self.path}: {e}")
+
+    def spans(self, trace_id: str = None) -> list:
+        with self._lock:
+            spans = list(self._spans)
+        if trace_id is not None:
+            spans = [s for s in spans if s["trace_id"] == trace_id]
+        return spans
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+
+EXPORTER = SpanExporter()
+
+
+def current_span() -> Span | None:
+    return _current_span.get()
+
+
+def current_trace_id() -> str | None:
+    span = _current_span.get()
+    return span.trace_id if span else None
+
+
+@contextmanager
+def span(name: str, trace_id: str = None, **attributes):
+    # a span without a parent in the current context starts a new trace
+    if not EXPORTER.enabled:
+        yield Span(name, trace_id or "", attributes=attributes)
+        return
+    parent = _current_span.get()
+    if trace_id is None:
+        trace_id = parent.trace_id if parent else uuid.uuid4().hex
+    parent_id = parent.span_id if parent and parent.trace_id == trace_id else None
+    s = Span(name, trace_id, parent_id, attributes)
+    token = _current_span.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.status = "error"
+        s.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        s.end = time.time()
+        _current_span.reset(token)
+        EXPORTER.export(s)
+
+
+def set_attributes(**attributes):
+    # no-op outside a span, e.g. with TRACE_EXPORT=off
+    span = _current_span.get()
+    if span is not None:
+        span.set(**attributes)
+
+
+@contextmanager
+def activate(span: Span | None):
+    # makes an existing span the parent of new spans, e.g. inside an event
+    # loop that was not started from the caller's context
+    token = _current_span.set(span)
+    try:
+        yield span
+    finally:
+        _current_span.reset(token)
+
+
+def bind_context(fn):
+    # threads start with an empty context; carry the caller's span across
+    ctx = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return ctx.run(fn, *args, **kwargs)
+
+    return run
+
+
+def critical_path(spans: list) -> list:
+    # from the earliest root, keep following the child that finished last
+    if not spans:
+        return []
+    children = {}
+    ids = {s["span_id"] for s in spans}
+    for s in spans:
+        parent = s["parent_id"] if s["parent_id"] in ids else None
+        children.setdefault(parent, []).append(s)
+    path = []
+    node = min(children.get(None, spans), key=lambda s: s["start"])
+    while node is not None:
+        path.append(node)
+        kids = [c for c in children.get(node["span_id"], []) if c["end"] is not None]
+        node = max(kids, key=lambda c: c["end"]) if kids else None
+    return path
+
+
+def summarize_trace(spans: list) -> dict:
+    finished = [s for s in spans if s["end"] is not None]
+    start = min(s["start"] for s in spans)
+    end = max((s["end"] for s in finished), default=start)
+    root = min(spans, key=lambda s: s["start"])
+    return {
+        "trace_id": root["trace_id"],
+        "root": root["name"],
+        "attributes": root["attributes"],
+        "start": start,
+        "duration_ms": round((end - start) * 1000, 3),
+        "span_count": len(spans),
+        "errors": sum(1 for s in spans if s["status"] == "error"),
+    }
+
+
+def recent_traces(limit: int | None = 50) -> list:
+    by_trace = {}
+    for s in EXPORTER.spans():
+        by_trace.setdefault(s["trace_id"], []).append(s)
+    summaries = [summarize_trace(spans) for spans in by_trace.values()]
+    summaries.sort(key=lambda t: t["start"], reverse=True)
+    return summaries[:limit]
+
+
+def get_trace(trace_id: str) -> dict | None:
+    spans = sorted(EXPORTER.spans(trace_id), key=lambda s: s["start"])
+    if not spans:
+        return None
+    return {
+        **summarize_trace(spans),
+        "spans": spans,
+        "critical_path": [
+            {"span_id": s["span_id"], "name": s["name"], "duration_ms": s["duration_ms"]}
+            for s in critical_path(spans)
+        ],
+    }